@@ -1,11 +1,14 @@
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from pathlib import Path
+from typing import Optional
 import asyncio
+import json
 import time
-import psutil
 import logging
 
+from src.utils.metrics import CONTENT_TYPE, metrics, process_sampler
+
 # ---------------------- Logging Setup ----------------------
 logger = logging.getLogger("endpoints")
 logger.setLevel(logging.INFO)
@@ -16,19 +19,37 @@ logger.addHandler(handler)
 
 app = FastAPI()
 
+http_requests = metrics.counter(
+    "repo_analysis_http_requests_total", "HTTP requests by method, route and status code.",
+    ["method", "route", "status"])
+http_request_seconds = metrics.histogram(
+    "repo_analysis_http_request_duration_seconds", "HTTP request duration by route.", ["route"])
+
+@app.on_event("startup")
+async def start_process_sampler():
+    process_sampler.start()
+
+@app.on_event("shutdown")
+async def stop_process_sampler():
+    process_sampler.stop()
+
 # ---------------------- Middleware ----------------------
 @app.middleware("http")
 async def log_request_data(request: Request, call_next):
     """
-    Middleware that logs the duration and memory usage for each incoming HTTP request.
+    Middleware that logs the duration and memory usage for each incoming HTTP request,
+    and records the request in the metrics under its route template.
+    Memory usage is the process sampler's latest sample rather than a fresh one per request.
     """
     start_time = time.perf_counter()
     response = await call_next(request)
     duration = time.perf_counter() - start_time
 
-    # Get current memory usage in MB.
-    process = psutil.Process()
-    mem_usage = process.memory_info().rss / (1024 * 1024)
+    route = request.scope.get("route")
+    route_path = route.path if route is not None else "<unmatched>"
+    http_requests.labels(method=request.method, route=route_path, status=str(response.status_code)).inc()
+    http_request_seconds.labels(route=route_path).observe(duration)
+    mem_usage = process_sampler.rss_bytes / (1024 * 1024)
 
     logger.info(f"Path: {request.url.path} | Duration: {duration:.4f}s | Memory Usage: {mem_usage:.2f} MB")
     response.headers["X-Process-Time"] = f"{duration:.4f}"
@@ -38,31 +59,99 @@ async def log_request_data(request: Request, call_next):
 # ---------------------- Pydantic Models ----------------------
 class CloneRequest(BaseModel):
     repo_url: str
+    # Re-index only the files changed since the last ingestion of this repository.
+    incremental: bool = False
+    # Namespace to clone into; without one the single default namespace is used.
+    repo_id: Optional[str] = None
+    # Block until the ingestion job has finished instead of returning its job id right away.
+    wait: bool = False
 
 class RagRequest(BaseModel):
     query: str
+    repo_id: Optional[str] = None
 
 # ---------------------- Core Module Imports ----------------------
 from src.core import repository, assistant
+from src.core.namespaces import registry, checkout_dir
+from src.core.jobs import job_manager, JobQueueFull, COMPLETED
 
 # ---------------------- Endpoints ----------------------
+def check_repo_id(repo_id):
+    """Reject malformed repo ids (400) and namespaces that were never cloned (404)."""
+    try:
+        if not registry.exists(repo_id):
+            raise HTTPException(status_code=404, detail=f"Unknown repo id: {repo_id}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/clone")
 async def clone_repo(request: CloneRequest):
     """
     Clone a Git repository based on the provided GitHub URL.
-    This endpoint removes any existing cloned repository, clones the new one, and processes its files.
+    This endpoint removes any existing cloned repository and index, clones the new one, and processes its files.
+    With "incremental": true and an existing index of the same repository, it instead fetches new
+    commits and re-indexes only the files changed since the indexed commit.
+    With a "repo_id", the repository gets its own namespace (checkout, index and metadata), so
+    several repositories can be served side by side; only that namespace is replaced.
+
+    The work runs as a background job: the response (202) carries its job id, whose progress
+    is available from /jobs/{job_id}. Returns 429 when the job queue is full.
+    With "wait": true the request blocks until the job finishes.
     
     Returns:
-        A JSON object with the status and list of processed files.
+        A JSON object with the job status and id, or with "wait" the list of processed files.
     """
-    target_dir = Path("cloned_repo")
     try:
-        await repository.clone_repository(request.repo_url, target_dir)
-        files = await repository.process_files(target_dir)
-        return {"status": "success", "files_processed": [str(f) for f in files]}
-    except Exception as e:
-        logger.error("Error in /clone: %s", e)
-        raise HTTPException(status_code=500, detail=str(e))
+        target_dir = checkout_dir(request.repo_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def ingest() -> dict:
+        async with registry.write_lock(request.repo_id):
+            with registry.use(request.repo_id):
+                if request.incremental:
+                    return await repository.update_repository(request.repo_url, str(target_dir))
+                files = await repository.clone_and_process_repository(request.repo_url, str(target_dir))
+                return {"files_processed": [str(f) for f in files]}
+
+    try:
+        job = job_manager.submit(ingest, repo_url=request.repo_url, repo_id=request.repo_id,
+                                 incremental=request.incremental)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    if not request.wait:
+        return JSONResponse(status_code=202, content={"status": job.status, "job_id": job.id})
+    await asyncio.shield(job.done)
+    if job.status != COMPLETED:
+        logger.error("Error in /clone: %s", job.error or job.status)
+        raise HTTPException(status_code=500, detail=job.error or f"Job {job.status}")
+    return {"status": "success", "job_id": job.id, **job.result}
+
+@app.get("/jobs")
+async def list_jobs():
+    """Status and progress of queued, running and recently finished ingestion jobs."""
+    return {"jobs": [job.to_dict() for job in job_manager.list()]}
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """
+    Status of an ingestion job, with its progress: files scanned and processed, chunks embedded,
+    throughput and the estimated time remaining (once all files to ingest have been scanned).
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job.to_dict()
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running ingestion job; an interrupted ingestion resumes on the next /clone."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    if not job_manager.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return {"status": "cancelling", "job_id": job_id}
 
 @app.post("/analyse_repository")
 async def analyse_repository_endpoint(request: RagRequest):
@@ -71,14 +160,52 @@ async def analyse_repository_endpoint(request: RagRequest):
     
     The system detects if a file name is mentioned in the query (e.g., "sessions.py") and, if so, retrieves the full content of that file.
     Otherwise, it uses the FAISS-based retrieval mechanism to gather context.
+    With a "repo_id", the question is answered from that namespace, which is loaded on first use.
     
     Returns:
         A JSON object with the LLM-generated response.
     """
+    check_repo_id(request.repo_id)
     try:
         # Simply pass the query; file-filtering logic is handled in assistant.generate_rag_response.
-        response = await assistant.generate_rag_response(request.query)
+        with registry.use(request.repo_id):
+            response = await assistant.generate_rag_response(request.query)
         return {"response": response}
     except Exception as e:
         logger.error("Error in /analyse_repository: %s", e)
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/analyse_repository/stream")
+async def analyse_repository_stream_endpoint(request: RagRequest):
+    """
+    Streaming variant of /analyse_repository, sent as server-sent events.
+
+    A "metadata" event with the retrieved sources comes first, followed by "token" events
+    carrying the answer as the LLM generates it and a final "done" event. Failures after the
+    stream has started are reported as an "error" event.
+    """
+    check_repo_id(request.repo_id)
+
+    async def events():
+        try:
+            with registry.use(request.repo_id):
+                async for item in assistant.stream_rag_response(request.query):
+                    yield sse_event(item["event"], item["data"])
+        except Exception as e:
+            logger.error("Error in /analyse_repository/stream: %s", e)
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """
+    Process metrics in the Prometheus text exposition format: request counts and latencies,
+    per-stage latency histograms (clone, read, chunk, embed, index_add, search, llm, ...),
+    OpenAI calls and tokens, cache hits and misses, and the sampled memory, CPU and threads.
+    """
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
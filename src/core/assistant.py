@@ -5,27 +5,21 @@ import os
 import re
 import asyncio
 import logging
-import time
-import functools
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator
 import aiofiles
 import openai
 from openai import AsyncOpenAI
-from src.core.vectorstore import query_faiss, metadata_store, generate_embedding
-from src.utils.rate_limiter import AsyncRateLimiter
-
-# ---------------------- Performance Monitoring ----------------------
-def measure_time(func):
-    """Async decorator to measure execution time of functions."""
-    @functools.wraps(func)
-    async def wrapper(*args, **kwargs):
-        start = time.perf_counter()
-        result = await func(*args, **kwargs)
-        elapsed = time.perf_counter() - start
-        logging.getLogger(__name__).info(f"{func.__name__} took {elapsed:.4f} seconds")
-        return result
-    return wrapper
+from src.core import vectorstore, git_source
+from src.core.vectorstore import query_faiss, query_lexical, generate_embedding
+from src.core.lexical_index import reciprocal_rank_fusion
+from src.core.symbol_table import extract_symbols, format_outline, is_structural_query
+from src.core.response_cache import response_cache
+from src.core.chunking import estimate_tokens
+from src.core.context_builder import (ContextBuilder, ContextCandidate, RAG_CONTEXT_MAX_TOKENS,
+                                      RAG_SUPPLEMENT_MAX_TOKENS, PRIORITY_FILE, PRIORITY_SUPPLEMENT)
+from src.core.openai_client import call_openai, create_client, record_usage
+from src.utils.performance import measure_time
 
 # ---------------------- Logging Configuration ----------------------
 logger = logging.getLogger(__name__)
@@ -36,13 +30,26 @@ handler.setFormatter(formatter)
 logger.addHandler(handler)
 
 # ---------------------- OpenAI Async Client ----------------------
-aclient = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+# Every request first waits for the process-wide limiter (see openai_client); interactive
+# queries are served before bulk ingestion work.
+aclient = create_client()
+
+# Chat model behind every completion request; the summary cache keys on it too.
+CHAT_MODEL = "gpt-3.5-turbo"
+
+# ---------------------- Retrieval Settings ----------------------
+# Minimum cosine similarity between the query and a chunk for the chunk to be used as context.
+SIMILARITY_THRESHOLD = float(os.environ.get("RAG_SIMILARITY_THRESHOLD", "0.75"))
+# Chunks taken from each of the vector and lexical rankings, and from their fusion.
+RETRIEVAL_K = int(os.environ.get("RAG_RETRIEVAL_K", "10"))
+# Also retrieve chunks by BM25 over their text and fuse both rankings (0 = vector search only).
+LEXICAL_SEARCH = os.environ.get("RAG_LEXICAL_SEARCH", "1") != "0"
 
 # ---------------------- Core Functions ----------------------
 async def analyze_code(query: str, context: str) -> str:
     try:
-        response = await aclient.chat.completions.create(
-            model="gpt-3.5-turbo",
+        response = await call_openai(lambda: aclient.chat.completions.create(
+            model=CHAT_MODEL,
             messages=[
                 {"role": "system", "content": (
                     "You are an expert code reviewer. Provide a comprehensive analysis of the provided code. "
@@ -52,7 +59,7 @@ async def analyze_code(query: str, context: str) -> str:
             ],
             temperature=0.2,
             max_tokens=600
-        )
+        ), estimate_tokens(context) + estimate_tokens(query) + 600)
         return response.choices[0].message.content.strip()
     except Exception as e:
         logger.error("Error in analyze_code: %s", e)
@@ -67,12 +74,12 @@ async def analyze_code_with_context(conversation_history: List[Dict[str, str]])
             )}
         ]
         messages.extend(conversation_history)
-        response = await aclient.chat.completions.create(
-            model="gpt-3.5-turbo",
+        response = await call_openai(lambda: aclient.chat.completions.create(
+            model=CHAT_MODEL,
             messages=messages,
             temperature=0.2,
             max_tokens=600
-        )
+        ), sum(estimate_tokens(m["content"]) for m in messages) + 600)
         return response.choices[0].message.content.strip()
     except Exception as e:
         logger.error("Error in analyze_code_with_context: %s", e)
@@ -80,7 +87,7 @@ async def analyze_code_with_context(conversation_history: List[Dict[str, str]])
 
 async def get_unique_file_names() -> List[str]:
     file_names = set()
-    for meta in metadata_store.values():
+    for meta in vectorstore.current_index().metadata_store.values():
         file_chunk_id = meta.get("file_chunk_id", "")
         m = re.match(r"(.*)_chunk_\d+", file_chunk_id)
         if m:
@@ -96,23 +103,31 @@ async def infer_filter_from_query(user_query: str, available_files: List[str]) -
         "Based on these, provide a single keyword that best represents the subset of files most relevant "
         "to the query. If the query is about the full repository, respond with 'all'."
     )
-    
-    response = await aclient.chat.completions.create(
-        model="gpt-3.5-turbo",
+
+    response = await call_openai(lambda: aclient.chat.completions.create(
+        model=CHAT_MODEL,
         messages=[
             {"role": "system", "content": "You are an expert at extracting relevant keywords from a user query based on available file names."},
             {"role": "user", "content": prompt},
         ],
         temperature=0.2,
         max_tokens=10
-    )
+    ), estimate_tokens(prompt) + 10)
     keyword = response.choices[0].message.content.strip()
     if keyword.lower() == "all":
         return None
     return keyword
 
 async def read_file_content(file_path: str) -> str:
+    """Read a repository file, from the indexed commit's objects when the clone is bare."""
     try:
+        state = vectorstore.current_index().index_state
+        repo_dir = state.get("repo_dir")
+        if repo_dir and state.get("commit") and git_source.is_bare_repository(repo_dir):
+            rel_path = Path(file_path).relative_to(repo_dir).as_posix()
+            content = await git_source.read_file(repo_dir, state["commit"], rel_path)
+            logger.info("Read file %s with length %d from git objects", file_path, len(content))
+            return content
         async with aiofiles.open(file_path, mode='r') as f:
             content = await f.read()
             logger.info("Read file %s with length %d", file_path, len(content))
@@ -121,107 +136,251 @@ async def read_file_content(file_path: str) -> str:
         logger.error(f"Error reading file {file_path}: {e}")
         return ""
 
-@measure_time
-async def generate_rag_response(user_query: str, filter_by: str = None) -> str:
+async def prepare_rag_context(user_query: str, filter_by: str = None) -> Dict[str, Any]:
     """
-    Generates a retrieval-augmented response for the given user query.
-    
-    If the query mentions a file name (e.g., "sessions.py", "README.md", etc.), 
+    Do everything generate_rag_response does before calling the LLM.
+
+    If the query mentions a file name (e.g., "sessions.py", "README.md", etc.),
     the full file content is retrieved (after case-insensitive matching) and used as context.
-    For generic repository queries, FAISS retrieval is used and supplemented with key repository files.
+    Structural questions ("what are the functions in sessions.py?") get the file's outline
+    from the symbol table instead, and long files are led by their outline rather than
+    summarized with an extra LLM call; only long files without an outline are summarized.
+    For generic repository queries, chunks found by FAISS and by the BM25 lexical index are
+    fused by reciprocal rank and supplemented with key repository files.
+    Answers are cached per index version: a query close enough to an already answered one
+    (about the same file, if any) gets the cached answer without retrieval or an LLM call.
+
+    The context is assembled by a ContextBuilder within RAG_CONTEXT_MAX_TOKENS: retrieved
+    chunks best first without duplicates, then key files capped at RAG_SUPPLEMENT_MAX_TOKENS
+    each, truncated or skipped when the budget runs out.
+
+    Returns a dict with the augmented "prompt", the "sources" it was built from, the
+    "context" budget report, the "filter_by" file, a "cached_response" (None on a cache
+    miss, in which case prompt, sources and report are not computed) and the
+    "cache_key" to store the answer under.
     """
-    try:
-        repo_path = Path("cloned_repo")
-        similarity_threshold = 0.5  # Adjust based on empirical evaluation.
-        requested_k = 20  # Number of chunks to retrieve
-
-        # Use a case-insensitive regex to detect any file name in the query.
-        file_match = re.search(r'([A-Za-z0-9_.\-]+\.\w+)', user_query, re.IGNORECASE)
-        if file_match:
-            extracted_file = file_match.group(1).lower()
-            # Normalize file names from the repository by lowercasing.
-            matching_files = [f for f in repo_path.rglob("*") if f.is_file() and f.name.lower() == extracted_file]
-            if matching_files:
-                filter_by = extracted_file
-                logger.info("Detected file name in query (case-insensitive): %s", filter_by)
-            else:
-                logger.info("File name %s detected in query but not found in repository.", extracted_file)
-
-        context_chunks = []
-        if filter_by:
-            # For file-specific queries, retrieve full content.
-            matching_files = [f for f in repo_path.rglob("*") if f.is_file() and f.name.lower() == filter_by.lower()]
-            if matching_files:
-                file_path = str(matching_files[0])
-                full_content = await read_file_content(file_path)
-                if full_content:
-                    # Optionally, if the file is very long, summarize it.
-                    if len(full_content.split()) > 1000:  # arbitrary threshold; adjust as needed
-                        logger.info("File %s is long; summarizing its content.", file_path)
-                        # Call a summarization function (you can implement this as needed).
-                        full_content = await analyze_code("Please provide a summary of the following code.", full_content)
-                    context_chunks = [f"**{file_path} (full file)**:\n{full_content}\n"]
-                    logger.info("Using full content for file: %s", file_path)
-                else:
-                    logger.warning("Full content for %s is empty.", file_path)
+    similarity_threshold = SIMILARITY_THRESHOLD
+    requested_k = RETRIEVAL_K  # Upper bound on the number of chunks to retrieve
+
+    index = vectorstore.current_index()
+    # Use a case-insensitive regex to detect any file name in the query.
+    file_match = re.search(r'([A-Za-z0-9_.\-]+\.\w+)', user_query, re.IGNORECASE)
+    if file_match:
+        extracted_file = file_match.group(1).lower()
+        # Resolved through the file manifest built at ingestion, not by walking the checkout.
+        if index.file_manifest.find(extracted_file):
+            filter_by = extracted_file
+            logger.info("Detected file name in query (case-insensitive): %s", filter_by)
+        else:
+            logger.info("File name %s detected in query but not found in repository.", extracted_file)
+
+    cache_namespace = (index.repo_id, filter_by.lower() if filter_by else None)
+    query_embedding = None
+    rag_context = {"prompt": None, "sources": [], "context": None, "filter_by": filter_by,
+                   "cached_response": None, "cache_key": (cache_namespace, index.version, None)}
+    if response_cache is not None:
+        query_embedding = await generate_embedding(user_query)
+        rag_context["cache_key"] = (cache_namespace, index.version, query_embedding)
+        cached = response_cache.get(cache_namespace, index.version, query_embedding)
+        if cached is not None:
+            logger.info("Answered from the response cache (similarity %.3f).", cached[1])
+            rag_context["cached_response"] = cached[0]
+            return rag_context
+
+    # Whatever the instructions and the question leave of the prompt budget goes to context.
+    builder = ContextBuilder(RAG_CONTEXT_MAX_TOKENS - estimate_tokens(_rag_prompt(user_query, "")))
+    if filter_by:
+        # For file-specific queries, retrieve full content.
+        matching_files = index.file_manifest.find(filter_by)
+        if matching_files:
+            file_path = matching_files[0]
+            symbols = index.symbol_table.symbols(file_path)
+            if symbols is not None and is_structural_query(user_query):
+                # The outline recorded at ingestion answers structural questions on its own.
+                builder.add(ContextCandidate(f"{file_path} (outline)", format_outline(file_path, symbols),
+                                             {"source": file_path, "kind": "outline"},
+                                             priority=PRIORITY_FILE, truncatable=True))
+                logger.info("Using the outline of file: %s", file_path)
             else:
-                logger.warning("No matching file found for filter: %s", filter_by)
+                await _add_file_context(builder, file_path, symbols)
         else:
-            # For generic repository queries, use FAISS retrieval.
+            logger.warning("No matching file found for filter: %s", filter_by)
+    else:
+        # For generic repository queries, fuse FAISS and lexical retrieval.
+        # Only chunks whose cosine similarity clears the threshold come back from FAISS;
+        # exact identifiers that embed poorly are still found by BM25.
+        if query_embedding is None:
             query_embedding = await generate_embedding(user_query)
-            retrieval_results = query_faiss(query_embedding, k=requested_k)
-            valid_chunks = []
-            for idx, distance in zip(retrieval_results["indices"][0], retrieval_results["distances"][0]):
-                if idx == -1 or distance < similarity_threshold:
-                    continue
-                if idx in metadata_store:
-                    meta = metadata_store[idx]
-                    file_chunk_id = meta["file_chunk_id"]
-                    chunk_text = meta.get("chunk_text", "[No text available]")
-                    valid_chunks.append(f"**{file_chunk_id}**:\n{chunk_text}\n")
-            context_chunks.extend(valid_chunks)
-            
-            # Supplement with key repository files if context is insufficient.
-            logger.info("Limited context from FAISS; adding key repository files.")
-            key_files = ["README.md", "setup.py", "requirements.txt"]
-            for key_file in key_files:
-                matching = list(repo_path.rglob(key_file))
-                if matching:
-                    key_path = str(matching[0])
-                    file_content = await read_file_content(key_path)
-                    if file_content:
-                        context_chunks.append(f"**{key_path} (full file)**:\n{file_content}\n")
-        
-        augmented_prompt = (
-            "You are an expert code reviewer. Based on the following repository context, "
-            "provide a comprehensive analysis covering the project's purpose, structure, dependencies, "
-            "and notable features.\n\n"
-            "Retrieved Context:\n" + "\n".join(context_chunks) + "\n\n"
-            "Question: " + user_query + "\n\n"
-            "If the context is limited, please synthesize a complete overview from the available information."
-        )
-        
-        logger.info("Final augmented prompt sent to LLM:\n%s", augmented_prompt)
-        
-        async with AsyncRateLimiter(max_rate=10, time_period=1):
-            response = await aclient.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an expert code reviewer."},
-                    {"role": "user", "content": augmented_prompt},
-                ],
-                temperature=0.2,
-                max_tokens=600
-            )
-        
+        retrieval_results = query_faiss(query_embedding, k=requested_k, min_score=similarity_threshold)
+        similarities = {}
+        for idx, score in zip(retrieval_results["indices"][0], retrieval_results["distances"][0]):
+            if idx != -1 and score >= similarity_threshold:
+                similarities[int(idx)] = float(score)
+        lexical_scores = dict(query_lexical(user_query, k=requested_k)) if LEXICAL_SEARCH else {}
+        fused = reciprocal_rank_fusion([list(similarities), list(lexical_scores)])[:requested_k]
+        metadata = index.metadata_store.get_many(idx for idx, _ in fused)
+        candidates = []
+        for idx, score in fused:
+            if idx in metadata:
+                meta = metadata[idx]
+                file_chunk_id = meta["file_chunk_id"]
+                chunk_text = meta.get("chunk_text", "[No text available]")
+                # score is the fused rank score; the per-retriever scores are kept alongside.
+                source = {"source": file_chunk_id, "kind": "chunk", "score": score}
+                if idx in similarities:
+                    source["similarity"] = similarities[idx]
+                if idx in lexical_scores:
+                    source["bm25"] = lexical_scores[idx]
+                heading = file_chunk_id
+                if "start_line" in meta:
+                    # Chunks indexed before syntax-aware chunking have no location.
+                    source.update(file_path=meta["file_path"], start_line=meta["start_line"],
+                                  end_line=meta["end_line"], symbol=meta.get("symbol"))
+                    heading = f"{meta['file_path']} lines {meta['start_line']}-{meta['end_line']}"
+                    if meta.get("symbol"):
+                        heading += f" ({meta['symbol']})"
+                candidates.append(ContextCandidate(heading, chunk_text, source, score=score))
+        builder.extend(candidates)
+
+        # Supplement with key repository files, each capped, while budget remains.
+        key_files = ["README.md", "setup.py", "requirements.txt"]
+        for key_file in key_files:
+            if builder.remaining_tokens < builder.min_section_tokens:
+                logger.info("Context budget used up; skipping remaining key repository files.")
+                break
+            matching = index.file_manifest.find(key_file)
+            if matching:
+                key_path = matching[0]
+                file_content = await read_file_content(key_path)
+                if file_content:
+                    builder.add(ContextCandidate(f"{key_path} (full file)", file_content,
+                                                 {"source": key_path, "kind": "file"},
+                                                 priority=PRIORITY_SUPPLEMENT,
+                                                 max_tokens=RAG_SUPPLEMENT_MAX_TOKENS, truncatable=True))
+
+    rag_context["sources"] = builder.sources
+    rag_context["context"] = builder.report()
+    logger.info("Context budget usage: %s", rag_context["context"])
+    rag_context["prompt"] = _rag_prompt(user_query, builder.text())
+    logger.info("Final augmented prompt sent to LLM:\n%s", rag_context["prompt"])
+    return rag_context
+
+async def _add_file_context(builder: ContextBuilder, file_path: str, symbols) -> None:
+    """Add a file named in the query: in full, or led by its outline when it is long."""
+    full_content = await read_file_content(file_path)
+    if not full_content:
+        logger.warning("Full content for %s is empty.", file_path)
+        return
+    if len(full_content.split()) > 1000:  # arbitrary threshold; adjust as needed
+        if symbols is None:
+            symbols = extract_symbols(file_path, full_content)
+        if symbols is not None:
+            # The outline covers the whole file; the text fills whatever budget is left.
+            builder.add(ContextCandidate(f"{file_path} (outline)", format_outline(file_path, symbols),
+                                         {"source": file_path, "kind": "outline"},
+                                         priority=PRIORITY_FILE, score=1.0, truncatable=True))
+            logger.info("File %s is long; leading with its outline.", file_path)
+        else:
+            logger.info("File %s is long; summarizing its content.", file_path)
+            full_content = await analyze_code("Please provide a summary of the following code.", full_content)
+    builder.add(ContextCandidate(f"{file_path} (full file)", full_content,
+                                 {"source": file_path, "kind": "file"},
+                                 priority=PRIORITY_FILE, truncatable=True))
+    logger.info("Using full content for file: %s", file_path)
+
+def _rag_prompt(user_query: str, context: str) -> str:
+    return (
+        "You are an expert code reviewer. Based on the following repository context, "
+        "provide a comprehensive analysis covering the project's purpose, structure, dependencies, "
+        "and notable features.\n\n"
+        "Retrieved Context:\n" + context + "\n\n"
+        "Question: " + user_query + "\n\n"
+        "If the context is limited, please synthesize a complete overview from the available information."
+    )
+
+def _rag_messages(augmented_prompt: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": "You are an expert code reviewer."},
+        {"role": "user", "content": augmented_prompt},
+    ]
+
+def _cache_response(rag_context: Dict[str, Any], user_query: str, final_response: str) -> None:
+    namespace, version, query_embedding = rag_context["cache_key"]
+    if response_cache is not None and query_embedding is not None:
+        response_cache.put(namespace, version, query_embedding, user_query, final_response)
+
+@measure_time
+async def generate_rag_response(user_query: str, filter_by: str = None) -> str:
+    """
+    Generates a retrieval-augmented response for the given user query.
+    See prepare_rag_context for how the context is chosen and when cached answers are reused.
+    """
+    try:
+        rag_context = await prepare_rag_context(user_query, filter_by)
+        if rag_context["cached_response"] is not None:
+            return rag_context["cached_response"]
+
+        response = await call_openai(lambda: aclient.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=_rag_messages(rag_context["prompt"]),
+            temperature=0.2,
+            max_tokens=600
+        ), estimate_tokens(rag_context["prompt"]) + 600, hedge=True)
+
         final_response = response.choices[0].message.content.strip()
         logger.info("LLM response: %s", final_response)
+        _cache_response(rag_context, user_query, final_response)
         return final_response
 
     except Exception as e:
         logger.error("Error in generate_rag_response: %s", e)
         raise
 
+async def stream_rag_response(user_query: str, filter_by: str = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of generate_rag_response.
+
+    Yields a "metadata" event with the retrieval results first, then one "token" event
+    per piece of text as the LLM produces it, and finally a "done" event. A cached
+    answer is sent as a single token event.
+    """
+    rag_context = await prepare_rag_context(user_query, filter_by)
+    yield {"event": "metadata", "data": {
+        "sources": rag_context["sources"],
+        "context": rag_context["context"],
+        "filter_by": rag_context["filter_by"],
+        "cached": rag_context["cached_response"] is not None,
+    }}
+    if rag_context["cached_response"] is not None:
+        yield {"event": "token", "data": {"content": rag_context["cached_response"]}}
+        yield {"event": "done", "data": {}}
+        return
+
+    parts = []
+    try:
+        stream = await call_openai(lambda: aclient.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=_rag_messages(rag_context["prompt"]),
+            temperature=0.2,
+            max_tokens=600,
+            stream=True,
+            # The last chunk then reports the tokens used, which go into the metrics.
+            stream_options={"include_usage": True}
+        ), estimate_tokens(rag_context["prompt"]) + 600)
+        async for chunk in stream:
+            record_usage(getattr(chunk, "usage", None))
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield {"event": "token", "data": {"content": delta}}
+    except Exception as e:
+        logger.error("Error in stream_rag_response: %s", e)
+        raise
+    final_response = "".join(parts).strip()
+    logger.info("LLM response: %s", final_response)
+    _cache_response(rag_context, user_query, final_response)
+    yield {"event": "done", "data": {}}
+
 if __name__ == '__main__':
     async def main():
         queries = [
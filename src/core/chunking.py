@@ -0,0 +1,188 @@
+import io
+import os
+import ast
+import logging
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(handler)
+
+# Upper bound on the size of a chunk; 500 tokens is about the 2000 characters of the old fixed slices.
+CHUNK_MAX_TOKENS = int(os.environ.get("CHUNK_MAX_TOKENS", "500"))
+# Trailing lines of a chunk repeated at the start of the next one when text has to be split.
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("CHUNK_OVERLAP_TOKENS", "0"))
+
+_DEFINITIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for request budgeting."""
+    return len(text) // 4 + 1
+
+class Chunk(str):
+    """
+    The text of a chunk, plus where it comes from in its file.
+
+    start_line and end_line are 1-based and inclusive; symbol is the qualified name of
+    the function or class the chunk belongs to, or None for module-level code and
+    plain text. Being a str, a chunk can be passed wherever chunk text is expected.
+    """
+
+    def __new__(cls, text: str, start_line: int, end_line: int, symbol: Optional[str] = None):
+        chunk = super().__new__(cls, text)
+        chunk.start_line = start_line
+        chunk.end_line = end_line
+        chunk.symbol = symbol
+        return chunk
+
+    def location(self) -> Dict[str, object]:
+        return {"start_line": self.start_line, "end_line": self.end_line, "symbol": self.symbol}
+
+def _split_lines(text: str) -> List[str]:
+    # Lines end at "\n" only, as in the line numbers reported by ast.
+    return io.StringIO(text).readlines()
+
+def _line_chunks(lines: List[str], first_line: int, max_tokens: int, overlap_tokens: int,
+                 symbol: Optional[str] = None) -> List[Chunk]:
+    """
+    Pack consecutive lines into chunks of at most max_tokens.
+
+    A chunk preferably ends after a blank line, so paragraphs stay whole, as long as that
+    keeps it at least half full. With overlap_tokens, the last lines of a chunk are
+    repeated at the start of the next one. A single line over the budget is cut into
+    pieces of its own.
+    """
+    chunks: List[Chunk] = []
+    # (line number, line, tokens) of the chunk being filled, and their total tokens.
+    current: List[Tuple[int, str, int]] = []
+    current_tokens = 0
+
+    def emit(items: List[Tuple[int, str, int]]) -> None:
+        text = "".join(line for _, line, _ in items)
+        if text.strip():
+            chunks.append(Chunk(text, items[0][0], items[-1][0], symbol))
+
+    for number, line in enumerate(lines, first_line):
+        line_tokens = estimate_tokens(line)
+        if line_tokens > max_tokens:
+            if current:
+                emit(current)
+                current, current_tokens = [], 0
+            step = max(1, max_tokens * 4)
+            for i in range(0, len(line), step):
+                emit([(number, line[i:i + step], 0)])
+            continue
+        if current and current_tokens + line_tokens > max_tokens:
+            cut, emitted_tokens = len(current), current_tokens
+            head_tokens = current_tokens
+            for i in range(len(current) - 1, 0, -1):
+                head_tokens -= current[i][2]
+                if not current[i - 1][1].strip():
+                    if head_tokens * 2 >= max_tokens:
+                        cut, emitted_tokens = i, head_tokens
+                    break
+            emitted, current = current[:cut], current[cut:]
+            current_tokens -= emitted_tokens
+            emit(emitted)
+            overlap: List[Tuple[int, str, int]] = []
+            overlap_used = 0
+            budget = min(overlap_tokens, max_tokens - current_tokens - line_tokens)
+            for item in reversed(emitted):
+                if overlap_used + item[2] > budget:
+                    break
+                overlap.insert(0, item)
+                overlap_used += item[2]
+            current = overlap + current
+            current_tokens += overlap_used
+        current.append((number, line, line_tokens))
+        current_tokens += line_tokens
+    if current:
+        emit(current)
+    return chunks
+
+def chunk_lines(text: str, max_tokens: int = CHUNK_MAX_TOKENS,
+                overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[Chunk]:
+    """Fallback chunker for any text: paragraphs and lines packed up to the token budget."""
+    return _line_chunks(_split_lines(text), 1, max_tokens, overlap_tokens)
+
+def _python_blocks(body: List[ast.stmt], first_line: int, last_line: int,
+                   scope: str) -> List[list]:
+    """
+    Split the lines first_line..last_line spanned by body into [start, end, symbol, node]
+    blocks: one per function or class, and one per run of other statements. Comments
+    and blank lines between statements go with the block that follows them.
+    """
+    blocks: List[list] = []
+    for node in body:
+        is_definition = isinstance(node, _DEFINITIONS)
+        symbol = f"{scope}{node.name}" if is_definition else (scope[:-1] or None)
+        if blocks and not is_definition and blocks[-1][3] is None and blocks[-1][2] == symbol:
+            blocks[-1][1] = node.end_lineno
+            continue
+        start = blocks[-1][1] + 1 if blocks else first_line
+        blocks.append([start, node.end_lineno, symbol, node if is_definition else None])
+    if blocks:
+        blocks[-1][1] = last_line
+    return blocks
+
+def _python_chunks(lines: List[str], blocks: List[list], max_tokens: int,
+                   overlap_tokens: int) -> List[Chunk]:
+    chunks: List[Chunk] = []
+    for start, end, symbol, node in blocks:
+        text = "".join(lines[start - 1:end])
+        if not text.strip():
+            continue
+        if estimate_tokens(text) <= max_tokens:
+            chunks.append(Chunk(text, start, end, symbol))
+        elif isinstance(node, ast.ClassDef):
+            # A large class is chunked per method; its header goes with the first block.
+            members = _python_blocks(node.body, start, end, f"{symbol}.")
+            chunks.extend(_python_chunks(lines, members, max_tokens, overlap_tokens))
+        else:
+            chunks.extend(_line_chunks(lines[start - 1:end], start, max_tokens, overlap_tokens, symbol))
+    return chunks
+
+def chunk_python(text: str, max_tokens: int = CHUNK_MAX_TOKENS,
+                 overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[Chunk]:
+    """
+    Chunk Python source along its syntax tree: every top-level function and class is a
+    chunk of its own, as is every run of other module-level statements. Blocks over the
+    budget are split further, classes per method and anything else by lines. Source
+    that does not parse is chunked as plain text.
+    """
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError) as e:
+        logger.debug(f"Falling back to line chunking, source does not parse: {e}")
+        return chunk_lines(text, max_tokens, overlap_tokens)
+    lines = _split_lines(text)
+    blocks = _python_blocks(tree.body, 1, len(lines), "")
+    if not blocks:
+        return chunk_lines(text, max_tokens, overlap_tokens)
+    return _python_chunks(lines, blocks, max_tokens, overlap_tokens)
+
+# Chunker per file suffix; files with other suffixes use chunk_lines.
+CHUNKERS: Dict[str, Callable[[str, int, int], List[Chunk]]] = {".py": chunk_python}
+
+def register_chunker(suffix: str, chunker: Callable[[str, int, int], List[Chunk]]) -> None:
+    """Use chunker(text, max_tokens, overlap_tokens) for files ending in suffix."""
+    CHUNKERS[suffix.lower()] = chunker
+
+def chunk_file(file_path: str, text: str, max_tokens: Optional[int] = None,
+               overlap_tokens: Optional[int] = None) -> List[Chunk]:
+    """Chunk the contents of file_path with the chunker registered for its suffix."""
+    try:
+        if not isinstance(text, str):
+            raise ValueError("Expected text to be a string.")
+        chunker = CHUNKERS.get(Path(file_path).suffix.lower(), chunk_lines)
+        chunks = chunker(text,
+                         CHUNK_MAX_TOKENS if max_tokens is None else max_tokens,
+                         CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens)
+        logger.debug(f"Generated {len(chunks)} chunks from {file_path}.")
+        return chunks
+    except Exception as e:
+        logger.error(f"Error chunking {file_path}: {e}")
+        return []
@@ -0,0 +1,151 @@
+import os
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.core.chunking import estimate_tokens
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(handler)
+
+# Tokens the whole RAG prompt (instructions, question and context) may use.
+RAG_CONTEXT_MAX_TOKENS = int(os.environ.get("RAG_CONTEXT_MAX_TOKENS", "6000"))
+# Cap on each supplementary file (README.md etc.) added to generic repository queries.
+RAG_SUPPLEMENT_MAX_TOKENS = int(os.environ.get("RAG_SUPPLEMENT_MAX_TOKENS", "1000"))
+# Candidates are only truncated to fit if at least this much of them still fits.
+RAG_MIN_SECTION_TOKENS = int(os.environ.get("RAG_MIN_SECTION_TOKENS", "100"))
+# A chunk sharing more than this fraction of its lines with an included chunk is dropped.
+RAG_MAX_LINE_OVERLAP = float(os.environ.get("RAG_MAX_LINE_OVERLAP", "0.5"))
+
+# Candidate priorities: lower comes first, then higher score.
+PRIORITY_FILE, PRIORITY_CHUNK, PRIORITY_SUPPLEMENT = 0, 1, 2
+
+_TRUNCATION_MARK = "\n[... truncated]"
+
+
+class ContextCandidate:
+    """A piece of text that may go into the prompt, with the source entry describing it."""
+
+    def __init__(self, heading: str, text: str, source: Dict[str, Any], priority: int = PRIORITY_CHUNK,
+                 score: float = 0.0, max_tokens: Optional[int] = None, truncatable: bool = False):
+        self.heading = heading
+        self.text = text
+        self.source = source
+        self.priority = priority
+        self.score = score
+        # Tokens this candidate may take at most, on top of the overall budget.
+        self.max_tokens = max_tokens
+        self.truncatable = truncatable
+
+    def section(self, text: Optional[str] = None) -> str:
+        return f"**{self.heading}**:\n{self.text if text is None else text}\n"
+
+
+class ContextBuilder:
+    """
+    Assembles prompt context within a token budget.
+
+    Candidates are taken in rank order (priority, then score) and included while they
+    fit. Exact duplicates and chunks that mostly repeat the lines of an included chunk
+    of the same file are dropped; truncatable candidates that do not fit whole are cut
+    at a line boundary if enough of them fits, and skipped otherwise. report() tells
+    how the budget was used.
+    """
+
+    def __init__(self, max_tokens: int, min_section_tokens: int = RAG_MIN_SECTION_TOKENS,
+                 max_line_overlap: float = RAG_MAX_LINE_OVERLAP):
+        self.max_tokens = max(0, max_tokens)
+        self.min_section_tokens = min_section_tokens
+        self.max_line_overlap = max_line_overlap
+        self.used_tokens = 0
+        self.sections: List[str] = []
+        self.sources: List[Dict[str, Any]] = []
+        self.truncated = 0
+        self.dropped = {"duplicate": 0, "overlap": 0, "budget": 0}
+        self._digests = set()
+        self._line_ranges: Dict[str, List[Tuple[int, int]]] = {}
+
+    @property
+    def remaining_tokens(self) -> int:
+        return max(0, self.max_tokens - self.used_tokens)
+
+    @staticmethod
+    def rank(candidates: Iterable[ContextCandidate]) -> List[ContextCandidate]:
+        return sorted(candidates, key=lambda c: (c.priority, -c.score))
+
+    def extend(self, candidates: Iterable[ContextCandidate]) -> int:
+        """Add candidates in rank order; returns how many were included."""
+        return sum(self.add(candidate) for candidate in self.rank(candidates))
+
+    def _overlaps(self, source: Dict[str, Any]) -> bool:
+        if "start_line" not in source:
+            return False
+        start, end = source["start_line"], source["end_line"]
+        length = end - start + 1
+        for other_start, other_end in self._line_ranges.get(source.get("file_path"), []):
+            shared = min(end, other_end) - max(start, other_start) + 1
+            if shared > 0 and shared / length > self.max_line_overlap:
+                return True
+        return False
+
+    def _truncate(self, candidate: ContextCandidate, budget: int) -> Optional[str]:
+        # Keep whole lines that fit in budget tokens, leaving room for the heading and the mark.
+        overhead = estimate_tokens(candidate.section("")) + estimate_tokens(_TRUNCATION_MARK)
+        max_chars = (budget - overhead) * 4
+        if budget < self.min_section_tokens or max_chars <= 0:
+            return None
+        text = candidate.text[:max_chars]
+        cut = text.rfind("\n")
+        if cut > 0:
+            text = text[:cut]
+        return text.rstrip() + _TRUNCATION_MARK
+
+    def add(self, candidate: ContextCandidate) -> bool:
+        """Include candidate if it is new and fits (possibly truncated); returns whether it was."""
+        digest = hashlib.sha1(" ".join(candidate.text.split()).encode("utf-8")).digest()
+        if digest in self._digests:
+            self.dropped["duplicate"] += 1
+            return False
+        if self._overlaps(candidate.source):
+            self.dropped["overlap"] += 1
+            return False
+
+        budget = self.remaining_tokens
+        if candidate.max_tokens is not None:
+            budget = min(budget, candidate.max_tokens)
+        section = candidate.section()
+        tokens = estimate_tokens(section)
+        source = dict(candidate.source)
+        if tokens > budget:
+            text = self._truncate(candidate, budget) if candidate.truncatable else None
+            if text is None:
+                self.dropped["budget"] += 1
+                return False
+            section = candidate.section(text)
+            tokens = estimate_tokens(section)
+            source["truncated"] = True
+            self.truncated += 1
+
+        self._digests.add(digest)
+        if "start_line" in source:
+            self._line_ranges.setdefault(source.get("file_path"), []).append(
+                (source["start_line"], source["end_line"]))
+        self.sections.append(section)
+        self.sources.append(source)
+        self.used_tokens += tokens
+        return True
+
+    def text(self) -> str:
+        return "\n".join(self.sections)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "budget_tokens": self.max_tokens,
+            "used_tokens": self.used_tokens,
+            "sections": len(self.sections),
+            "truncated": self.truncated,
+            "dropped": dict(self.dropped),
+        }
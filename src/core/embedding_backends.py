@@ -0,0 +1,165 @@
+import os
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from src.core.chunking import estimate_tokens
+from src.core.openai_client import call_openai
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(handler)
+
+# Which backend embeds chunks and queries: "openai" or "local" (offline, see HashingEmbeddingBackend).
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "openai")
+LOCAL_EMBEDDING_DIMENSION = int(os.environ.get("LOCAL_EMBEDDING_DIMENSION", "384"))
+
+# Character n-gram lengths hashed by the local backend.
+NGRAM_SIZES = (3, 4, 5)
+
+# Masks and multipliers of the 64-bit hash; arithmetic wraps modulo 2**64.
+_HASH_BASE = np.uint64(1099511628211)
+_MIX_1 = np.uint64(0xFF51AFD7ED558CCD)
+_MIX_2 = np.uint64(0xC4CEB9FE1A85EC53)
+
+
+class EmbeddingBackend(ABC):
+    """
+    Turns texts into vectors of a fixed dimension.
+
+    model names the embedding space: vectors from different models must not share an
+    index, and cached vectors are keyed by it. Backends whose vectors are cheaper to
+    recompute than to look up set cacheable to False.
+    """
+
+    name = "base"
+    cacheable = True
+
+    def __init__(self, model: str, dimension: int):
+        self.model = model
+        self.dimension = dimension
+
+    @abstractmethod
+    async def embed(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Vectors for texts in input order; None for a text the backend returned nothing for."""
+
+    async def embed_one(self, text: str) -> List[float]:
+        """Vector of a single, usually query-time, text."""
+        vector = (await self.embed([text]))[0]
+        if vector is None:
+            raise ValueError("Embedding backend returned no vector.")
+        return vector
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """Embeddings from the OpenAI API, sent through call_openai."""
+
+    name = "openai"
+
+    def __init__(self, client, model: str = "text-embedding-ada-002", dimension: int = 1536):
+        super().__init__(model, dimension)
+        self.client = client
+
+    async def embed(self, texts: List[str]) -> List[Optional[List[float]]]:
+        response = await call_openai(lambda: self.client.embeddings.create(
+            input=texts,
+            model=self.model
+        ), sum(estimate_tokens(t) for t in texts), kind="embedding")
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for item in response.data:
+            vectors[item.index] = item.embedding
+        return vectors
+
+    async def embed_one(self, text: str) -> List[float]:
+        # Query embeddings are latency-sensitive, so they may be hedged.
+        response = await call_openai(lambda: self.client.embeddings.create(
+            input=text,
+            model=self.model
+        ), estimate_tokens(text), hedge=True, kind="embedding")
+        return response.data[0].embedding
+
+
+def _mix(h: np.ndarray) -> np.ndarray:
+    # murmur3's 64-bit finalizer spreads the polynomial hash over all bits.
+    h = h ^ (h >> np.uint64(33))
+    h = h * _MIX_1
+    h = h ^ (h >> np.uint64(33))
+    h = h * _MIX_2
+    return h ^ (h >> np.uint64(33))
+
+def hash_ngrams(data: np.ndarray, n: int) -> np.ndarray:
+    """64-bit hashes of every n-byte window of data (uint8), computed for all windows at once."""
+    count = len(data) - n + 1
+    if count <= 0:
+        return np.empty(0, dtype=np.uint64)
+    values = data.astype(np.uint64)
+    h = np.full(count, n, dtype=np.uint64)
+    for k in range(n):
+        h = h * _HASH_BASE + values[k:k + count]
+    return _mix(h)
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    Offline embeddings from hashed character n-grams, computed with NumPy on the CPU.
+
+    Every 3- to 5-byte window of the lowercased text is hashed to one of `dimension`
+    buckets with a pseudo-random sign, i.e. the sparse n-gram count vector is reduced
+    by a random projection with ±1 entries (feature hashing). Counts are damped
+    logarithmically and the vector is L2-normalized, so inner products approximate the
+    cosine similarity of the texts' n-gram profiles. This captures shared identifiers
+    and spelling rather than meaning, but needs no network, API key or model download
+    and is deterministic across processes, which suits tests, benchmarks and air-gapped
+    deployments.
+    """
+
+    name = "local"
+    cacheable = False
+
+    def __init__(self, dimension: int = LOCAL_EMBEDDING_DIMENSION, ngram_sizes=NGRAM_SIZES):
+        super().__init__(f"local-hashed-ngrams-{dimension}", dimension)
+        self.ngram_sizes = tuple(ngram_sizes)
+
+    def embed_text(self, text: str) -> np.ndarray:
+        data = np.frombuffer(text.lower().encode("utf-8"), dtype=np.uint8)
+        hashes = [hash_ngrams(data, n) for n in self.ngram_sizes]
+        hashes = np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64)
+        buckets = (hashes % np.uint64(self.dimension)).astype(np.int64)
+        signs = np.where(hashes >> np.uint64(63), -1.0, 1.0)
+        counts = np.bincount(buckets, weights=signs, minlength=self.dimension)
+        vector = np.sign(counts) * np.log1p(np.abs(counts))
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.astype(np.float32)
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_text(t).tolist() for t in texts]
+
+    async def embed(self, texts: List[str]) -> List[Optional[List[float]]]:
+        # Large batches take a while; keep the event loop responsive.
+        return await asyncio.get_running_loop().run_in_executor(None, self.embed_batch, texts)
+
+
+# Factories by EMBEDDING_BACKEND value; each receives the OpenAI client (unused by offline backends).
+EMBEDDING_BACKENDS: Dict[str, Callable[..., EmbeddingBackend]] = {
+    "openai": lambda client: OpenAIEmbeddingBackend(client),
+    "local": lambda client: HashingEmbeddingBackend(),
+}
+
+def register_embedding_backend(name: str, factory: Callable[..., EmbeddingBackend]) -> None:
+    """Make factory(client) selectable with EMBEDDING_BACKEND=name."""
+    EMBEDDING_BACKENDS[name] = factory
+
+def create_embedding_backend(client, name: Optional[str] = None) -> EmbeddingBackend:
+    name = name or EMBEDDING_BACKEND
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {name!r}; expected one of {sorted(EMBEDDING_BACKENDS)}.")
+    backend = EMBEDDING_BACKENDS[name](client)
+    logger.info(f"Embedding with the {backend.name} backend ({backend.model}, {backend.dimension} dimensions).")
+    return backend
@@ -0,0 +1,146 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import List, Optional, Dict
+
+import numpy as np
+
+from src.utils.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(handler)
+
+EMBEDDING_CACHE_FILE = os.environ.get("EMBEDDING_CACHE_FILE", "embedding_cache.sqlite")
+# Entries, not bytes: each holds a float32 vector, about 6 KB at 1536 dimensions.
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+
+
+def content_key(text: str) -> str:
+    """SHA-256 of the chunk text, the content address of a cached embedding."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by (sha256 of the text, embedding model).
+
+    Vectors are stored as float32 blobs in SQLite. Each hit refreshes the entry's
+    last-access time, and once the cache holds more than max_entries rows the least
+    recently used ones are evicted. The cap is a number of entries, not bytes: an entry
+    takes about 4 bytes per dimension (6 KB for a 1536-dimension model). Hit, miss and
+    eviction counts are kept for the lifetime of the process.
+    """
+
+    def __init__(self, path: str, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._entries = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT NOT NULL,"
+                " model TEXT NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " last_access REAL NOT NULL,"
+                " PRIMARY KEY (key, model))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)")
+            conn.commit()
+            self._entries = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self._conn = conn
+            logger.info(f"Opened embedding cache {self.path} with {self._entries} entries.")
+        return self._conn
+
+    def get_many(self, texts: List[str], model: str) -> List[Optional[List[float]]]:
+        """Look up cached vectors for texts; misses come back as None."""
+        keys = [content_key(t) for t in texts]
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            conn = self._connect()
+            unique_keys = list(set(keys))
+            for start in range(0, len(unique_keys), 500):
+                part = unique_keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({','.join('?' * len(part))})",
+                    [model, *part],
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ? AND model = ?",
+                    [(now, key, model) for key in found],
+                )
+                conn.commit()
+            results = [found.get(k) for k in keys]
+            hits = sum(1 for r in results if r is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+        record_cache_lookup("embedding", hits, len(results) - hits)
+        return results
+
+    def put_many(self, texts: List[str], vectors: List[List[float]], model: str) -> None:
+        """Store vectors for texts, evicting least recently used entries above the cap."""
+        if not texts:
+            return
+        now = time.time()
+        rows = [
+            (content_key(t), model, np.asarray(v, dtype=np.float32).tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            conn = self._connect()
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, model, vector, last_access) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._entries += conn.total_changes - before
+            overflow = self._entries - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_access LIMIT ?)",
+                    (overflow,),
+                )
+                self._entries -= overflow
+                self.evictions += overflow
+            conn.commit()
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        return self.get_many([text], model)[0]
+
+    def put(self, text: str, vector: List[float], model: str) -> None:
+        self.put_many([text], [vector], model)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._connect()
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": self._entries}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Shared cache used by the vectorstore; disabled when EMBEDDING_CACHE_FILE is empty.
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_FILE) if EMBEDDING_CACHE_FILE else None
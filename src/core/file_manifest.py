@@ -0,0 +1,48 @@
+import logging
+from pathlib import PurePath
+from typing import List
+
+from src.core.metadata_store import MetadataStore
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(handler)
+
+
+class FileManifest:
+    """
+    Index of the files in an ingested repository, built during ingestion.
+
+    Maps every lowercased base name to the paths carrying it, so the query path can
+    resolve a file name mentioned in a question without walking the checkout; the
+    chunks of a file are looked up by path in the metadata. Rows live in the
+    namespace's metadata database and are committed with it at every checkpoint.
+    """
+
+    def __init__(self, store: MetadataStore):
+        self.store = store
+
+    def add_file(self, path: str) -> None:
+        self.store.execute("INSERT OR IGNORE INTO files (path, name) VALUES (?, ?)",
+                           (path, PurePath(path).name.lower()))
+
+    def remove_file(self, path: str) -> None:
+        self.store.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def find(self, name: str) -> List[str]:
+        """Paths whose base name matches name case-insensitively, shallowest first."""
+        rows = self.store.query("SELECT path FROM files WHERE name = ?", (PurePath(name).name.lower(),))
+        return sorted((row[0] for row in rows), key=lambda p: (len(PurePath(p).parts), p))
+
+    def clear(self) -> None:
+        if self.store.exists():
+            self.store.execute("DELETE FROM files")
+
+    def __len__(self) -> int:
+        rows = self.store.query("SELECT COUNT(*) FROM files")
+        return rows[0][0] if rows else 0
+
+    def __contains__(self, path: object) -> bool:
+        return bool(self.store.query("SELECT 1 FROM files WHERE path = ?", (str(path),)))
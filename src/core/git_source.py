@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(handler)
+
+# ls-tree modes of entries that are not regular files: symlinks and submodules.
+_SKIPPED_MODES = {"120000", "160000"}
+
+
+def is_bare_repository(path) -> bool:
+    """True for a bare clone, i.e. a git directory without a working tree."""
+    path = Path(path)
+    return (path / "HEAD").is_file() and (path / "objects").is_dir() and not (path / ".git").exists()
+
+
+class GitObjectSource:
+    """
+    Reads the files of one commit straight from a repository's object database.
+
+    list_files runs `git ls-tree` once to map paths to blob ids; read_bytes / read_text
+    then stream blobs through a single long-lived `git cat-file --batch` process, so
+    no working tree is written or walked. Requests to the process are serialized,
+    since its protocol answers one object at a time. Use as an async context manager
+    or call close() when done.
+    """
+
+    def __init__(self, repo_dir, commit: str = "HEAD"):
+        self.repo_dir = Path(repo_dir)
+        self.commit = commit
+        self.blobs: Dict[str, str] = {}
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "GitObjectSource":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def list_files(self) -> List[str]:
+        """
+        Return the path of every regular file in the commit and remember their blob ids.
+        Only trees are read, so blobs missing from a partial clone are not fetched.
+        """
+        process = await asyncio.create_subprocess_exec(
+            'git', 'ls-tree', '-r', '-z', self.commit,
+            cwd=str(self.repo_dir),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await process.communicate()
+        if process.returncode != 0:
+            raise Exception(f"Error running git ls-tree: {stderr.decode().strip()}")
+        files = []
+        for entry in stdout.decode("utf-8", errors="surrogateescape").split("\0"):
+            if not entry:
+                continue
+            info, path = entry.split("\t", 1)
+            mode, object_type, object_id = info.split()
+            if object_type != "blob" or mode in _SKIPPED_MODES:
+                continue
+            self.blobs[path] = object_id
+            files.append(path)
+        return files
+
+    async def _start(self) -> asyncio.subprocess.Process:
+        if self._process is None or self._process.returncode is not None:
+            self._process = await asyncio.create_subprocess_exec(
+                'git', 'cat-file', '--batch',
+                cwd=str(self.repo_dir),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+        return self._process
+
+    async def read_object(self, object_id: str) -> bytes:
+        async with self._lock:
+            process = await self._start()
+            try:
+                process.stdin.write(f"{object_id}\n".encode())
+                await process.stdin.drain()
+                header = (await process.stdout.readline()).decode().split()
+                if len(header) != 3:
+                    raise FileNotFoundError(f"Object {object_id} is missing from {self.repo_dir}")
+                data = await process.stdout.readexactly(int(header[2]) + 1)
+            except FileNotFoundError:
+                raise
+            except BaseException:
+                # A reply read halfway would corrupt every later one; start a fresh process next time.
+                process.kill()
+                self._process = None
+                raise
+            return data[:-1]
+
+    async def read_bytes(self, path: str) -> bytes:
+        """Contents of path (relative to the repository root) at the source's commit."""
+        if not self.blobs:
+            await self.list_files()
+        object_id = self.blobs.get(path)
+        if object_id is None:
+            raise FileNotFoundError(f"{path} is not a file in {self.commit}")
+        return await self.read_object(object_id)
+
+    async def read_text(self, path: str) -> str:
+        return (await self.read_bytes(path)).decode("utf-8")
+
+    async def close(self) -> None:
+        if self._process is not None and self._process.returncode is None:
+            self._process.stdin.close()
+            await self._process.wait()
+        self._process = None
+
+
+async def read_file(repo_dir, commit: str, path: str) -> str:
+    """Read a single file at commit without a working tree, e.g. for a query about one file."""
+    process = await asyncio.create_subprocess_exec(
+        'git', 'cat-file', 'blob', f"{commit}:{path}",
+        cwd=str(repo_dir),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise FileNotFoundError(f"Error reading {path} at {commit}: {stderr.decode().strip()}")
+    return stdout.decode("utf-8")
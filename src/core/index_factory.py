@@ -0,0 +1,199 @@
+import os
+import math
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+import faiss
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(handler)
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+# "auto" picks one of INDEX_TYPES from the number of vectors, see choose_index_type.
+FAISS_INDEX_TYPE = os.environ.get("FAISS_INDEX_TYPE", "auto")
+AUTO_IVF_MIN_VECTORS = int(os.environ.get("FAISS_AUTO_IVF_MIN_VECTORS", "50000"))
+AUTO_PQ_MIN_VECTORS = int(os.environ.get("FAISS_AUTO_PQ_MIN_VECTORS", "2000000"))
+FAISS_NPROBE = int(os.environ.get("FAISS_NPROBE", "16"))
+FAISS_EF_SEARCH = int(os.environ.get("FAISS_EF_SEARCH", "64"))
+HNSW_M = 32
+PQ_NBITS = 8
+# faiss wants roughly this many training points per centroid.
+MIN_POINTS_PER_CENTROID = 39
+
+
+def choose_index_type(n_vectors: int) -> str:
+    """
+    Pick an index type for a corpus size: exact search while it is cheap, IVF once
+    brute force dominates query time, and IVF-PQ when full vectors no longer fit
+    comfortably in memory. HNSW is only used when configured explicitly because it
+    cannot remove vectors, which incremental re-indexing relies on.
+    """
+    if n_vectors < AUTO_IVF_MIN_VECTORS:
+        return "flat"
+    if n_vectors < AUTO_PQ_MIN_VECTORS:
+        return "ivf_flat"
+    return "ivf_pq"
+
+
+def _nlist_for(n_vectors: int) -> int:
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // MIN_POINTS_PER_CENTROID))
+
+
+def _pq_subquantizers(dimension: int) -> int:
+    for m in (64, 48, 32, 16, 8, 4, 2):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def min_training_vectors(index_type: str, n_vectors: int) -> int:
+    """Vectors needed to train index_type for a corpus of n_vectors (0 if no training)."""
+    if index_type == "ivf_flat":
+        return MIN_POINTS_PER_CENTROID
+    if index_type == "ivf_pq":
+        return max(MIN_POINTS_PER_CENTROID, 2 ** PQ_NBITS)
+    return 0
+
+
+def build_index(index_type: str, dimension: int, n_vectors: int = 0) -> faiss.Index:
+    """
+    Create an empty inner-product index of index_type sized for n_vectors.
+    Vectors are expected to be L2-normalized, so scores are cosine similarities.
+    Every type accepts add_with_ids: IVF indexes store ids natively, flat and HNSW
+    are wrapped in an IndexIDMap2. IVF indexes must be trained before use.
+    """
+    if index_type == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+    if index_type == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        hnsw.hnsw.efConstruction = 80
+        return faiss.IndexIDMap2(hnsw)
+    if index_type in ("ivf_flat", "ivf_pq"):
+        quantizer = faiss.IndexFlatIP(dimension)
+        nlist = _nlist_for(max(n_vectors, 1))
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, _pq_subquantizers(dimension), PQ_NBITS,
+                                     faiss.METRIC_INNER_PRODUCT)
+        # Keep the quantizer alive as long as the index that references it.
+        index.quantizer_ref = quantizer
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return index
+    raise ValueError(f"Unknown FAISS index type: {index_type}")
+
+
+def _ivf(index: faiss.Index) -> Optional[faiss.IndexIVF]:
+    try:
+        return faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return None
+
+
+def _hnsw(index: faiss.Index) -> Optional[faiss.IndexHNSW]:
+    inner = faiss.downcast_index(index.index) if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)) else index
+    return inner if isinstance(inner, faiss.IndexHNSW) else None
+
+
+def index_type_of(index: faiss.Index) -> str:
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if _ivf(index) is not None:
+        return "ivf_flat"
+    if _hnsw(index) is not None:
+        return "hnsw"
+    return "flat"
+
+
+def index_ids(index: faiss.Index) -> np.ndarray:
+    """All ids stored in the index."""
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.vector_to_array(index.id_map)
+    ivf = _ivf(index)
+    if ivf is not None:
+        invlists = ivf.invlists
+        parts = [
+            faiss.rev_swig_ptr(invlists.get_ids(l), invlists.list_size(l)).copy()
+            for l in range(ivf.nlist) if invlists.list_size(l)
+        ]
+        return np.concatenate(parts).astype(np.int64) if parts else np.empty(0, dtype=np.int64)
+    return np.arange(index.ntotal, dtype=np.int64)
+
+
+def index_contents(index: faiss.Index) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (ids, vectors) of everything in the index; PQ vectors come back approximated."""
+    ids = index_ids(index)
+    if len(ids) == 0:
+        return ids, np.empty((0, index.d), dtype=np.float32)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return ids, faiss.downcast_index(index.index).reconstruct_n(0, index.ntotal)
+    ivf = _ivf(index)
+    if ivf is not None:
+        return ids, np.vstack([ivf.reconstruct(int(i)) for i in ids])
+    return ids, index.reconstruct_n(0, index.ntotal)
+
+
+def memory_bytes(index: faiss.Index) -> int:
+    """Rough resident size of an index: stored codes and ids, plus graph links for HNSW."""
+    ivf = _ivf(index)
+    if ivf is not None:
+        return index.ntotal * (ivf.code_size + 8) + ivf.nlist * index.d * 4
+    per_vector = index.d * 4 + 8
+    if _hnsw(index) is not None:
+        per_vector += HNSW_M * 2 * 4
+    return index.ntotal * per_vector
+
+
+def remove_ids(index: faiss.Index, ids: np.ndarray) -> int:
+    """
+    Remove ids from the index and return how many were removed. HNSW graphs cannot
+    delete nodes, so their vectors stay as tombstones; callers already ignore hits
+    without metadata, and the next rebuild drops them.
+    """
+    try:
+        return index.remove_ids(np.asarray(ids, dtype=np.int64))
+    except RuntimeError as e:
+        logger.info(f"Index cannot remove vectors ({e}); leaving {len(ids)} tombstones.")
+        return 0
+
+
+def train_and_fill(index_type: str, dimension: int, ids: np.ndarray, vectors: np.ndarray) -> faiss.Index:
+    """Build an index of index_type, train it on vectors if needed and add them under ids."""
+    index = build_index(index_type, dimension, len(ids))
+    if not index.is_trained:
+        index.train(vectors)
+    if len(ids):
+        index.add_with_ids(vectors, ids)
+    return index
+
+
+def range_search(index: faiss.Index, query: np.ndarray, min_score: float, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return (scores, ids) of at most k stored vectors scoring above min_score for a
+    single query, best first. Uses faiss range search where the index supports it and
+    falls back to a k-nearest search filtered by score (e.g. for HNSW).
+    """
+    try:
+        _, scores, ids = index.range_search(query, min_score)
+    except RuntimeError:
+        scores, ids = index.search(query, k)
+        scores, ids = scores[0], ids[0]
+        keep = (ids != -1) & (scores > min_score)
+        scores, ids = scores[keep], ids[keep]
+    order = np.argsort(-scores, kind="stable")[:k]
+    return scores[order], ids[order]
+
+
+def apply_search_params(index: faiss.Index, k: int, nprobe: Optional[int] = None,
+                        ef_search: Optional[int] = None) -> None:
+    """Set the search-time accuracy knobs of IVF (nprobe) and HNSW (efSearch) indexes."""
+    ivf = _ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe or FAISS_NPROBE, ivf.nlist)
+    hnsw = _hnsw(index)
+    if hnsw is not None:
+        hnsw.hnsw.efSearch = max(ef_search or FAISS_EF_SEARCH, k)
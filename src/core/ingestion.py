@@ -0,0 +1,291 @@
+import os
+import time
+import asyncio
+import logging
+import contextlib
+import contextvars
+from pathlib import Path
+from typing import Any, Dict, List, Tuple, Optional
+
+import aiofiles
+
+from src.core import vectorstore
+from src.core.git_source import GitObjectSource, is_bare_repository
+from src.core.openai_client import openai_priority, BULK
+from src.core.symbol_table import extract_symbols
+from src.utils.metrics import timed_stage
+from src.utils.resilience import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(handler)
+
+ELIGIBLE_SUFFIXES = {'.py', '.txt', '.md'}
+READ_WORKERS = int(os.environ.get("INGEST_READ_WORKERS", "8"))
+CHUNK_WORKERS = int(os.environ.get("INGEST_CHUNK_WORKERS", "2"))
+EMBED_WORKERS = int(os.environ.get("INGEST_EMBED_WORKERS", "4"))
+QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", "64"))
+
+# Marks the end of a stage's input.
+_DONE = object()
+
+def _chunk_and_extract(file_path: str, content: str):
+    """CPU-bound part of the chunk stage, run in a worker thread."""
+    return vectorstore.chunk_file(file_path, content), extract_symbols(file_path, content)
+
+
+class IngestionProgress:
+    """Counters a running ingestion updates, with throughput and ETA derived from them."""
+
+    def __init__(self):
+        self.stage = "queued"
+        self.files_scanned = 0
+        self.scan_complete = False
+        self.files_processed = 0
+        self.chunks_embedded = 0
+        self.started: Optional[float] = None
+
+    def start(self) -> None:
+        if self.started is None:
+            self.started = time.monotonic()
+        self.stage = "ingesting"
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started if self.started is not None else 0.0
+        files_per_second = self.files_processed / elapsed if elapsed > 0 else 0.0
+        chunks_per_second = self.chunks_embedded / elapsed if elapsed > 0 else 0.0
+        eta_seconds = None
+        # Only known once the scan has counted every file to ingest.
+        if self.scan_complete and files_per_second > 0:
+            eta_seconds = max(0, self.files_scanned - self.files_processed) / files_per_second
+        return {
+            "stage": self.stage,
+            "files_scanned": self.files_scanned,
+            "scan_complete": self.scan_complete,
+            "files_processed": self.files_processed,
+            "chunks_embedded": self.chunks_embedded,
+            "elapsed_seconds": round(elapsed, 3),
+            "files_per_second": round(files_per_second, 3),
+            "chunks_per_second": round(chunks_per_second, 3),
+            "eta_seconds": None if eta_seconds is None else round(eta_seconds, 1),
+        }
+
+
+# Progress of the ingestion job running in the current task, if any (see track_progress).
+_current_progress: contextvars.ContextVar = contextvars.ContextVar("ingestion_progress", default=None)
+
+def current_progress() -> Optional[IngestionProgress]:
+    return _current_progress.get()
+
+@contextlib.contextmanager
+def track_progress(progress: IngestionProgress):
+    """Report the progress of pipelines run by the calling task into progress."""
+    token = _current_progress.set(progress)
+    try:
+        yield progress
+    finally:
+        _current_progress.reset(token)
+
+
+class IngestionPipeline:
+    """
+    Bounded producer/consumer pipeline that ingests a repository directory.
+
+    Files flow through five stages connected by bounded asyncio queues:
+    scan -> read -> chunk -> embed -> index. Every stage but scan and index runs a
+    configurable number of workers; a full queue blocks the stage feeding it, so
+    memory stays bounded however far ahead the scanner gets. The embed stage drains
+    whatever chunked files are waiting and embeds them with shared batched requests.
+    The index stage has a single worker because FAISS index updates are not concurrent;
+    the vectorstore persists its work at periodic checkpoints and once more at the end.
+
+    When repo_dir is a bare clone (or a GitObjectSource is given), files are listed with
+    git ls-tree and read from the object database instead of a working tree; paths are
+    still reported as repo_dir / <path in the repository>.
+    """
+
+    def __init__(self, repo_dir: Path, read_workers: int = READ_WORKERS,
+                 chunk_workers: int = CHUNK_WORKERS, embed_workers: int = EMBED_WORKERS,
+                 queue_size: int = QUEUE_SIZE, paths: Optional[List[Path]] = None,
+                 skip: Optional[set] = None, progress: Optional[IngestionProgress] = None,
+                 source: Optional[GitObjectSource] = None):
+        self.repo_dir = Path(repo_dir)
+        # When given, only these files are ingested instead of walking repo_dir.
+        self.paths = paths
+        # Files (as str paths) already indexed by an interrupted run that is being resumed.
+        self.skip = skip or set()
+        self.read_workers = max(1, read_workers)
+        self.chunk_workers = max(1, chunk_workers)
+        self.embed_workers = max(1, embed_workers)
+        self.queue_size = max(1, queue_size)
+        # Defaults to the progress tracked by the calling task; a throwaway one otherwise.
+        self.progress = progress or current_progress() or IngestionProgress()
+        self.source = source
+        self.processed_files: List[Path] = []
+
+    async def run(self) -> List[Path]:
+        """Run all stages to completion and return the paths of the processed files."""
+        read_q = asyncio.Queue(self.queue_size)
+        chunk_q = asyncio.Queue(self.queue_size)
+        embed_q = asyncio.Queue(self.queue_size)
+        index_q = asyncio.Queue(self.queue_size)
+        self.processed_files = []
+        self.progress.start()
+        owns_source = self.source is None and is_bare_repository(self.repo_dir)
+        if owns_source:
+            self.source = GitObjectSource(self.repo_dir)
+        try:
+            # Embedding requests yield to interactive queries on the shared OpenAI limiter.
+            with openai_priority(BULK):
+                await self._run_stages(read_q, chunk_q, embed_q, index_q)
+        finally:
+            if owns_source:
+                await self.source.close()
+                self.source = None
+        return self.processed_files
+
+    async def _run_stages(self, read_q, chunk_q, embed_q, index_q) -> None:
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(self._stage([self._scan(read_q)], read_q, self.read_workers))
+            tg.create_task(self._stage(
+                [self._read_worker(read_q, chunk_q) for _ in range(self.read_workers)],
+                chunk_q, self.chunk_workers))
+            tg.create_task(self._stage(
+                [self._chunk_worker(chunk_q, embed_q) for _ in range(self.chunk_workers)],
+                embed_q, self.embed_workers))
+            tg.create_task(self._stage(
+                [self._embed_worker(embed_q, index_q) for _ in range(self.embed_workers)],
+                index_q, 1))
+            tg.create_task(self._index_worker(index_q))
+
+    @staticmethod
+    async def _stage(workers, out_q: asyncio.Queue, consumers: int) -> None:
+        """Run a stage's workers, then tell each consumer of the next stage to stop."""
+        await asyncio.gather(*workers)
+        for _ in range(consumers):
+            await out_q.put(_DONE)
+
+    def _is_eligible(self, file_path: Path) -> bool:
+        return file_path.suffix in ELIGIBLE_SUFFIXES and str(file_path) not in self.skip
+
+    async def _scan(self, out_q: asyncio.Queue) -> None:
+        # Every file, eligible or not, goes into the manifest used to resolve file names at query time.
+        manifest = vectorstore.current_index().file_manifest
+        if self.source is not None:
+            wanted = {str(p) for p in self.paths} if self.paths is not None else None
+            for rel_path in await self.source.list_files():
+                file_path = self.repo_dir / rel_path
+                if wanted is not None and str(file_path) not in wanted:
+                    continue
+                manifest.add_file(str(file_path))
+                if self._is_eligible(file_path):
+                    self.progress.files_scanned += 1
+                    await out_q.put(file_path)
+            self.progress.scan_complete = True
+            return
+        if self.paths is not None:
+            for file_path in self.paths:
+                if file_path.is_file():
+                    manifest.add_file(str(file_path))
+                    if self._is_eligible(file_path):
+                        self.progress.files_scanned += 1
+                        await out_q.put(file_path)
+            self.progress.scan_complete = True
+            return
+        for root, dirs, files in os.walk(self.repo_dir):
+            if ".git" in dirs:
+                dirs.remove(".git")
+            for name in files:
+                file_path = Path(root) / name
+                manifest.add_file(str(file_path))
+                if self._is_eligible(file_path):
+                    self.progress.files_scanned += 1
+                    await out_q.put(file_path)
+        self.progress.scan_complete = True
+
+    async def _read_worker(self, in_q: asyncio.Queue, out_q: asyncio.Queue) -> None:
+        while (file_path := await in_q.get()) is not _DONE:
+            try:
+                with timed_stage("read"):
+                    if self.source is not None:
+                        content = await self.source.read_text(file_path.relative_to(self.repo_dir).as_posix())
+                    else:
+                        async with aiofiles.open(file_path, mode='r') as f:
+                            content = await f.read()
+            except Exception as e:
+                logger.error(f"Error reading file {file_path}: {e}")
+                self.progress.files_processed += 1
+                continue
+            await out_q.put((file_path, content))
+
+    async def _chunk_worker(self, in_q: asyncio.Queue, out_q: asyncio.Queue) -> None:
+        while (item := await in_q.get()) is not _DONE:
+            file_path, content = item
+            with timed_stage("chunk"):
+                chunks, symbols = await asyncio.to_thread(_chunk_and_extract, str(file_path), content)
+            if not chunks:
+                logger.warning(f"No chunks generated for file: {file_path}")
+            # Symbols travel with the file and are only stored once its chunks are.
+            await out_q.put((file_path, chunks, symbols))
+
+    async def _embed_worker(self, in_q: asyncio.Queue, out_q: asyncio.Queue) -> None:
+        done = False
+        while not done:
+            item = await in_q.get()
+            if item is _DONE:
+                break
+            batch = [item]
+            batch_items = len(item[1])
+            batch_tokens = sum(vectorstore.estimate_tokens(c) for c in item[1])
+            # Take whatever else is already waiting, up to one request's budget.
+            while (batch_items < vectorstore.EMBEDDING_BATCH_MAX_ITEMS
+                   and batch_tokens < vectorstore.EMBEDDING_BATCH_MAX_TOKENS):
+                try:
+                    item = in_q.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is _DONE:
+                    done = True
+                    break
+                batch.append(item)
+                batch_items += len(item[1])
+                batch_tokens += sum(vectorstore.estimate_tokens(c) for c in item[1])
+
+            files = [(str(file_path), chunks) for file_path, chunks, _ in batch]
+            try:
+                per_file = await vectorstore.embed_chunked_files(files)
+            except CircuitOpenError:
+                # Fail the run instead of completing without these files, so it can be resumed.
+                raise
+            except Exception as e:
+                logger.error(f"Error embedding files {[f for f, _ in files]}: {e}")
+                self.progress.files_processed += len(files)
+                continue
+            self.progress.chunks_embedded += sum(len(embeddings) for embeddings, _ in per_file.values())
+            for file_path, _, symbols in batch:
+                await out_q.put((file_path, per_file.get(str(file_path)), symbols))
+
+    async def _index_worker(self, in_q: asyncio.Queue) -> None:
+        while (item := await in_q.get()) is not _DONE:
+            file_path, result, symbols = item
+            try:
+                if result:
+                    embeddings, chunk_texts = result
+                    await vectorstore.store_embeddings(embeddings, chunk_texts)
+                else:
+                    logger.warning(f"No embeddings were generated for file: {file_path}")
+                vectorstore.store_symbols(str(file_path), symbols)
+                self.processed_files.append(file_path)
+            except Exception as e:
+                logger.error(f"Error processing file {file_path}: {e}")
+            self.progress.files_processed += 1
+        self.progress.stage = "finalizing"
+        vectorstore.finalize_index()
+        vectorstore.checkpoint()
+
+
+async def ingest_directory(repo_dir: Path, **options) -> List[Path]:
+    """Ingest every eligible file under repo_dir and return the processed file paths."""
+    return await IngestionPipeline(repo_dir, **options).run()
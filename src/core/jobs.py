@@ -0,0 +1,152 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from src.core.ingestion import IngestionProgress, track_progress
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(handler)
+
+# Ingestions running at once per process; further jobs wait in a queue of bounded size.
+MAX_CONCURRENT_JOBS = int(os.environ.get("INGEST_MAX_CONCURRENT_JOBS", "2"))
+MAX_QUEUED_JOBS = int(os.environ.get("INGEST_MAX_QUEUED_JOBS", "16"))
+# Finished jobs kept for status queries.
+JOB_HISTORY = int(os.environ.get("INGEST_JOB_HISTORY", "100"))
+
+QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED = "queued", "running", "completed", "failed", "cancelled"
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class JobQueueFull(Exception):
+    """Raised by JobManager.submit when MAX_QUEUED_JOBS jobs are already waiting."""
+
+
+class Job:
+    """A unit of background work, e.g. one repository ingestion, and its progress."""
+
+    def __init__(self, work: Callable[[], Awaitable[Dict[str, Any]]], info: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.work = work
+        self.info = info
+        self.status = QUEUED
+        self.progress = IngestionProgress()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        # Resolved when the job finishes, whatever the outcome.
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            **self.info,
+            "progress": self.progress.snapshot(),
+            "result": self.result,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class JobManager:
+    """
+    Runs submitted jobs in the background, at most max_concurrent at a time.
+
+    Jobs beyond that wait in FIFO order in a queue of at most max_queued jobs; submitting
+    to a full queue raises JobQueueFull. Pipelines run by a job report into the job's
+    progress (see ingestion.track_progress). Queued and running jobs can be cancelled.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_JOBS, max_queued: int = MAX_QUEUED_JOBS,
+                 history: int = JOB_HISTORY):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max(0, max_queued)
+        self.history = history
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: deque = deque()
+        self._running = 0
+
+    def submit(self, work: Callable[[], Awaitable[Dict[str, Any]]], **info: Any) -> Job:
+        """Queue work (an async callable returning a result dict) and return its job."""
+        if self._running >= self.max_concurrent and len(self._queue) >= self.max_queued:
+            raise JobQueueFull(f"{len(self._queue)} jobs are already queued; try again later.")
+        job = Job(work, info)
+        self._jobs[job.id] = job
+        self._queue.append(job)
+        self._dispatch()
+        self._trim_history()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; returns False if it had already finished."""
+        job = self._jobs.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return False
+        if job.status == QUEUED:
+            self._queue.remove(job)
+            self._finish(job, CANCELLED)
+        else:
+            job.task.cancel()
+        return True
+
+    def _dispatch(self) -> None:
+        while self._queue and self._running < self.max_concurrent:
+            job = self._queue.popleft()
+            self._running += 1
+            job.status = RUNNING
+            job.started = time.time()
+            job.task = asyncio.create_task(self._run(job))
+            job.task.add_done_callback(lambda task, job=job: self._on_done(job, task))
+
+    async def _run(self, job: Job) -> None:
+        logger.info(f"Job {job.id} started: {job.info}")
+        try:
+            with track_progress(job.progress):
+                job.result = await job.work()
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}")
+            job.error = str(e)
+            self._finish(job, FAILED)
+            return
+        self._finish(job, COMPLETED)
+
+    def _on_done(self, job: Job, task: asyncio.Task) -> None:
+        # Also covers jobs cancelled before their task got to run.
+        if task.cancelled():
+            self._finish(job, CANCELLED)
+        self._running -= 1
+        self._dispatch()
+
+    def _finish(self, job: Job, status: str) -> None:
+        job.status = status
+        job.progress.stage = status
+        job.finished = time.time()
+        if not job.done.done():
+            job.done.set_result(job)
+        logger.info(f"Job {job.id} {status}.")
+
+    def _trim_history(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+
+job_manager = JobManager()
@@ -0,0 +1,163 @@
+import os
+import re
+import json
+import math
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from src.core.metadata_store import MetadataStore
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(handler)
+
+# BM25 term-frequency saturation and document-length normalization.
+BM25_K1 = float(os.environ.get("BM25_K1", "1.2"))
+BM25_B = float(os.environ.get("BM25_B", "0.75"))
+# Reciprocal-rank fusion constant; larger values flatten the difference between ranks.
+RRF_K = int(os.environ.get("RAG_RRF_K", "60"))
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_CAMEL_PART = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+# Question words that would otherwise match half the corpus.
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it me of on or show tell "
+    "that the this to what when where which who why with you".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased identifiers and words of text. Compound identifiers also yield their
+    parts, so merge_environment_settings and mergeEnvironmentSettings match both the
+    exact name and "environment settings".
+    """
+    tokens = []
+    for word in _IDENTIFIER.findall(text):
+        tokens.append(word.lower())
+        parts = [p.lower() for piece in word.split("_") for p in _CAMEL_PART.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over chunk texts, keyed by the chunks' metadata ids.
+
+    Complements the FAISS index: identifiers and rare words embed poorly but are
+    found exactly here. It is filled alongside the FAISS index. The term counts of
+    every chunk are a row of the namespace's metadata database, written as chunks are
+    added and committed with the metadata at every checkpoint, so checkpoints only
+    write what changed and loading a namespace reads nothing. The in-memory postings
+    searches are scored on are built from those rows on the first search.
+    """
+
+    def __init__(self, store: MetadataStore):
+        self.store = store
+        self.documents: Dict[int, Dict[str, int]] = {}
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.lengths: Dict[int, int] = {}
+        self.total_length = 0
+        self._loaded = False
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        for doc_id, terms in self.store.query("SELECT chunk_id, terms FROM chunk_terms"):
+            self._index_terms(doc_id, json.loads(terms))
+        self._loaded = True
+        logger.info(f"Loaded the lexical index of {len(self.documents)} chunks from {self.store.path}.")
+
+    def _index_terms(self, doc_id: int, terms: Dict[str, int]) -> None:
+        self.documents[doc_id] = terms
+        self.lengths[doc_id] = sum(terms.values())
+        self.total_length += self.lengths[doc_id]
+        for term, count in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = count
+
+    def _unindex(self, doc_id: int) -> None:
+        terms = self.documents.pop(doc_id, None)
+        if terms is None:
+            return
+        self.total_length -= self.lengths.pop(doc_id)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+
+    def add_many(self, documents: Iterable[Tuple[int, str]]) -> None:
+        """Index (doc_id, text) pairs, replacing documents already indexed under those ids."""
+        counted = [(int(doc_id), dict(Counter(tokenize(text)))) for doc_id, text in documents]
+        if not counted:
+            return
+        self.store.executemany("INSERT OR REPLACE INTO chunk_terms (chunk_id, terms) VALUES (?, ?)",
+                               [(doc_id, json.dumps(terms, separators=(",", ":"))) for doc_id, terms in counted])
+        if self._loaded:
+            for doc_id, terms in counted:
+                self._unindex(doc_id)
+                self._index_terms(doc_id, terms)
+
+    def add(self, doc_id: int, text: str) -> None:
+        self.add_many([(doc_id, text)])
+
+    def remove(self, doc_ids: Iterable[int]) -> None:
+        ids = [int(doc_id) for doc_id in doc_ids]
+        if not ids or not self.store.exists():
+            return
+        self.store.executemany("DELETE FROM chunk_terms WHERE chunk_id = ?", [(doc_id,) for doc_id in ids])
+        if self._loaded:
+            for doc_id in ids:
+                self._unindex(doc_id)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """The k best (doc_id, BM25 score) pairs for query, best first."""
+        self._load()
+        if not self.documents:
+            return []
+        terms = {t for t in tokenize(query) if t not in STOPWORDS}
+        n_docs = len(self.documents)
+        avg_length = self.total_length / n_docs or 1.0
+        scores: Dict[int, float] = {}
+        for term in terms:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, count in posting.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * count * (BM25_K1 + 1) / (count + norm)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+    def clear(self) -> None:
+        if self.store.exists():
+            self.store.execute("DELETE FROM chunk_terms")
+        self.documents.clear()
+        self.postings.clear()
+        self.lengths.clear()
+        self.total_length = 0
+        self._loaded = True
+
+    def __len__(self) -> int:
+        if self._loaded:
+            return len(self.documents)
+        rows = self.store.query("SELECT COUNT(*) FROM chunk_terms")
+        return rows[0][0] if rows else 0
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = RRF_K) -> List[Tuple[int, float]]:
+    """
+    Fuse several best-first id rankings: every id scores sum(1 / (k + rank)) over the
+    rankings it appears in. Only ranks are used, so BM25 and cosine scores, which are
+    not comparable, need no calibration. Returns (id, fused score) pairs, best first.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: (-item[1], item[0]))
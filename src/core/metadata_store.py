@@ -0,0 +1,200 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(handler)
+
+
+class MetadataStore(MutableMapping):
+    """
+    Chunk metadata keyed by FAISS id, stored in SQLite.
+
+    Behaves like the dict it replaces (id -> metadata dict), but each entry is a row,
+    so appends and point lookups cost O(1) rows and opening the store parses nothing.
+    Writes accumulate in an open transaction until commit(), which the vectorstore
+    calls at its checkpoints; rows are indexed by file path for per-file lookups.
+    The database file is only created on first use.
+
+    The namespace's file manifest, lexical index and symbol table keep their rows in the same
+    database (see execute and query), so they are committed, or rolled back, together
+    with the metadata.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " id INTEGER PRIMARY KEY,"
+                " file_path TEXT,"
+                " data TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_file_path ON chunks (file_path)")
+            conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            # File manifest: every file of the repository by its lowercased base name.
+            conn.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, name TEXT NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_files_name ON files (name)")
+            # Lexical index: the term counts of every chunk.
+            conn.execute("CREATE TABLE IF NOT EXISTS chunk_terms (chunk_id INTEGER PRIMARY KEY, terms TEXT NOT NULL)")
+            # Symbol table: the symbols of every file, as a JSON list.
+            conn.execute("CREATE TABLE IF NOT EXISTS symbols (file_path TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _row(idx: int, meta: Dict[str, Any]) -> Tuple[int, Optional[str], str]:
+        return int(idx), meta.get("file_path"), json.dumps(meta, separators=(",", ":"))
+
+    def exists(self) -> bool:
+        """Whether the database has been created, so that reading it does not create it."""
+        return self._conn is not None or os.path.exists(self.path)
+
+    def execute(self, sql: str, params: Iterable[Any] = ()) -> None:
+        """Run a write statement in the open transaction."""
+        with self._lock:
+            self._connect().execute(sql, tuple(params))
+
+    def executemany(self, sql: str, rows: Iterable[Iterable[Any]]) -> None:
+        with self._lock:
+            self._connect().executemany(sql, rows)
+
+    def query(self, sql: str, params: Iterable[Any] = ()) -> List[tuple]:
+        """Rows of a read statement; nothing, without creating it, if the database does not exist."""
+        if not self.exists():
+            return []
+        with self._lock:
+            return self._connect().execute(sql, tuple(params)).fetchall()
+
+    # ---------------------- Mapping interface ----------------------
+    def __getitem__(self, idx: int) -> Dict[str, Any]:
+        with self._lock:
+            row = self._connect().execute("SELECT data FROM chunks WHERE id = ?", (int(idx),)).fetchone()
+        if row is None:
+            raise KeyError(idx)
+        return json.loads(row[0])
+
+    def __setitem__(self, idx: int, meta: Dict[str, Any]) -> None:
+        with self._lock:
+            self._connect().execute("INSERT OR REPLACE INTO chunks (id, file_path, data) VALUES (?, ?, ?)",
+                                    self._row(idx, meta))
+
+    def __delitem__(self, idx: int) -> None:
+        with self._lock:
+            cursor = self._connect().execute("DELETE FROM chunks WHERE id = ?", (int(idx),))
+        if cursor.rowcount == 0:
+            raise KeyError(idx)
+
+    def __contains__(self, idx: object) -> bool:
+        try:
+            idx = int(idx)
+        except (TypeError, ValueError):
+            return False
+        with self._lock:
+            return self._connect().execute("SELECT 1 FROM chunks WHERE id = ?", (idx,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[int]:
+        with self._lock:
+            ids = [row[0] for row in self._connect().execute("SELECT id FROM chunks ORDER BY id")]
+        return iter(ids)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def items(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        with self._lock:
+            rows = self._connect().execute("SELECT id, data FROM chunks ORDER BY id").fetchall()
+        return ((idx, json.loads(data)) for idx, data in rows)
+
+    def values(self) -> Iterator[Dict[str, Any]]:
+        return (meta for _, meta in self.items())
+
+    def update(self, entries: Dict[int, Dict[str, Any]] = (), **kwargs) -> None:
+        with self._lock:
+            self._connect().executemany("INSERT OR REPLACE INTO chunks (id, file_path, data) VALUES (?, ?, ?)",
+                                        [self._row(idx, meta) for idx, meta in dict(entries).items()])
+
+    def clear(self) -> None:
+        if not self.exists():
+            return
+        with self._lock:
+            self._connect().execute("DELETE FROM chunks")
+
+    # ---------------------- Bulk and per-file helpers ----------------------
+    def get_many(self, ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """Fetch several entries at once; missing ids are left out."""
+        ids = [int(i) for i in ids]
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(ids), 500):
+                part = ids[start:start + 500]
+                rows = conn.execute(f"SELECT id, data FROM chunks WHERE id IN ({','.join('?' * len(part))})", part)
+                found.update((idx, json.loads(data)) for idx, data in rows)
+        return found
+
+    def delete_many(self, ids: Iterable[int]) -> None:
+        with self._lock:
+            self._connect().executemany("DELETE FROM chunks WHERE id = ?", [(int(i),) for i in ids])
+
+    def ids_for_files(self, file_paths: Iterable[str]) -> List[int]:
+        paths = list(file_paths)
+        ids = []
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(paths), 500):
+                part = paths[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT id FROM chunks WHERE file_path IN ({','.join('?' * len(part))}) ORDER BY id", part)
+                ids.extend(row[0] for row in rows)
+        return ids
+
+    def file_paths(self) -> Set[str]:
+        with self._lock:
+            return {row[0] for row in self._connect().execute("SELECT DISTINCT file_path FROM chunks")
+                    if row[0] is not None}
+
+    # ---------------------- Store-level state ----------------------
+    def get_state(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set_state(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._connect().execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                                    (key, json.dumps(value)))
+
+    # ---------------------- Transactions ----------------------
+    def commit(self) -> None:
+        with self._lock:
+            self._connect().commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.rollback()
+                self._conn.close()
+                self._conn = None
+
+    def import_entries(self, entries: Dict[int, Dict[str, Any]], state: Dict[str, Any]) -> None:
+        """Bulk-load entries and state, e.g. from a legacy JSON metadata file, and commit."""
+        self.update(entries)
+        for key, value in state.items():
+            self.set_state(key, value)
+        self.commit()
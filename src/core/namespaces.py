@@ -0,0 +1,132 @@
+import os
+import re
+import asyncio
+import logging
+import contextlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.core import vectorstore
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(handler)
+
+# Each repository namespace lives in REPOS_DIR/<repo_id>/: its checkout plus its index files.
+REPOS_DIR = os.environ.get("REPOS_DIR", "repos")
+# Requests without a repo id use the original single-repository layout.
+DEFAULT_CHECKOUT_DIR = "cloned_repo"
+MAX_LOADED_REPOS = int(os.environ.get("MAX_LOADED_REPOS", "16"))
+INDEX_MEMORY_BUDGET_MB = float(os.environ.get("INDEX_MEMORY_BUDGET_MB", "2048"))
+
+_REPO_ID_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,99}$")
+
+
+def validate_repo_id(repo_id: str) -> str:
+    """Repo ids become directory names, so only a conservative character set is allowed."""
+    if not _REPO_ID_PATTERN.match(repo_id or ""):
+        raise ValueError(f"Invalid repo id {repo_id!r}: use letters, digits, '.', '_' or '-' (max 100).")
+    return repo_id
+
+
+def namespace_dir(repo_id: str) -> Path:
+    return Path(REPOS_DIR) / validate_repo_id(repo_id)
+
+
+def checkout_dir(repo_id: Optional[str]) -> Path:
+    """Where the repository of a namespace is cloned."""
+    if repo_id is None:
+        return Path(DEFAULT_CHECKOUT_DIR)
+    return namespace_dir(repo_id) / "checkout"
+
+
+class RepoRegistry:
+    """
+    Keeps the indexes of recently used repository namespaces in memory.
+
+    A namespace is loaded from disk the first time it is used and stays resident
+    until it is the least recently used one and either more than max_loaded
+    namespaces are loaded or their indexes exceed the memory budget. Namespaces in
+    use by a request are pinned and never evicted; the default namespace (no repo
+    id) is owned by the vectorstore and always stays loaded.
+    """
+
+    def __init__(self, max_loaded: int = MAX_LOADED_REPOS, memory_budget_mb: float = INDEX_MEMORY_BUDGET_MB):
+        self.max_loaded = max(1, max_loaded)
+        self.memory_budget_bytes = memory_budget_mb * 1024 * 1024
+        self._loaded: "OrderedDict[str, vectorstore.RepoIndex]" = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        self._write_locks: Dict[Optional[str], asyncio.Lock] = {}
+
+    def exists(self, repo_id: Optional[str]) -> bool:
+        return repo_id is None or repo_id in self._loaded or namespace_dir(repo_id).exists()
+
+    def get(self, repo_id: Optional[str]) -> vectorstore.RepoIndex:
+        """Return the namespace's index, loading it from disk if it is not resident."""
+        if repo_id is None:
+            return vectorstore._default_index
+        index = self._loaded.get(repo_id)
+        if index is None:
+            directory = namespace_dir(repo_id)
+            directory.mkdir(parents=True, exist_ok=True)
+            index = vectorstore.RepoIndex(
+                str(directory / os.path.basename(vectorstore.FAISS_INDEX_FILE)),
+                str(directory / os.path.basename(vectorstore.METADATA_FILE)),
+                repo_id=repo_id,
+            )
+            self._loaded[repo_id] = index
+            logger.info(f"Loaded namespace {repo_id} ({index.faiss_index.ntotal} vectors).")
+        self._loaded.move_to_end(repo_id)
+        self._evict()
+        return index
+
+    @contextlib.contextmanager
+    def use(self, repo_id: Optional[str]):
+        """Make the namespace current (see vectorstore.use_index) and pin it while in use."""
+        index = self.get(repo_id)
+        if repo_id is not None:
+            self._pins[repo_id] = self._pins.get(repo_id, 0) + 1
+        try:
+            with vectorstore.use_index(index):
+                yield index
+        finally:
+            if repo_id is not None:
+                self._pins[repo_id] -= 1
+                if not self._pins[repo_id]:
+                    del self._pins[repo_id]
+                self._evict()
+
+    def write_lock(self, repo_id: Optional[str]) -> asyncio.Lock:
+        """Serializes clones and updates of one namespace; other namespaces proceed concurrently."""
+        return self._write_locks.setdefault(repo_id, asyncio.Lock())
+
+    def loaded_repos(self) -> List[str]:
+        """Resident namespaces, least recently used first."""
+        return list(self._loaded)
+
+    def memory_bytes(self) -> int:
+        return sum(index.memory_bytes() for index in self._loaded.values())
+
+    def unload(self, repo_id: str) -> bool:
+        if self._pins.get(repo_id) or repo_id not in self._loaded:
+            return False
+        self._loaded.pop(repo_id).close()
+        logger.info(f"Evicted namespace {repo_id} from memory.")
+        return True
+
+    def _evict(self) -> None:
+        # The most recently used namespace always stays, even if it alone exceeds the budget.
+        for repo_id in list(self._loaded)[:-1]:
+            if len(self._loaded) <= self.max_loaded and self.memory_bytes() <= self.memory_budget_bytes:
+                return
+            self.unload(repo_id)
+
+    def close(self) -> None:
+        for repo_id in list(self._loaded):
+            self._loaded.pop(repo_id).close()
+
+
+registry = RepoRegistry()
@@ -0,0 +1,165 @@
+import os
+import re
+import logging
+import contextlib
+import contextvars
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+from src.utils.metrics import openai_requests, openai_tokens, timed_stage
+from src.utils.rate_limiter import AdaptiveRateLimiter
+from src.utils.resilience import CircuitBreaker, call_with_retries
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(handler)
+
+# Budgets assumed until the API reports the account's actual limits.
+OPENAI_MAX_RPM = float(os.environ.get("OPENAI_MAX_RPM", "3000"))
+OPENAI_MAX_TPM = float(os.environ.get("OPENAI_MAX_TPM", "250000"))
+# Pause after a 429 that does not say how long to wait.
+OPENAI_RATE_LIMIT_PAUSE_SECONDS = float(os.environ.get("OPENAI_RATE_LIMIT_PAUSE_SECONDS", "1"))
+
+# Retries of transient failures (connection errors, timeouts, 429s and 5xx responses).
+OPENAI_RETRY_ATTEMPTS = int(os.environ.get("OPENAI_RETRY_ATTEMPTS", "4"))
+OPENAI_RETRY_BASE_DELAY = float(os.environ.get("OPENAI_RETRY_BASE_DELAY", "0.5"))
+OPENAI_RETRY_MAX_DELAY = float(os.environ.get("OPENAI_RETRY_MAX_DELAY", "20"))
+# Longest a single request may take, and all attempts of an interactive call together.
+OPENAI_ATTEMPT_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_ATTEMPT_TIMEOUT_SECONDS", "60"))
+OPENAI_INTERACTIVE_DEADLINE_SECONDS = float(os.environ.get("OPENAI_INTERACTIVE_DEADLINE_SECONDS", "90"))
+# Consecutive failures that open the circuit, and how long it stays open.
+OPENAI_BREAKER_FAILURES = int(os.environ.get("OPENAI_BREAKER_FAILURES", "5"))
+OPENAI_BREAKER_RESET_SECONDS = float(os.environ.get("OPENAI_BREAKER_RESET_SECONDS", "30"))
+# Send a second copy of a hedgeable interactive request still unanswered after this long (0 = off).
+OPENAI_HEDGE_AFTER_SECONDS = float(os.environ.get("OPENAI_HEDGE_AFTER_SECONDS", "0"))
+
+TRANSIENT_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+T = TypeVar("T")
+
+# Priority classes: interactive queries are served before bulk ingestion and analysis.
+INTERACTIVE, BULK = 0, 1
+
+# One limiter and one circuit breaker for all OpenAI traffic of the process, chat and embeddings alike.
+openai_limiter = AdaptiveRateLimiter(OPENAI_MAX_RPM, OPENAI_MAX_TPM)
+openai_breaker = CircuitBreaker(OPENAI_BREAKER_FAILURES, OPENAI_BREAKER_RESET_SECONDS)
+
+# Priority of the OpenAI requests made by the current task (see openai_priority).
+_current_priority: contextvars.ContextVar = contextvars.ContextVar("openai_priority", default=INTERACTIVE)
+
+@contextlib.contextmanager
+def openai_priority(priority: int):
+    """Send the OpenAI requests made within the block, and by tasks it starts, at priority."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+async def call_openai(request: Callable[[], Awaitable[T]], tokens: int, hedge: bool = False,
+                      kind: str = "chat") -> T:
+    """
+    Send request() (e.g. a lambda around aclient.chat.completions.create) resiliently.
+
+    Every attempt first waits for the shared limiter, then gets OPENAI_ATTEMPT_TIMEOUT_SECONDS;
+    transient failures are retried with jittered exponential backoff and, except for
+    429s, count towards the shared circuit breaker, which fails calls fast with
+    CircuitOpenError while the API is down. Bulk calls instead wait for the circuit to
+    let a trial through, so ingestion does not skip inputs during an outage. Interactive
+    calls also have an overall deadline, and with hedge=True they are hedged after
+    OPENAI_HEDGE_AFTER_SECONDS.
+
+    Calls are counted in the metrics by kind ("chat" or "embedding") and outcome, with
+    the tokens the response reports; chat calls are timed as the "llm" stage.
+    """
+    priority = _current_priority.get()
+    interactive = priority == INTERACTIVE
+    stage = timed_stage("llm") if kind == "chat" else contextlib.nullcontext()
+    try:
+        with stage:
+            response = await call_with_retries(
+                request,
+                attempts=OPENAI_RETRY_ATTEMPTS,
+                base_delay=OPENAI_RETRY_BASE_DELAY,
+                max_delay=OPENAI_RETRY_MAX_DELAY,
+                attempt_timeout=OPENAI_ATTEMPT_TIMEOUT_SECONDS,
+                deadline=OPENAI_INTERACTIVE_DEADLINE_SECONDS if interactive else None,
+                retry_on=TRANSIENT_ERRORS,
+                breaker=openai_breaker,
+                breaker_neutral=(openai.RateLimitError,),
+                hedge_after=OPENAI_HEDGE_AFTER_SECONDS if hedge and interactive else None,
+                before_attempt=lambda: openai_limiter.acquire(tokens, priority),
+                wait_for_breaker=not interactive,
+            )
+    except Exception:
+        openai_requests.labels(kind=kind, outcome="error").inc()
+        raise
+    openai_requests.labels(kind=kind, outcome="success").inc()
+    record_usage(getattr(response, "usage", None), kind)
+    return response
+
+
+def record_usage(usage, kind: str = "chat") -> None:
+    """Count the prompt and completion tokens of an OpenAI usage report in the metrics."""
+    if usage is None:
+        return
+    for direction, attribute in (("in", "prompt_tokens"), ("out", "completion_tokens")):
+        count = getattr(usage, attribute, None)
+        if isinstance(count, int) and count > 0:
+            openai_tokens.labels(kind=kind, direction=direction).inc(count)
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Seconds in an x-ratelimit-reset-* value such as "6m0s", "1.5s" or "20ms"."""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+def _header_float(headers, name: str) -> Optional[float]:
+    try:
+        return float(headers[name])
+    except (KeyError, ValueError):
+        return None
+
+def observe_response(status_code: int, headers) -> None:
+    """Adapt the shared limiter to the rate-limit headers of an OpenAI response."""
+    openai_limiter.update_limits(_header_float(headers, "x-ratelimit-limit-requests"),
+                                 _header_float(headers, "x-ratelimit-limit-tokens"))
+    openai_limiter.observe_remaining(_header_float(headers, "x-ratelimit-remaining-requests"),
+                                     _header_float(headers, "x-ratelimit-remaining-tokens"))
+    if status_code == 429:
+        delay = _header_float(headers, "retry-after")
+        if delay is None:
+            resets = [parse_reset(headers.get(name)) for name in
+                      ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")]
+            resets = [r for r in resets if r is not None]
+            delay = max(resets) if resets else OPENAI_RATE_LIMIT_PAUSE_SECONDS
+        logger.warning(f"Rate limited by the OpenAI API; pausing requests for {delay:.2f}s.")
+        openai_limiter.pause(delay)
+
+async def _on_response(response: httpx.Response) -> None:
+    observe_response(response.status_code, response.headers)
+
+
+def create_client() -> AsyncOpenAI:
+    """AsyncOpenAI client whose responses feed the shared limiter; call_openai does the retrying."""
+    return AsyncOpenAI(
+        api_key=os.environ.get("OPENAI_API_KEY"),
+        max_retries=0,
+        http_client=openai.DefaultAsyncHttpxClient(event_hooks={"response": [_on_response]}),
+    )
@@ -1,9 +1,10 @@
 import sys
 import os
+import re
 import shutil
+import hashlib
 import asyncio
 from pathlib import Path
-import aiofiles
 import logging
 
 # Add project root to sys.path so that src modules can be imported.
@@ -12,7 +13,9 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from src.utils.performance import measure_time
-from src.core.vectorstore import process_code_file
+from src.utils.metrics import timed_stage
+from src.core.ingestion import ingest_directory, current_progress
+from src.core.git_source import is_bare_repository
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -20,74 +23,227 @@ handler = logging.StreamHandler()
 handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
 logger.addHandler(handler)
 
+# Clone options: history depth (0 = full history), a partial-clone filter such as
+# "blob:limit=1m", and a directory of bare mirrors reused by later clones of the same URL.
+CLONE_DEPTH = int(os.environ.get("GIT_CLONE_DEPTH", "0"))
+CLONE_FILTER = os.environ.get("GIT_CLONE_FILTER", "")
+MIRROR_DIR = os.environ.get("GIT_MIRROR_DIR", "")
+# Clone without a working tree; ingestion then reads files from git objects (see git_source).
+CLONE_BARE = os.environ.get("GIT_CLONE_BARE", "0") != "0"
+
+_mirror_locks: dict = {}
+
+def mirror_path(repo_url: str) -> Path:
+    """Location of the bare mirror of repo_url inside MIRROR_DIR."""
+    digest = hashlib.sha256(repo_url.encode("utf-8")).hexdigest()[:16]
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", repo_url.rstrip("/").rsplit("/", 1)[-1])[:50]
+    return Path(MIRROR_DIR) / f"{name}-{digest}"
+
+async def update_mirror(repo_url: str) -> Path:
+    """
+    Create the bare mirror of repo_url, or fetch what it is missing, and return its path.
+    Mirrors hold complete objects so that checkouts cloned from them never have to fetch.
+    """
+    mirror = mirror_path(repo_url)
+    async with _mirror_locks.setdefault(str(mirror), asyncio.Lock()):
+        if (mirror / "HEAD").exists():
+            await run_git('fetch', '--prune', 'origin', cwd=mirror)
+            logger.info("Updated mirror %s of %s", mirror, repo_url)
+        else:
+            mirror.parent.mkdir(parents=True, exist_ok=True)
+            await run_git('clone', '--mirror', '--quiet', repo_url, str(mirror))
+            logger.info("Created mirror %s of %s", mirror, repo_url)
+    return mirror
+
+async def fetch_bare_head(repo_dir: Path) -> str:
+    """Fetch the remote's HEAD into a bare clone, move its HEAD there and return the commit."""
+    await run_git('fetch', '--quiet', 'origin', 'HEAD', cwd=repo_dir)
+    commit = (await run_git('rev-parse', 'FETCH_HEAD', cwd=repo_dir)).strip()
+    await run_git('update-ref', 'HEAD', commit, cwd=repo_dir)
+    return commit
+
+async def _origin_url(repo_dir: Path) -> str:
+    try:
+        return (await run_git('config', '--get', 'remote.origin.url', cwd=repo_dir)).strip()
+    except Exception:
+        return ""
+
 @measure_time
-async def clone_repository(repo_url: str, target_dir: Path) -> None:
+async def clone_repository(repo_url: str, target_dir: Path, depth: int = None,
+                           blob_filter: str = None, use_mirror: bool = None, bare: bool = None) -> None:
     """
     Clone a Git repository asynchronously.
-    If the target directory already exists, it is removed and re-cloned.
+    If the target directory already exists, it is removed and re-cloned, except that an
+    existing bare clone of the same URL is brought up to date with a fetch instead.
+
+    Only the history ingestion needs is downloaded: depth limits the clone to the last
+    commits (0 for full history) and blob_filter makes it a partial clone, e.g.
+    "blob:limit=1m" defers blobs over 1 MiB until they are needed. With use_mirror, the
+    URL's bare mirror under MIRROR_DIR is brought up to date and the checkout is cloned
+    from it locally instead (depth and filter do not apply), so repeated clones only
+    download new objects. With bare, no working tree is checked out at all. Defaults come
+    from GIT_CLONE_DEPTH, GIT_CLONE_FILTER, GIT_MIRROR_DIR and GIT_CLONE_BARE.
     """
+    depth = CLONE_DEPTH if depth is None else depth
+    blob_filter = CLONE_FILTER if blob_filter is None else blob_filter
+    use_mirror = bool(MIRROR_DIR) if use_mirror is None else use_mirror
+    bare = CLONE_BARE if bare is None else bare
+    bare_args = ['--bare'] if bare else []
+    if bare and is_bare_repository(target_dir) and await _origin_url(target_dir) == repo_url:
+        if use_mirror:
+            await update_mirror(repo_url)
+        commit = await fetch_bare_head(target_dir)
+        print(f"Updated existing clone {target_dir} to {commit[:12]}")
+        return
     if target_dir.exists():
         print(f"Target directory {target_dir} already exists. Removing it...")
-        shutil.rmtree(target_dir)
-    
+        await asyncio.to_thread(shutil.rmtree, target_dir)
+
+    if use_mirror:
+        mirror = await update_mirror(repo_url)
+        # A local clone hardlinks the mirror's objects; origin then points back at the real remote.
+        await run_git('clone', '--quiet', *bare_args, str(mirror), str(target_dir))
+        await run_git('remote', 'set-url', 'origin', repo_url, cwd=target_dir)
+    else:
+        args = ['clone', '--quiet', *bare_args]
+        if depth > 0:
+            args += ['--depth', str(depth)]
+        if blob_filter:
+            args.append(f'--filter={blob_filter}')
+        try:
+            await run_git(*args, repo_url, str(target_dir))
+        except Exception as e:
+            raise Exception(f"Error cloning repository: {e}")
+    print(f"Repository cloned to {target_dir}")
+
+@measure_time
+async def process_files(repo_dir: Path, skip: set = None) -> list:
+    """
+    Process all eligible files in the repository and return a list of processed file paths.
+    Eligible files include those with extensions .py, .txt, or .md; paths in skip are left out.
+    Reading, chunking, embedding and indexing run as concurrent pipeline stages
+    (see src.core.ingestion).
+    """
+    return await ingest_directory(repo_dir, skip=skip)
+
+async def run_git(*args: str, cwd: Path = None) -> str:
+    """Run a git command and return its stdout, raising on a non-zero exit status."""
     process = await asyncio.create_subprocess_exec(
-        'git', 'clone', repo_url, str(target_dir),
+        'git', *args,
+        cwd=str(cwd) if cwd else None,
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE
     )
     stdout, stderr = await process.communicate()
     if process.returncode != 0:
-        raise Exception(f"Error cloning repository: {stderr.decode().strip()}")
-    print(f"Repository cloned to {target_dir}")
+        raise Exception(f"Error running git {args[0]}: {stderr.decode().strip()}")
+    return stdout.decode()
 
-@measure_time
-async def process_files(repo_dir: Path) -> list:
+async def get_head_commit(repo_dir: Path) -> str:
+    return (await run_git('rev-parse', 'HEAD', cwd=repo_dir)).strip()
+
+async def diff_commits(repo_dir: Path, old_commit: str, new_commit: str) -> tuple:
     """
-    Process all eligible files in the repository and return a list of processed file paths.
-    Eligible files include those with extensions .py, .txt, or .md.
+    Compare two commits and return (changed, deleted) lists of repository-relative paths.
+    Renames are reported as a deletion of the old path plus an addition of the new one.
     """
-    processed_files = []
-    for file_path in repo_dir.rglob("*"):
-        if file_path.is_file() and file_path.suffix in ['.py', '.txt', '.md']:
-            try:
-                async with aiofiles.open(file_path, mode='r') as f:
-                    content = await f.read()
-                await process_code_file(str(file_path), content)
-                processed_files.append(file_path)
-            except Exception as e:
-                print(f"Error processing file {file_path}: {e}")
-    return processed_files
+    output = await run_git('diff', '--name-status', '--no-renames', '-z', old_commit, new_commit, cwd=repo_dir)
+    fields = output.split('\0')
+    changed, deleted = [], []
+    for status, path in zip(fields[0::2], fields[1::2]):
+        if status.startswith('D'):
+            deleted.append(path)
+        elif status:
+            changed.append(path)
+    return changed, deleted
 
 @measure_time
-async def clone_and_process_repository(repo_url: str, target_dir: str) -> None:
+async def clone_and_process_repository(repo_url: str, target_dir: str, resume: bool = True) -> list:
     """
     Clone the repository and process eligible files.
     This function removes any existing FAISS index and metadata files and resets the in-memory state.
+    If a previous ingestion of the same repository into target_dir was interrupted and resume is
+    True, the clone is kept and only files missing from the last checkpoint are processed.
+    Returns the list of processed file paths.
     """
-    # Remove existing FAISS index and metadata files.
-    faiss_index_file = os.environ.get("FAISS_INDEX_FILE", "faiss_index.idx")
-    metadata_file = os.environ.get("FAISS_METADATA_FILE", "faiss_metadata.json")
-    if os.path.exists(faiss_index_file):
-        os.remove(faiss_index_file)
-        print(f"Removed old FAISS index: {faiss_index_file}")
-    if os.path.exists(metadata_file):
-        os.remove(metadata_file)
-        print(f"Removed old metadata file: {metadata_file}")
-    
-    # Reset in-memory state in vectorstore.
     from src.core import vectorstore
-    vectorstore.metadata_store.clear()
-    vectorstore.global_id_counter = 0
-    import faiss
-    vectorstore.faiss_index = faiss.IndexFlatL2(vectorstore.DIMENSION)
-    print("Cleared in-memory vectorstore state.")
-
     target_path = Path(target_dir)
-    await clone_repository(repo_url, target_path)
-    processed_files = await process_files(target_path)
+    state = vectorstore.current_index().index_state
+    skip = set()
+    if (resume and state.get("status") == "in_progress" and state.get("repo_url") == repo_url
+            and state.get("repo_dir") == str(target_path) and target_path.exists()):
+        skip = vectorstore.indexed_file_paths()
+        print(f"Resuming interrupted ingestion; {len(skip)} files already indexed.")
+    else:
+        vectorstore.reset_index(remove_files=True)
+        print("Cleared in-memory vectorstore state.")
+        if current_progress() is not None:
+            current_progress().stage = "cloning"
+        with timed_stage("clone"):
+            await clone_repository(repo_url, target_path)
+        try:
+            commit = await get_head_commit(target_path)
+        except Exception as e:
+            logger.warning("Could not read HEAD of %s, incremental updates disabled: %s", target_path, e)
+            commit = None
+        vectorstore.set_index_state(repo_url=repo_url, repo_dir=str(target_path), commit=commit,
+                                    status="in_progress")
+
+    processed_files = await process_files(target_path, skip=skip)
+    vectorstore.set_index_state(status="complete")
+    processed_files = [Path(p) for p in sorted(skip)] + processed_files
     print("Processed files:")
     for f in processed_files:
         print(str(f))
+    return processed_files
+
+@measure_time
+async def update_repository(repo_url: str, target_dir: str) -> dict:
+    """
+    Bring an indexed clone up to date with its remote, re-indexing only what changed.
+
+    New commits are fetched and the old indexed HEAD is diffed against the new one:
+    vectors of deleted files are removed, and added or modified files are removed and
+    re-ingested. Falls back to a full clone_and_process_repository when there is no
+    indexed clone of repo_url to update.
+    """
+    from src.core import vectorstore
+    target_path = Path(target_dir)
+    index = vectorstore.current_index()
+    state = index.index_state
+    old_commit = state.get("commit")
+    if (not old_commit or state.get("status") != "complete" or state.get("repo_url") != repo_url
+            or state.get("repo_dir") != str(target_path)
+            or not ((target_path / ".git").exists() or is_bare_repository(target_path))):
+        logger.info("No indexed clone of %s to update; running a full ingestion.", repo_url)
+        processed = await clone_and_process_repository(repo_url, target_dir)
+        return {"mode": "full", "commit": index.index_state.get("commit"),
+                "files_processed": [str(f) for f in processed], "files_removed": []}
+
+    if current_progress() is not None:
+        current_progress().stage = "fetching"
+    with timed_stage("fetch"):
+        if is_bare_repository(target_path):
+            new_commit = await fetch_bare_head(target_path)
+        else:
+            await run_git('fetch', 'origin', cwd=target_path)
+            new_commit = (await run_git('rev-parse', '@{upstream}', cwd=target_path)).strip()
+            await run_git('reset', '--hard', new_commit, cwd=target_path)
+    changed, deleted = await diff_commits(target_path, old_commit, new_commit)
+    logger.info("Updating index from %s to %s: %d changed, %d deleted files.",
+                old_commit[:12], new_commit[:12], len(changed), len(deleted))
+
+    vectorstore.remove_file_embeddings([str(target_path / p) for p in changed + deleted])
+    for p in deleted:
+        index.file_manifest.remove_file(str(target_path / p))
+    processed = []
+    if changed:
+        processed = await ingest_directory(target_path, paths=[target_path / p for p in changed])
+    # Checkpoints the removals and additions together with the new commit.
+    vectorstore.set_index_state(commit=new_commit)
+    return {"mode": "incremental", "previous_commit": old_commit, "commit": new_commit,
+            "files_processed": [str(f) for f in processed],
+            "files_removed": [str(target_path / p) for p in deleted]}
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
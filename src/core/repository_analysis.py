@@ -2,9 +2,36 @@
 
 import os
 import asyncio
+import logging
 import aiofiles
 from pathlib import Path
-from src.core.assistant import analyze_code
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from src.core.assistant import analyze_code, CHAT_MODEL
+from src.core.chunking import chunk_file, estimate_tokens
+from src.core.git_source import GitObjectSource, is_bare_repository
+from src.core.openai_client import openai_priority, BULK
+from src.core.summary_cache import summary_cache
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(handler)
+
+# Summary requests in flight at once.
+ANALYSIS_CONCURRENCY = int(os.environ.get("ANALYSIS_CONCURRENCY", "8"))
+# Files larger than this are summarized in parts, and the parts reduced to one summary.
+ANALYSIS_FILE_MAX_TOKENS = int(os.environ.get("ANALYSIS_FILE_MAX_TOKENS", "6000"))
+# Summaries combined into one reduce request.
+ANALYSIS_REDUCE_MAX_TOKENS = int(os.environ.get("ANALYSIS_REDUCE_MAX_TOKENS", "3000"))
+
+FILE_PROMPT = "Summarize this file"
+DIRECTORY_PROMPT = ("Summarize this part of a repository based on the following summaries of its files "
+                    "and directories:")
+REPOSITORY_PROMPT = "Based on the following file summaries, provide an overall analysis of the project:"
+
+# analyze_code reports failures as an answer starting with this; such answers are not cached.
+_ERROR_PREFIX = "Error calling OpenAI API"
 
 def is_text_file(file_path: Path) -> bool:
     """Simple heuristic to filter text files (adjust as needed)."""
@@ -12,38 +39,157 @@ def is_text_file(file_path: Path) -> bool:
     text_extensions = {'.py', '.js', '.ts', '.java', '.c', '.cpp', '.h', '.html', '.css', '.md', '.txt'}
     return file_path.suffix in text_extensions
 
-async def analyze_repository(repo_path: str) -> str:
+
+class RepositorySummarizer:
     """
-    Analyze all text files in the repository and produce an overall analysis.
+    Map-reduce summarization of a repository.
+
+    Map: every file is summarized on its own (large files in parts), at most
+    `concurrency` requests at a time. Reduce: summaries are combined bottom-up along
+    the directory tree. A directory whose entries fit in reduce_max_tokens is passed
+    up as is; a larger one is condensed into a single directory summary, in several
+    rounds if its entries do not fit in one request. Sibling directories are reduced
+    concurrently, and the repository-level analysis is written from what reaches the
+    root. Every summary is cached by the hash of its prompt and input, so a re-run
+    only summarizes changed files and the directories above them.
     """
+
+    def __init__(self, summarize: Optional[Callable[[str, str], Awaitable[str]]] = None,
+                 concurrency: int = ANALYSIS_CONCURRENCY, cache=summary_cache,
+                 file_max_tokens: int = ANALYSIS_FILE_MAX_TOKENS,
+                 reduce_max_tokens: int = ANALYSIS_REDUCE_MAX_TOKENS):
+        self._summarize = summarize
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.cache = cache
+        self.file_max_tokens = file_max_tokens
+        self.reduce_max_tokens = reduce_max_tokens
+        self.requests = 0
+        self.cache_hits = 0
+
+    async def summarize_text(self, prompt: str, text: str) -> str:
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cache.get, prompt, text, CHAT_MODEL)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
+        # Looked up per call so the module-level analyze_code can be replaced.
+        summarize = self._summarize or analyze_code
+        async with self._semaphore:
+            self.requests += 1
+            summary = await summarize(prompt, text)
+        if self.cache is not None and not summary.startswith(_ERROR_PREFIX):
+            await asyncio.to_thread(self.cache.put, prompt, text, summary, CHAT_MODEL)
+        return summary
+
+    async def summarize_file(self, path: str, content: str) -> str:
+        parts = chunk_file(path, content, max_tokens=self.file_max_tokens, overlap_tokens=0)
+        if len(parts) <= 1:
+            return await self.summarize_text(FILE_PROMPT, content)
+        summaries = await asyncio.gather(*(self.summarize_text(FILE_PROMPT, part) for part in parts))
+        return await self._condense(FILE_PROMPT, [f"Lines {p.start_line}-{p.end_line}: {s}"
+                                                  for p, s in zip(parts, summaries)])
+
+    def _group(self, entries: List[str]) -> List[List[str]]:
+        # Consecutive entries up to the reduce budget, but at least two per group so
+        # every round shrinks the number of entries.
+        groups: List[List[str]] = []
+        tokens = 0
+        for entry in entries:
+            entry_tokens = estimate_tokens(entry)
+            if groups and (len(groups[-1]) < 2 or tokens + entry_tokens <= self.reduce_max_tokens):
+                groups[-1].append(entry)
+                tokens += entry_tokens
+            else:
+                groups.append([entry])
+                tokens = entry_tokens
+        if len(groups) > 1 and len(groups[-1]) < 2:
+            groups[-2].extend(groups.pop())
+        return groups
+
+    async def _condense(self, prompt: str, entries: List[str], group_prompt: str = DIRECTORY_PROMPT) -> str:
+        """Answer prompt over entries, reducing them in groups first while they exceed the budget."""
+        while len(entries) > 1 and sum(estimate_tokens(e) for e in entries) > self.reduce_max_tokens:
+            groups = self._group(entries)
+            if len(groups) == 1:
+                break
+            entries = list(await asyncio.gather(
+                *(self.summarize_text(group_prompt, "\n".join(group)) for group in groups)))
+        return await self.summarize_text(prompt, "\n".join(entries))
+
+    async def _reduce_directory(self, path: str, node: Dict[str, Any]) -> List[str]:
+        """Entries describing the directory at path, condensed to one if they exceed the budget."""
+        subdirectories = await asyncio.gather(*(
+            self._reduce_directory(f"{path}{name}/", child) for name, child in sorted(node["dirs"].items())))
+        entries = [f"File {path}{name} summary: {summary}" for name, summary in sorted(node["files"].items())]
+        for sub_entries in subdirectories:
+            entries.extend(sub_entries)
+        if not path or sum(estimate_tokens(e) for e in entries) <= self.reduce_max_tokens:
+            return entries
+        return [f"Directory {path} summary: {await self._condense(DIRECTORY_PROMPT, entries)}"]
+
+    async def summarize(self, files: Dict[str, str]) -> str:
+        """Overall analysis of files, a mapping of repository-relative path to content."""
+        paths = sorted(files)
+        summaries = await asyncio.gather(*(self.summarize_file(p, files[p]) for p in paths))
+        root: Dict[str, Any] = {"files": {}, "dirs": {}}
+        for path, summary in zip(paths, summaries):
+            *directories, name = path.split("/")
+            node = root
+            for directory in directories:
+                node = node["dirs"].setdefault(directory, {"files": {}, "dirs": {}})
+            node["files"][name] = summary
+        entries = await self._reduce_directory("", root)
+        analysis = await self._condense(REPOSITORY_PROMPT, entries)
+        logger.info(f"Analyzed {len(files)} files with {self.requests} summary requests "
+                    f"({self.cache_hits} summaries from cache).")
+        return analysis
+
+
+async def read_repository_files(repo_path: str, concurrency: int = ANALYSIS_CONCURRENCY) -> Dict[str, str]:
+    """Contents of the repository's text files by relative path, from git objects for a bare clone."""
     base_path = Path(repo_path)
-    summaries = []
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    contents: Dict[str, str] = {}
+
+    if is_bare_repository(base_path):
+        async with GitObjectSource(base_path) as source:
+            paths = [p for p in await source.list_files() if is_text_file(Path(p))]
+            async def read_object(rel_path: str) -> None:
+                try:
+                    contents[rel_path] = await source.read_text(rel_path)
+                except Exception as e:
+                    logger.error(f"Error reading file {rel_path}: {e}")
+            await asyncio.gather(*(read_object(p) for p in paths))
+        return contents
 
+    paths: List[Tuple[str, Path]] = []
     # Walk through the repository, skipping .git directory
     for root, dirs, files in os.walk(base_path):
-        # Skip .git directory
         if ".git" in dirs:
             dirs.remove(".git")
         for file in files:
             file_path = Path(root) / file
-            if not is_text_file(file_path):
-                continue  # Skip non-text files
-            
+            if is_text_file(file_path):
+                paths.append((file_path.relative_to(base_path).as_posix(), file_path))
+
+    async def read_file(rel_path: str, file_path: Path) -> None:
+        async with semaphore:
             try:
                 async with aiofiles.open(file_path, mode='r') as f:
-                    content = await f.read()
-                
-                # Generate a brief summary for the file
-                file_summary = await analyze_code("Summarize this file", content)
-                summaries.append(f"File {file_path} summary: {file_summary}")
+                    contents[rel_path] = await f.read()
             except Exception as e:
-                # Log the error or skip files that cause issues
-                continue
-
-    # Combine all individual summaries into one prompt
-    aggregated_summary = "\n".join(summaries)
-    overall_analysis = await analyze_code(
-        "Based on the following file summaries, provide an overall analysis of the project:",
-        aggregated_summary
-    )
-    return overall_analysis
\ No newline at end of file
+                # Skip files that cause issues
+                logger.error(f"Error reading file {file_path}: {e}")
+    await asyncio.gather(*(read_file(rel, path) for rel, path in paths))
+    return contents
+
+
+async def analyze_repository(repo_path: str) -> str:
+    """
+    Analyze all text files in the repository and produce an overall analysis.
+    See RepositorySummarizer for how file summaries are produced and combined.
+    """
+    files = await read_repository_files(repo_path)
+    with openai_priority(BULK):
+        # Looked up per call so the module-level summary_cache can be replaced.
+        return await RepositorySummarizer(cache=summary_cache).summarize(files)
@@ -0,0 +1,127 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from src.utils.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(handler)
+
+RAG_CACHE_MAX_ENTRIES = int(os.environ.get("RAG_CACHE_MAX_ENTRIES", "1024"))
+RAG_CACHE_TTL_SECONDS = float(os.environ.get("RAG_CACHE_TTL_SECONDS", "3600"))
+# Minimum cosine similarity between a new query and an answered one for the answer to be reused.
+RAG_CACHE_SIMILARITY = float(os.environ.get("RAG_CACHE_SIMILARITY", "0.95"))
+
+
+class _Entry:
+    __slots__ = ("namespace", "version", "vector", "query", "response", "created")
+
+    def __init__(self, namespace: Hashable, version: Hashable, vector: np.ndarray, query: str,
+                 response: str, created: float):
+        self.namespace = namespace
+        self.version = version
+        self.vector = vector
+        self.query = query
+        self.response = response
+        self.created = created
+
+
+class SemanticResponseCache:
+    """
+    In-memory cache of generated answers, matched by query embedding.
+
+    Entries belong to a namespace (the repository plus anything else that must match
+    exactly, such as a file the query is about) and to the version of the index they
+    were answered from. A lookup returns the answer to the most similar cached query
+    of the same namespace and version if its cosine similarity reaches the threshold.
+    Entries expire after ttl_seconds, the least recently used ones are evicted beyond
+    max_entries, and entries of a namespace are dropped as soon as a different index
+    version of it is seen.
+    """
+
+    def __init__(self, max_entries: int = RAG_CACHE_MAX_ENTRIES, ttl_seconds: float = RAG_CACHE_TTL_SECONDS,
+                 similarity_threshold: float = RAG_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._next_key = 0
+        self._versions: Dict[Hashable, Hashable] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def _drop(self, keys: List[int]) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def _sync_version(self, namespace: Hashable, version: Hashable) -> None:
+        # A new index version of the namespace invalidates everything answered from older ones.
+        if self._versions.get(namespace, version) != version:
+            self._drop([k for k, e in self._entries.items() if e.namespace == namespace])
+        self._versions[namespace] = version
+
+    def get(self, namespace: Hashable, version: Hashable, vector: List[float]) -> Optional[Tuple[str, float]]:
+        """Return (response, similarity) of the best matching cached answer, or None."""
+        query = self._normalize(vector)
+        now = time.time()
+        with self._lock:
+            self._sync_version(namespace, version)
+            self._drop([k for k, e in self._entries.items() if now - e.created > self.ttl_seconds])
+            candidates = [(k, e) for k, e in self._entries.items() if e.namespace == namespace]
+            if candidates:
+                scores = np.stack([e.vector for _, e in candidates]) @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    record_cache_lookup("response", 1)
+                    return entry.response, float(scores[best])
+            self.misses += 1
+            record_cache_lookup("response", 0, 1)
+            return None
+
+    def put(self, namespace: Hashable, version: Hashable, vector: List[float], query: str, response: str) -> None:
+        entry = _Entry(namespace, version, self._normalize(vector), query, response, time.time())
+        with self._lock:
+            self._sync_version(namespace, version)
+            self._entries[self._next_key] = entry
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, namespace: Hashable = None) -> None:
+        """Forget the answers of one namespace, or of all of them."""
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+                self._versions.clear()
+            else:
+                self._drop([k for k, e in self._entries.items() if e.namespace == namespace])
+                self._versions.pop(namespace, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._entries)}
+
+
+# Shared answer cache used by generate_rag_response; disabled when RAG_CACHE_MAX_ENTRIES is 0.
+response_cache = SemanticResponseCache() if RAG_CACHE_MAX_ENTRIES > 0 else None
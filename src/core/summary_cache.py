@@ -0,0 +1,116 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+
+from src.utils.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(handler)
+
+SUMMARY_CACHE_FILE = os.environ.get("SUMMARY_CACHE_FILE", "summary_cache.sqlite")
+SUMMARY_CACHE_MAX_ENTRIES = int(os.environ.get("SUMMARY_CACHE_MAX_ENTRIES", "100000"))
+
+
+def summary_key(prompt: str, text: str) -> str:
+    """SHA-256 of the instruction and the summarized text, e.g. a file's content."""
+    return hashlib.sha256(f"{prompt}\0{text}".encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """
+    Persistent cache of LLM summaries keyed by (sha256 of prompt and text, model).
+
+    Re-running a repository analysis only summarizes files whose content changed, and
+    directories whose inputs changed. Like the embedding cache, entries live in SQLite
+    and the least recently used ones are evicted beyond max_entries.
+    """
+
+    def __init__(self, path: str, max_entries: int = SUMMARY_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._entries = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                " key TEXT NOT NULL,"
+                " model TEXT NOT NULL,"
+                " summary TEXT NOT NULL,"
+                " last_access REAL NOT NULL,"
+                " PRIMARY KEY (key, model))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_last_access ON summaries (last_access)")
+            conn.commit()
+            self._entries = conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+            self._conn = conn
+            logger.info(f"Opened summary cache {self.path} with {self._entries} entries.")
+        return self._conn
+
+    def get(self, prompt: str, text: str, model: str) -> Optional[str]:
+        key = summary_key(prompt, text)
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT summary FROM summaries WHERE key = ? AND model = ?", (key, model)).fetchone()
+            if row is None:
+                self.misses += 1
+                record_cache_lookup("summary", 0, 1)
+                return None
+            conn.execute("UPDATE summaries SET last_access = ? WHERE key = ? AND model = ?",
+                         (time.time(), key, model))
+            conn.commit()
+            self.hits += 1
+            record_cache_lookup("summary", 1)
+            return row[0]
+
+    def put(self, prompt: str, text: str, summary: str, model: str) -> None:
+        key = summary_key(prompt, text)
+        with self._lock:
+            conn = self._connect()
+            exists = conn.execute("SELECT 1 FROM summaries WHERE key = ? AND model = ?", (key, model)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, model, summary, last_access) VALUES (?, ?, ?, ?)",
+                (key, model, summary, time.time()),
+            )
+            if exists is None:
+                self._entries += 1
+            overflow = self._entries - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM summaries WHERE rowid IN "
+                    "(SELECT rowid FROM summaries ORDER BY last_access LIMIT ?)",
+                    (overflow,),
+                )
+                self._entries -= overflow
+                self.evictions += overflow
+            conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._connect()
+            entries = self._entries
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": entries}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Shared cache used by repository analysis; disabled when SUMMARY_CACHE_FILE is empty.
+summary_cache = SummaryCache(SUMMARY_CACHE_FILE) if SUMMARY_CACHE_FILE else None
@@ -0,0 +1,155 @@
+import os
+import re
+import ast
+import json
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from src.core.metadata_store import MetadataStore
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(handler)
+
+# Longest docstring summary kept per symbol.
+SYMBOL_DOC_MAX_CHARS = int(os.environ.get("SYMBOL_DOC_MAX_CHARS", "200"))
+
+# Questions about what a file contains rather than how it works.
+_STRUCTURAL_QUERY = re.compile(
+    r"\b(functions?|methods?|class(es)?|symbols?|outline|structure|signatures?|definitions?|defined)\b",
+    re.IGNORECASE,
+)
+
+
+def is_structural_query(query: str) -> bool:
+    """Whether query asks about the functions, classes or structure of code."""
+    return bool(_STRUCTURAL_QUERY.search(query))
+
+
+def _doc_summary(node: ast.AST) -> Optional[str]:
+    doc = ast.get_docstring(node)
+    if not doc:
+        return None
+    summary = " ".join(doc.split("\n\n")[0].split())
+    if len(summary) > SYMBOL_DOC_MAX_CHARS:
+        summary = summary[:SYMBOL_DOC_MAX_CHARS - 3].rstrip() + "..."
+    return summary
+
+
+def _signature(node: ast.AST) -> str:
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(b) for b in node.bases] + [ast.unparse(k) for k in node.keywords]
+        return f"class {node.name}({', '.join(bases)})" if bases else f"class {node.name}"
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    signature = f"{prefix} {node.name}({ast.unparse(node.args)})"
+    if node.returns is not None:
+        signature += f" -> {ast.unparse(node.returns)}"
+    return signature
+
+
+def _collect(body: List[ast.stmt], scope: str, in_class: bool, symbols: List[Dict[str, Any]]) -> None:
+    for node in body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        if isinstance(node, ast.ClassDef):
+            kind = "class"
+        else:
+            kind = "method" if in_class else "function"
+        symbols.append({
+            "name": f"{scope}{node.name}",
+            "kind": kind,
+            "signature": _signature(node),
+            "doc": _doc_summary(node),
+            "start_line": node.decorator_list[0].lineno if node.decorator_list else node.lineno,
+            "end_line": node.end_lineno,
+        })
+        # Members of classes are listed; functions nested in functions are implementation details.
+        if isinstance(node, ast.ClassDef):
+            _collect(node.body, f"{scope}{node.name}.", True, symbols)
+
+
+def extract_python_symbols(text: str) -> List[Dict[str, Any]]:
+    """Classes, functions and methods of Python source, in source order."""
+    symbols: List[Dict[str, Any]] = []
+    _collect(ast.parse(text).body, "", False, symbols)
+    return symbols
+
+
+EXTRACTORS: Dict[str, Callable[[str], List[Dict[str, Any]]]] = {".py": extract_python_symbols}
+
+
+def register_extractor(suffix: str, extractor: Callable[[str], List[Dict[str, Any]]]) -> None:
+    """Use extractor(text) to list the symbols of files ending in suffix."""
+    EXTRACTORS[suffix.lower()] = extractor
+
+
+def extract_symbols(file_path: str, text: str) -> Optional[List[Dict[str, Any]]]:
+    """Symbols of file_path, or None if its type has no extractor or it does not parse."""
+    extractor = EXTRACTORS.get(Path(file_path).suffix.lower())
+    if extractor is None or not isinstance(text, str):
+        return None
+    try:
+        return extractor(text)
+    except (SyntaxError, ValueError) as e:
+        logger.warning(f"Could not extract symbols from {file_path}: {e}")
+        return None
+
+
+def format_outline(file_path: str, symbols: List[Dict[str, Any]]) -> str:
+    """Compact outline of a file: one line per symbol with its lines and docstring summary."""
+    lines = [f"Outline of {file_path} ({len(symbols)} symbols):"]
+    for symbol in symbols:
+        indent = "  " * symbol["name"].count(".")
+        line = f"{indent}{symbol['signature']}  [lines {symbol['start_line']}-{symbol['end_line']}]"
+        if symbol.get("doc"):
+            line += f": {symbol['doc']}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+class SymbolTable:
+    """
+    The classes, functions and methods of every ingested file that has an extractor.
+
+    Filled during ingestion from the same contents that are chunked; every file's
+    symbols are a row of the namespace's metadata database, committed with it at
+    every checkpoint. The query path answers questions about a file's structure
+    from its outline instead of its full text.
+    """
+
+    def __init__(self, store: MetadataStore):
+        self.store = store
+
+    def record(self, file_path: str, text: str) -> None:
+        self.put(file_path, extract_symbols(file_path, text))
+
+    def put(self, file_path: str, symbols: Optional[List[Dict[str, Any]]]) -> None:
+        """Store symbols returned by extract_symbols; None removes those of file_path."""
+        if symbols is None:
+            self.remove_file(file_path)
+        else:
+            self.store.execute("INSERT OR REPLACE INTO symbols (file_path, data) VALUES (?, ?)",
+                               (file_path, json.dumps(symbols, separators=(",", ":"))))
+
+    def remove_file(self, file_path: str) -> None:
+        if self.store.exists():
+            self.store.execute("DELETE FROM symbols WHERE file_path = ?", (file_path,))
+
+    def symbols(self, file_path: str) -> Optional[List[Dict[str, Any]]]:
+        """Symbols recorded for file_path, None if none were."""
+        rows = self.store.query("SELECT data FROM symbols WHERE file_path = ?", (file_path,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def clear(self) -> None:
+        if self.store.exists():
+            self.store.execute("DELETE FROM symbols")
+
+    def __len__(self) -> int:
+        rows = self.store.query("SELECT COUNT(*) FROM symbols")
+        return rows[0][0] if rows else 0
+
+    def __contains__(self, file_path: object) -> bool:
+        return bool(self.store.query("SELECT 1 FROM symbols WHERE file_path = ?", (str(file_path),)))
@@ -5,16 +5,28 @@ import asyncio
 import logging
 import os
 import json
-from typing import List, Dict, Any
+import re
+from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
 import faiss
 import concurrent.futures
-import openai
-from openai import AsyncOpenAI
 import time
-import functools
+import contextlib
+import contextvars
+import itertools
 
 from src.utils.performance import measure_time
+from src.utils.metrics import timed_stage
+from src.core.embedding_cache import embedding_cache
+from src.core.metadata_store import MetadataStore
+from src.core import index_factory
+from src.core.file_manifest import FileManifest
+from src.core.lexical_index import LexicalIndex
+from src.core.symbol_table import SymbolTable
+from src.core.chunking import Chunk, chunk_file, estimate_tokens
+from src.core.openai_client import create_client
+from src.core.embedding_backends import create_embedding_backend
+from src.utils.resilience import CircuitOpenError
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -22,46 +34,326 @@ handler = logging.StreamHandler()
 handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
 logger.addHandler(handler)
 
-DIMENSION = 1536  # Embedding dimension
+# Paced by the process-wide OpenAI limiter, see openai_client.
+aclient = create_client()
+# Selected by EMBEDDING_BACKEND; the index dimension and the cache key follow the backend.
+embedding_backend = create_embedding_backend(aclient)
+DIMENSION = embedding_backend.dimension
+EMBEDDING_MODEL = embedding_backend.model
+# Limits for a single multi-input embeddings request.
+EMBEDDING_BATCH_MAX_ITEMS = int(os.environ.get("EMBEDDING_BATCH_MAX_ITEMS", "256"))
+EMBEDDING_BATCH_MAX_TOKENS = int(os.environ.get("EMBEDDING_BATCH_MAX_TOKENS", "100000"))
 FAISS_INDEX_FILE = os.environ.get("FAISS_INDEX_FILE", "faiss_index.idx")
-METADATA_FILE = os.environ.get("FAISS_METADATA_FILE", "faiss_metadata.json")
+METADATA_FILE = os.environ.get("FAISS_METADATA_FILE", "faiss_metadata.db")
+# Ingestion persists the index at checkpoints: after this many stored files or seconds.
+CHECKPOINT_EVERY_FILES = int(os.environ.get("INDEX_CHECKPOINT_FILES", "200"))
+CHECKPOINT_EVERY_SECONDS = float(os.environ.get("INDEX_CHECKPOINT_SECONDS", "30"))
 
-if os.path.exists(FAISS_INDEX_FILE):
-    faiss_index = faiss.read_index(FAISS_INDEX_FILE)
-    logger.info(f"Loaded FAISS index from {FAISS_INDEX_FILE}.")
-else:
-    faiss_index = faiss.IndexFlatL2(DIMENSION)
-    logger.info("Created new FAISS index.")
+def new_index() -> faiss.Index:
+    """
+    Create an empty ID-mapped flat index so vectors can be removed by metadata id.
+    Ingestion fills this exact index; finalize_index swaps in the configured ANN type.
+    """
+    return index_factory.build_index("flat", DIMENSION)
 
-if os.path.exists(METADATA_FILE):
+def _upgrade_index(index: faiss.Index) -> faiss.Index:
+    """
+    Bring an index written by an older version up to date: append-only indexes, whose
+    positions were the metadata ids, become ID-mapped, and L2 indexes are rebuilt as
+    cosine (inner-product over normalized vectors) indexes of the same type.
+    """
+    is_id_mapped = isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2))
+    index_type = index_factory.index_type_of(index)
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT and (is_id_mapped or index_type != "flat"):
+        return index
+    ids, vectors = index_factory.index_contents(index)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if len(vectors):
+        faiss.normalize_L2(vectors)
+    upgraded = index_factory.train_and_fill(index_type, DIMENSION, ids, vectors)
+    logger.info(f"Converted FAISS index with {index.ntotal} vectors to an ID-mapped cosine {index_type} index.")
+    return upgraded
+
+def lexical_text(meta: Dict[str, Any]) -> str:
+    """What the lexical index matches a chunk by: its path, symbol and text."""
+    return f"{meta.get('file_path', '')}\n{meta.get('symbol') or ''}\n{meta.get('chunk_text', '')}"
+
+# Process-wide source of index versions, so a reloaded namespace never reuses an old one.
+_index_versions = itertools.count(1)
+
+class RepoIndex:
+    """
+    The FAISS index, chunk metadata, file manifest, lexical (BM25) index and symbol
+    table of one repository namespace.
+
+    Every namespace persists to its own index file and metadata database, which also
+    holds the file manifest, the lexical index and the symbol table, and is loaded from their last
+    checkpoint when constructed; src.core.namespaces decides which namespaces stay
+    in memory. The module-level functions below act on the namespace that is current
+    for the running task (see use_index).
+    """
+
+    def __init__(self, index_file: str, metadata_file: str, repo_id: Optional[str] = None):
+        self.repo_id = repo_id
+        self.index_file = index_file
+        self.metadata_file = metadata_file
+        self.faiss_index: faiss.Index = None
+        self.metadata_store: Optional[MetadataStore] = None
+        self.file_manifest: Optional[FileManifest] = None
+        self.lexical_index: Optional[LexicalIndex] = None
+        self.symbol_table: Optional[SymbolTable] = None
+        self.global_id_counter = 0
+        # Describes what the index was built from, e.g. {"repo_url": ..., "commit": ...}.
+        self.index_state: Dict[str, Any] = {}
+        # Files stored since the last checkpoint and when that checkpoint happened.
+        self.uncommitted_files = 0
+        self.last_checkpoint = time.monotonic()
+        # Changes whenever the searchable contents may have changed; answers are cached per version.
+        self.version = 0
+        self.load()
+
+    def mark_changed(self) -> None:
+        self.version = next(_index_versions)
+
+    def _legacy_metadata_file(self) -> str:
+        """The JSON document older versions stored metadata in, next to metadata_file."""
+        return os.path.splitext(self.metadata_file)[0] + ".json"
+
+    def _metadata_db_file(self) -> str:
+        # Older .env files point FAISS_METADATA_FILE at the JSON document; keep the database beside it.
+        if self.metadata_file.endswith(".json"):
+            return os.path.splitext(self.metadata_file)[0] + ".db"
+        return self.metadata_file
+
+    def _migrate_legacy_metadata(self) -> None:
+        legacy_file = self._legacy_metadata_file()
+        if not os.path.exists(legacy_file) or len(self.metadata_store):
+            return
+        try:
+            with open(legacy_file, "r") as f:
+                meta_data = json.load(f)
+            entries = {int(k): v for k, v in meta_data.get("metadata_store", {}).items()}
+            # Older versions had no lexical index; committed together with the entries.
+            self.lexical_index.add_many((idx, lexical_text(meta)) for idx, meta in entries.items())
+            self.metadata_store.import_entries(entries, {
+                "global_id_counter": meta_data.get("global_id_counter", 0),
+                "index_state": meta_data.get("index_state", {}),
+            })
+            logger.info(f"Migrated {len(entries)} metadata entries from {legacy_file}.")
+        except Exception as e:
+            logger.error(f"Error migrating legacy metadata from {legacy_file}: {e}")
+
+    def _reconcile(self) -> None:
+        """
+        Drop vectors written after the last metadata checkpoint.
+        The index is written before the metadata is committed, so a crash in between
+        leaves vectors with ids the metadata never handed out; they are removed here and
+        re-ingested on resume. Manifest and lexical rows were rolled back with the metadata.
+        """
+        if self.faiss_index.ntotal == 0:
+            return
+        index_ids = index_factory.index_ids(self.faiss_index)
+        orphans = index_ids[index_ids >= self.global_id_counter]
+        if len(orphans):
+            index_factory.remove_ids(self.faiss_index, orphans)
+            logger.warning(f"Removed {len(orphans)} vectors written after the last metadata checkpoint.")
+
+    def load(self) -> None:
+        """Load the index and metadata from their last checkpoint, or start empty."""
+        stale = False
+        if os.path.exists(self.index_file):
+            index = faiss.read_index(self.index_file)
+            # Built by another embedding backend; its vectors cannot be searched with ours.
+            stale = index.d != DIMENSION
+            self.faiss_index = new_index() if stale else _upgrade_index(index)
+            logger.info(f"Loaded FAISS index from {self.index_file}.")
+        else:
+            self.faiss_index = new_index()
+            logger.info("Created new FAISS index.")
+
+        if self.metadata_store is not None:
+            # Anything not committed at the last checkpoint is discarded, as after a restart.
+            self.metadata_store.close()
+        db_file = self._metadata_db_file()
+        self.metadata_store = MetadataStore(db_file)
+        self.file_manifest = FileManifest(self.metadata_store)
+        self.lexical_index = LexicalIndex(self.metadata_store)
+        self.symbol_table = SymbolTable(self.metadata_store)
+        self.global_id_counter = 0
+        self.index_state = {}
+        if os.path.exists(db_file) or os.path.exists(self._legacy_metadata_file()):
+            try:
+                self._migrate_legacy_metadata()
+                self.global_id_counter = self.metadata_store.get_state("global_id_counter", 0)
+                self.index_state = self.metadata_store.get_state("index_state", {})
+                # Indexes written before backends were pluggable do not record their model.
+                stale = stale or self.metadata_store.get_state("embedding_model", EMBEDDING_MODEL) != EMBEDDING_MODEL
+                logger.info(f"Loaded metadata from {db_file} with global_id_counter {self.global_id_counter}.")
+            except Exception as e:
+                logger.error(f"Error loading metadata: {e}")
+        if stale:
+            logger.warning(f"{self.index_file} holds embeddings of another model than {EMBEDDING_MODEL}; "
+                           "starting empty, re-ingest the repository to rebuild it.")
+            self.reset(remove_files=False)
+        self._reconcile()
+        self.uncommitted_files = 0
+        self.last_checkpoint = time.monotonic()
+        self.mark_changed()
+
+    def close(self) -> None:
+        """Release the namespace; like a restart, work since the last checkpoint is dropped."""
+        if self.metadata_store is not None:
+            self.metadata_store.close()
+        self.faiss_index = None
+
+    def memory_bytes(self) -> int:
+        return index_factory.memory_bytes(self.faiss_index) if self.faiss_index is not None else 0
+
+    def save_metadata(self) -> None:
+        """Commit pending metadata rows together with the id counter and index state."""
+        try:
+            self.metadata_store.set_state("global_id_counter", self.global_id_counter)
+            self.metadata_store.set_state("index_state", self.index_state)
+            self.metadata_store.set_state("embedding_model", EMBEDDING_MODEL)
+            self.metadata_store.commit()
+            logger.info(f"Metadata committed to {self.metadata_store.path}.")
+        except Exception as e:
+            logger.error(f"Error saving metadata: {e}")
+
+    def save_index(self) -> None:
+        """Write the index through a temporary file renamed into place."""
+        tmp_path = f"{self.index_file}.tmp"
+        faiss.write_index(self.faiss_index, tmp_path)
+        os.replace(tmp_path, self.index_file)
+        logger.info(f"FAISS index saved to {self.index_file}.")
+
+    def checkpoint(self) -> None:
+        """
+        Persist the index and then commit the metadata database (metadata, file manifest,
+        lexical index and symbol table), making everything stored so far durable.
+        """
+        self.save_index()
+        self.save_metadata()
+        self.uncommitted_files = 0
+        self.last_checkpoint = time.monotonic()
+
+    def reset(self, remove_files: bool = True) -> None:
+        """Drop all vectors and metadata, optionally deleting the persisted files too."""
+        if remove_files:
+            for path in (self.index_file, self._legacy_metadata_file()):
+                if os.path.exists(path):
+                    os.remove(path)
+                    logger.info(f"Removed {path}.")
+        self.metadata_store.clear()
+        self.file_manifest.clear()
+        self.lexical_index.clear()
+        self.symbol_table.clear()
+        self.global_id_counter = 0
+        self.index_state = {}
+        self.faiss_index = new_index()
+        self.uncommitted_files = 0
+        self.mark_changed()
+        if remove_files:
+            self.save_metadata()
+
+
+_default_index: Optional[RepoIndex] = None
+# The namespace module-level functions act on; unset means the default namespace.
+_current_index: contextvars.ContextVar = contextvars.ContextVar("vectorstore_current_index", default=None)
+
+def current_index() -> RepoIndex:
+    return _current_index.get() or _default_index
+
+@contextlib.contextmanager
+def use_index(index: RepoIndex):
+    """
+    Make index the current namespace for the calling task and the tasks it creates,
+    so concurrent requests can work on different repositories at the same time.
+    """
+    token = _current_index.set(index)
     try:
-        with open(METADATA_FILE, "r") as f:
-            meta_data = json.load(f)
-        metadata_store = {int(k): v for k, v in meta_data.get("metadata_store", {}).items()}
-        global_id_counter = meta_data.get("global_id_counter", 0)
-        logger.info(f"Loaded metadata from {METADATA_FILE} with global_id_counter {global_id_counter}.")
-    except Exception as e:
-        logger.error(f"Error loading metadata: {e}")
-        metadata_store = {}
-        global_id_counter = 0
-else:
-    metadata_store: Dict[int, Dict[str, Any]] = {}
-    global_id_counter = 0
+        yield index
+    finally:
+        _current_index.reset(token)
+
+def load_index() -> None:
+    """(Re)load the default namespace, stored at FAISS_INDEX_FILE / METADATA_FILE."""
+    global _default_index
+    if _default_index is not None:
+        _default_index.close()
+    _default_index = RepoIndex(FAISS_INDEX_FILE, METADATA_FILE)
 
-aclient = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+
+load_index()
 
 def save_metadata():
-    try:
-        with open(METADATA_FILE, "w") as f:
-            json.dump({
-                "global_id_counter": global_id_counter,
-                "metadata_store": {str(k): v for k, v in metadata_store.items()}
-            }, f, indent=2)
-        logger.info(f"Metadata saved to {METADATA_FILE}.")
-    except Exception as e:
-        logger.error(f"Error saving metadata: {e}")
+    current_index().save_metadata()
+
+def save_index():
+    current_index().save_index()
+
+def checkpoint() -> None:
+    """Persist the current namespace's index, file manifest and metadata."""
+    current_index().checkpoint()
+
+def maybe_checkpoint() -> bool:
+    """Checkpoint if enough files or time have accumulated since the last one."""
+    index = current_index()
+    if index.uncommitted_files == 0:
+        return False
+    if (index.uncommitted_files >= CHECKPOINT_EVERY_FILES
+            or time.monotonic() - index.last_checkpoint >= CHECKPOINT_EVERY_SECONDS):
+        index.checkpoint()
+        return True
+    return False
+
+def finalize_index(index_type: str = None) -> bool:
+    """
+    Rebuild the index as the configured type once ingestion has stored its vectors.
+
+    With FAISS_INDEX_TYPE=auto the type follows the corpus size (see
+    index_factory.choose_index_type). IVF types are trained on the stored vectors;
+    if there are too few of them to train, the current index is kept. Returns True
+    when the index was rebuilt.
+    """
+    index = current_index()
+    index_type = index_type or index_factory.FAISS_INDEX_TYPE
+    n_vectors = index.faiss_index.ntotal
+    if index_type == "auto":
+        index_type = index_factory.choose_index_type(n_vectors)
+    current_type = index_factory.index_type_of(index.faiss_index)
+    if index_type == current_type:
+        return False
+    if n_vectors < index_factory.min_training_vectors(index_type, n_vectors):
+        logger.info(f"Only {n_vectors} vectors; keeping the {current_type} index instead of {index_type}.")
+        return False
+    ids, vectors = index_factory.index_contents(index.faiss_index)
+    index.faiss_index = index_factory.train_and_fill(index_type, DIMENSION, ids, vectors)
+    index.mark_changed()
+    logger.info(f"Rebuilt FAISS index as {index_type} with {n_vectors} vectors (was {current_type}).")
+    return True
+
+def indexed_file_paths() -> set:
+    """Paths of the files that currently have vectors in the index."""
+    return current_index().metadata_store.file_paths()
+
+def reset_index(remove_files: bool = True) -> None:
+    """Drop all vectors and metadata of the current namespace, optionally deleting its files too."""
+    current_index().reset(remove_files)
+
+def set_index_state(**state: Any) -> None:
+    """Record what the index was built from and checkpoint it together with the index."""
+    index = current_index()
+    index.index_state.update(state)
+    index.mark_changed()
+    index.checkpoint()
+
+def file_path_from_chunk_id(file_chunk_id: str) -> str:
+    m = re.match(r"(.*)_chunk_\d+$", file_chunk_id)
+    return m.group(1) if m else file_chunk_id
 
 def chunk_text(text: str, chunk_size: int = 2000) -> List[str]:
+    """Fixed-size slices of text; ingestion uses the syntax-aware chunk_file instead."""
     try:
         if not isinstance(text, str):
             raise ValueError("Expected text to be a string.")
@@ -72,23 +364,109 @@ def chunk_text(text: str, chunk_size: int = 2000) -> List[str]:
         logger.error(f"Error chunking text: {e}")
         return []
 
+async def _embed_and_cache(text: str, cacheable: bool, stage: str) -> List[float]:
+    """
+    Embed text through the backend, timed as stage, storing the vector in the embedding
+    cache if cacheable.
+    """
+    with timed_stage(stage):
+        embedding = await embedding_backend.embed_one(text)
+    logger.debug(f"Generated embedding of length {len(embedding)} for text of length {len(text)}.")
+    if cacheable:
+        await asyncio.to_thread(embedding_cache.put, text, embedding, EMBEDDING_MODEL)
+    return embedding
+
 @measure_time
 async def generate_embedding(text: str) -> List[float]:
+    cacheable = embedding_cache is not None and embedding_backend.cacheable
+    if cacheable:
+        cached = await asyncio.to_thread(embedding_cache.get, text, EMBEDDING_MODEL)
+        if cached is not None:
+            return cached
     try:
-        response = await aclient.embeddings.create(
-            input=text,
-            model="text-embedding-ada-002"
-        )
-        embedding = response.data[0].embedding
-        logger.debug(f"Generated embedding of length {len(embedding)} for text of length {len(text)}.")
-        return embedding
+        return await _embed_and_cache(text, cacheable, "embed_query")
     except Exception as e:
         logger.error(f"Error generating embedding: {e}")
         raise
 
+def plan_embedding_batches(texts: List[str],
+                           max_items: int = EMBEDDING_BATCH_MAX_ITEMS,
+                           max_tokens: int = EMBEDDING_BATCH_MAX_TOKENS) -> List[List[int]]:
+    """
+    Group text indices into batches that respect both an item and a token budget.
+    A single text larger than the token budget still gets a batch of its own.
+    """
+    batches = []
+    current: List[int] = []
+    current_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= max_items or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+@measure_time
+async def generate_embeddings(texts: List[str]) -> List[Optional[List[float]]]:
+    """
+    Embed many texts in batches through the embedding backend.
+
+    Texts already in the embedding cache are served from disk, off the event loop, and
+    only the misses are sent to the backend. Results are returned in input order. If a
+    whole batch request fails, its texts are retried one by one so a single bad input
+    does not drop the rest of the batch; texts that still fail come back as None. An
+    open circuit breaker is not retried around: its CircuitOpenError is raised.
+    """
+    cacheable = embedding_cache is not None and embedding_backend.cacheable
+    if cacheable:
+        results: List[Optional[List[float]]] = await asyncio.to_thread(embedding_cache.get_many, texts,
+                                                                       EMBEDDING_MODEL)
+    else:
+        results = [None] * len(texts)
+    missing = [i for i, r in enumerate(results) if r is None]
+    if len(missing) < len(texts):
+        logger.info(f"Embedding cache served {len(texts) - len(missing)} of {len(texts)} texts.")
+    missing_texts = [texts[i] for i in missing]
+    for batch in plan_embedding_batches(missing_texts):
+        batch_texts = [missing_texts[j] for j in batch]
+        try:
+            with timed_stage("embed"):
+                vectors = await embedding_backend.embed(batch_texts)
+            for j, vector in zip(batch, vectors):
+                results[missing[j]] = vector
+            if cacheable:
+                fetched = [(t, v) for t, v in zip(batch_texts, vectors) if v is not None]
+                await asyncio.to_thread(embedding_cache.put_many, [t for t, _ in fetched],
+                                        [v for _, v in fetched], EMBEDDING_MODEL)
+            logger.debug(f"Generated {len(batch_texts)} embeddings in one batch.")
+        except CircuitOpenError:
+            # Every text would fail fast as well and its chunks would be lost; fail the caller instead.
+            raise
+        except Exception as e:
+            logger.error(f"Error generating batch of {len(batch)} embeddings, retrying individually: {e}")
+            for j in batch:
+                try:
+                    # Already looked up in the cache above; ingestion time, not query time.
+                    results[missing[j]] = await _embed_and_cache(missing_texts[j], cacheable, "embed")
+                except CircuitOpenError:
+                    raise
+                except Exception as inner_e:
+                    logger.error(f"Error generating embedding for text {missing[j]}: {inner_e}")
+    return results
+
 @measure_time
-async def store_embeddings(embeddings: Dict[str, Any], chunk_texts: Dict[str, str]) -> None:
-    global global_id_counter, faiss_index, metadata_store
+async def store_embeddings(embeddings: Dict[str, Any], chunk_texts: Dict[str, str]) -> List[int]:
+    """
+    Add embeddings to the index under fresh metadata ids and return those ids.
+    Chunks produced by chunk_file also record their line range and symbol.
+    Nothing is written to disk here; the index is persisted at the next checkpoint.
+    """
+    index = current_index()
     try:
         new_vectors = []
         new_metadata = {}
@@ -98,34 +476,74 @@ async def store_embeddings(embeddings: Dict[str, Any], chunk_texts: Dict[str, st
                 logger.error(f"Embedding dimension mismatch for {file_chunk_id}. Expected {DIMENSION}, got {np_vector.shape[0]}")
                 continue
             new_vectors.append(np_vector)
-            new_metadata[global_id_counter] = {
+            chunk = chunk_texts[file_chunk_id]
+            new_metadata[index.global_id_counter] = {
                 "file_chunk_id": file_chunk_id,
-                "chunk_text": chunk_texts[file_chunk_id]
+                "file_path": file_path_from_chunk_id(file_chunk_id),
+                "chunk_text": str(chunk),
+                **(chunk.location() if isinstance(chunk, Chunk) else {})
             }
-            global_id_counter += 1
+            index.global_id_counter += 1
 
         if new_vectors:
             vectors_np = np.vstack(new_vectors)
+            # Normalized vectors make the index's inner product a cosine similarity.
+            faiss.normalize_L2(vectors_np)
+            ids_np = np.fromiter(new_metadata.keys(), dtype=np.int64, count=len(new_metadata))
             loop = asyncio.get_running_loop()
+            faiss_index = index.faiss_index
             def add_vectors():
-                faiss_index.add(vectors_np)
-            with concurrent.futures.ThreadPoolExecutor() as pool:
-                await loop.run_in_executor(pool, add_vectors)
-            metadata_store.update(new_metadata)
+                faiss_index.add_with_ids(vectors_np, ids_np)
+            with timed_stage("index_add"):
+                with concurrent.futures.ThreadPoolExecutor() as pool:
+                    await loop.run_in_executor(pool, add_vectors)
+                index.metadata_store.update(new_metadata)
+                for file_path in {meta["file_path"] for meta in new_metadata.values()}:
+                    index.file_manifest.add_file(file_path)
+                index.lexical_index.add_many((idx, lexical_text(meta)) for idx, meta in new_metadata.items())
             logger.info(f"Stored {len(new_vectors)} embeddings in FAISS index.")
-            faiss.write_index(faiss_index, FAISS_INDEX_FILE)
-            logger.info(f"FAISS index saved to {FAISS_INDEX_FILE}.")
-            save_metadata()
+            index.uncommitted_files += 1
+            index.mark_changed()
+            maybe_checkpoint()
         else:
             logger.warning("No new vectors to store.")
+        return list(new_metadata.keys())
     except Exception as e:
         logger.error(f"Error storing embeddings in FAISS: {e}")
         raise
 
+def remove_file_embeddings(file_paths: List[str]) -> int:
+    """
+    Remove the vectors and metadata of every chunk belonging to file_paths.
+    Like store_embeddings, the removal becomes durable at the next checkpoint.
+    """
+    index = current_index()
+    targets = set(file_paths)
+    for path in targets:
+        index.symbol_table.remove_file(path)
+    ids = index.metadata_store.ids_for_files(targets)
+    if not ids:
+        return 0
+    index_factory.remove_ids(index.faiss_index, np.array(ids, dtype=np.int64))
+    index.metadata_store.delete_many(ids)
+    index.lexical_index.remove(ids)
+    index.mark_changed()
+    logger.info(f"Removed {len(ids)} embeddings for {len(targets)} files.")
+    return len(ids)
+
+def record_symbols(file_path: str, content: str) -> None:
+    """Record the symbols of file_path in the symbol table; durable at the next checkpoint."""
+    current_index().symbol_table.record(file_path, content)
+
+def store_symbols(file_path: str, symbols: Optional[List[Dict[str, Any]]]) -> None:
+    """Store symbols already extracted from file_path; durable at the next checkpoint."""
+    current_index().symbol_table.put(file_path, symbols)
+
 @measure_time
 async def process_code_file(file_path: str, content: str) -> None:
     try:
-        chunks = chunk_text(content)
+        record_symbols(file_path, content)
+        chunks = chunk_file(file_path, content)
         if not chunks:
             logger.warning(f"No chunks generated for file: {file_path}")
         embeddings = {}
@@ -146,8 +564,57 @@ async def process_code_file(file_path: str, content: str) -> None:
         logger.error(f"Error processing file {file_path}: {e}")
         raise
 
-def query_faiss(query_vector: List[float], k: int = 1) -> Dict[str, Any]:
+async def embed_chunked_files(files: List[Tuple[str, List[str]]]) -> Dict[str, Tuple[Dict[str, Any], Dict[str, str]]]:
+    """
+    Embed the chunks of several files with shared batched requests.
+    Returns, per file path that got at least one embedding, the (embeddings, chunk_texts)
+    dictionaries expected by store_embeddings.
+    """
+    chunk_owners = []
+    all_chunks = []
+    for file_path, chunks in files:
+        for i, chunk in enumerate(chunks):
+            chunk_owners.append((file_path, i))
+            all_chunks.append(chunk)
+
+    vectors = await generate_embeddings(all_chunks)
+
+    per_file: Dict[str, Tuple[Dict[str, Any], Dict[str, str]]] = {}
+    for (file_path, i), chunk, vector in zip(chunk_owners, all_chunks, vectors):
+        if vector is None:
+            logger.error(f"Error processing chunk {i} in file {file_path}: no embedding generated")
+            continue
+        embeddings, chunk_texts = per_file.setdefault(file_path, ({}, {}))
+        key = f"{file_path}_chunk_{i}"
+        embeddings[key] = vector
+        chunk_texts[key] = chunk
+    return per_file
+
+def query_faiss(query_vector: List[float], k: int = 1, min_score: Optional[float] = None,
+                nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Search the index for the k chunks most similar to query_vector.
+
+    Scores are cosine similarities (higher is closer) and are returned under both
+    "scores" and, for existing callers, "distances". With min_score, a range search
+    returns only chunks scoring above it, best first and at most k of them; without
+    it, the k nearest chunks are returned padded with id -1. nprobe (IVF) and
+    ef_search (HNSW) trade speed for recall and default to FAISS_NPROBE /
+    FAISS_EF_SEARCH; flat indexes ignore them.
+    """
+    faiss_index = current_index().faiss_index
     np_query = np.array(query_vector, dtype=np.float32).reshape(1, -1)
-    distances, indices = faiss_index.search(np_query, k)
-    return {"distances": distances, "indices": indices}
+    faiss.normalize_L2(np_query)
+    index_factory.apply_search_params(faiss_index, k, nprobe=nprobe, ef_search=ef_search)
+    with timed_stage("search"):
+        if min_score is None:
+            distances, indices = faiss_index.search(np_query, k)
+        else:
+            scores, ids = index_factory.range_search(faiss_index, np_query, min_score, k)
+            distances, indices = scores.reshape(1, -1), ids.reshape(1, -1)
+    return {"distances": distances, "indices": indices, "scores": distances}
 
+def query_lexical(query: str, k: int = 10) -> List[Tuple[int, float]]:
+    """The k chunks best matching query by BM25, as (metadata id, score) pairs, best first."""
+    with timed_stage("lexical_search"):
+        return current_index().lexical_index.search(query, k)
@@ -0,0 +1,319 @@
+import os
+import math
+import time
+import bisect
+import logging
+import threading
+import contextlib
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import psutil
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(handler)
+
+# Seconds between two samples of the process's memory, CPU and thread count.
+METRICS_SAMPLE_SECONDS = float(os.environ.get("METRICS_SAMPLE_SECONDS", "5"))
+
+# Upper bounds (seconds) of the latency histograms: from a cached lookup to a full clone.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric(ABC):
+    """A named family of series, one per combination of label values."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _new_series(self):
+        """A series of this metric's kind, for one combination of label values."""
+
+    def labels(self, **labels: str):
+        """The series with these label values, created on first use."""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, self._new_series())
+        return series
+
+    def _unlabelled(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} has labels {self.labelnames}; use labels()")
+        return self.labels()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, series in sorted(self._series.items()):
+            lines.extend(series.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def render(self, name: str, labelnames: Sequence[str], key: LabelValues) -> List[str]:
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class _GaugeValue(_Value):
+    def set(self, value: float) -> None:
+        self.value = float(value)
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+
+class Counter(_Metric):
+    """A total that only goes up, such as requests served or tokens sent."""
+
+    kind = "counter"
+
+    def _new_series(self):
+        return _Value()
+
+    def inc(self, amount: float = 1) -> None:
+        self._unlabelled().inc(amount)
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, such as memory in use."""
+
+    kind = "gauge"
+
+    def _new_series(self):
+        return _GaugeValue()
+
+    def set(self, value: float) -> None:
+        self._unlabelled().set(value)
+
+
+class _HistogramValue:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextlib.contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the duration of the block, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def render(self, name: str, labelnames: Sequence[str], key: LabelValues) -> List[str]:
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            cumulative += count
+            labels = _format_labels(labelnames, key, f'le="{_format_value(bound)}"')
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _format_labels(labelnames, key)
+        lines.append(f"{name}_sum{labels} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{labels} {self.count}")
+        return lines
+
+
+class Histogram(_Metric):
+    """
+    Observations counted into cumulative buckets, plus their sum and count, so the
+    scraper can compute rates, means and quantiles (histogram_quantile) over any window.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._unlabelled().observe(value)
+
+    def time(self):
+        return self._unlabelled().time()
+
+
+class MetricsRegistry:
+    """
+    The process's metrics, rendered in the Prometheus text exposition format.
+
+    counter, gauge and histogram return the metric registered under a name, creating
+    it on first use, so modules can declare the metrics they update at import time.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered as a different {metric.kind}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+# ---------------------- Pipeline Metrics ----------------------
+stage_seconds = metrics.histogram(
+    "repo_analysis_stage_duration_seconds",
+    "Duration of each pipeline stage (clone, fetch, read, chunk, embed, embed_query, index_add, search,"
+    " lexical_search, llm).",
+    ["stage"])
+openai_requests = metrics.counter(
+    "repo_analysis_openai_requests_total", "OpenAI API calls by kind and outcome.", ["kind", "outcome"])
+openai_tokens = metrics.counter(
+    "repo_analysis_openai_tokens_total", "Tokens reported by the OpenAI API, by kind and direction.",
+    ["kind", "direction"])
+cache_requests = metrics.counter(
+    "repo_analysis_cache_requests_total", "Cache lookups by cache and result (hit or miss).",
+    ["cache", "result"])
+
+
+def timed_stage(stage: str):
+    """Context manager observing the duration of the block as pipeline stage."""
+    return stage_seconds.labels(stage=stage).time()
+
+
+def record_cache_lookup(cache: str, hits: int, misses: int = 0) -> None:
+    if hits:
+        cache_requests.labels(cache=cache, result="hit").inc(hits)
+    if misses:
+        cache_requests.labels(cache=cache, result="miss").inc(misses)
+
+
+class ProcessSampler:
+    """
+    Samples the process's resident memory, CPU usage, threads and open files every
+    METRICS_SAMPLE_SECONDS on a daemon thread, into gauges.
+
+    Requests read the latest sample instead of querying the OS themselves.
+    """
+
+    def __init__(self, interval: float = METRICS_SAMPLE_SECONDS, registry: MetricsRegistry = metrics):
+        self.interval = interval
+        self._process = psutil.Process()
+        self._rss = registry.gauge("process_resident_memory_bytes", "Resident memory size in bytes.")
+        self._cpu = registry.gauge("process_cpu_percent", "CPU usage since the previous sample, in percent.")
+        self._threads = registry.gauge("process_threads", "Number of OS threads.")
+        self._fds = registry.gauge("process_open_fds", "Number of open file descriptors.")
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.last_sample: Optional[float] = None
+
+    def sample(self) -> None:
+        try:
+            with self._process.oneshot():
+                self._rss.set(self._process.memory_info().rss)
+                self._cpu.set(self._process.cpu_percent(interval=None))
+                self._threads.set(self._process.num_threads())
+                if hasattr(self._process, "num_fds"):
+                    self._fds.set(self._process.num_fds())
+        except psutil.Error as e:
+            logger.warning(f"Could not sample process stats: {e}")
+        self.last_sample = time.monotonic()
+
+    @property
+    def rss_bytes(self) -> float:
+        """Resident memory at the latest sample (taken now if there is none yet)."""
+        if self.last_sample is None:
+            self.sample()
+        return self._rss.labels().value
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self) -> None:
+        """Start sampling in the background; does nothing if already started."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.sample()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="process-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+process_sampler = ProcessSampler()
@@ -2,15 +2,25 @@ import time
 import functools
 import logging
 
+from src.utils.metrics import metrics
+
 logger = logging.getLogger(__name__)
 
+function_seconds = metrics.histogram(
+    "repo_analysis_function_duration_seconds", "Duration of functions decorated with measure_time.",
+    ["function"])
+
 def measure_time(func):
-    """Async decorator to measure execution time of a function."""
+    """Async decorator to measure execution time of a function, logged and recorded in the metrics."""
+    series = function_seconds.labels(function=func.__name__)
+
     @functools.wraps(func)
     async def wrapper(*args, **kwargs):
         start = time.perf_counter()
-        result = await func(*args, **kwargs)
-        elapsed = time.perf_counter() - start
-        logger.info(f"{func.__name__} took {elapsed:.4f} seconds")
-        return result
-    return wrapper
\ No newline at end of file
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            series.observe(elapsed)
+            logger.info(f"{func.__name__} took {elapsed:.4f} seconds")
+    return wrapper
@@ -1,4 +1,5 @@
 import asyncio
+import heapq
 import time
 
 class AsyncRateLimiter:
@@ -37,4 +38,115 @@ class AsyncRateLimiter:
 
     async def __aexit__(self, exc_type, exc, tb):
         # Nothing special to do on exit.
-        pass
\ No newline at end of file
+        pass
+
+class AdaptiveRateLimiter:
+    """
+    Paces requests against both a requests-per-minute and a tokens-per-minute budget.
+
+    Each budget is a bucket that refills continuously and holds at most one minute's
+    worth. acquire(tokens, priority) waits until both buckets can pay for the request;
+    waiters are served strictly by priority (lower first), then in arrival order, so a
+    backlog of low-priority work never delays a high-priority request for longer than
+    the budget requires. update_limits, observe_remaining and pause let callers adapt
+    the budgets to what the server reports.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters = []
+        self._sequence = 0
+        self._timer = None
+        self.waits = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def _delay_for(self, tokens: float) -> float:
+        # A request larger than a whole minute's budget only waits for a full bucket.
+        tokens = min(tokens, self.tokens_per_minute)
+        delay = max(0.0, self._paused_until - time.monotonic())
+        if self._requests < 1:
+            delay = max(delay, (1 - self._requests) * 60 / self.requests_per_minute)
+        if self._tokens < tokens:
+            delay = max(delay, (tokens - self._tokens) * 60 / self.tokens_per_minute)
+        return delay
+
+    def _schedule(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._refill()
+        while self._waiters:
+            _, _, tokens, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            delay = self._delay_for(tokens)
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._schedule)
+                return
+            heapq.heappop(self._waiters)
+            self._requests -= 1
+            self._tokens -= min(tokens, self.tokens_per_minute)
+            future.set_result(None)
+
+    async def acquire(self, tokens: int = 0, priority: int = 0) -> None:
+        """Wait until a request using about `tokens` tokens may be sent."""
+        future = asyncio.get_running_loop().create_future()
+        self._sequence += 1
+        heapq.heappush(self._waiters, (priority, self._sequence, tokens, future))
+        self._schedule()
+        if not future.done():
+            self.waits += 1
+            try:
+                await future
+            finally:
+                if future.cancelled():
+                    self._schedule()
+
+    def update_limits(self, requests_per_minute: float = None, tokens_per_minute: float = None) -> None:
+        """Adopt new per-minute budgets, e.g. the limits a server reports for the account."""
+        self._refill()
+        if requests_per_minute:
+            self.requests_per_minute = requests_per_minute
+            self._requests = min(self._requests, requests_per_minute)
+        if tokens_per_minute:
+            self.tokens_per_minute = tokens_per_minute
+            self._tokens = min(self._tokens, tokens_per_minute)
+        if self._waiters:
+            self._schedule()
+
+    def observe_remaining(self, requests: float = None, tokens: float = None) -> None:
+        """Never assume more budget than the server says is left."""
+        self._refill()
+        if requests is not None:
+            self._requests = min(self._requests, requests)
+        if tokens is not None:
+            self._tokens = min(self._tokens, tokens)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every request for `seconds`, e.g. after being rate limited."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._requests = min(self._requests, 0.0)
+        self._tokens = min(self._tokens, 0.0)
+
+    def stats(self) -> dict:
+        self._refill()
+        return {
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute,
+            "available_requests": round(self._requests, 2),
+            "available_tokens": round(self._tokens, 2),
+            "waiting": sum(1 for *_, future in self._waiters if not future.done()),
+            "waits": self.waits,
+        }
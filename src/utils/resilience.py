@@ -0,0 +1,204 @@
+import time
+import random
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional, Tuple, Type, TypeVar
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+logger.addHandler(handler)
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class DeadlineExceededError(asyncio.TimeoutError):
+    """Raised when the deadline has passed before an attempt could be sent, e.g. while rate limited."""
+
+
+class CircuitBreaker:
+    """
+    Sheds calls to an upstream that keeps failing.
+
+    After failure_threshold consecutive failures the circuit opens and check() raises
+    CircuitOpenError right away. Once reset_timeout has passed, a single trial call is
+    let through (half-open): its success closes the circuit, its failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+
+    def check(self) -> None:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError("Upstream circuit is open; failing fast.")
+            self.state = self.HALF_OPEN
+            self._trial_running = False
+        if self.state == self.HALF_OPEN:
+            if self._trial_running:
+                raise CircuitOpenError("Upstream circuit is half-open; a trial call is in flight.")
+            self._trial_running = True
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info("Upstream recovered; closing circuit.")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Opening circuit after {self.failures} consecutive failures.")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._trial_running = False
+
+    def release(self) -> None:
+        """End a half-open trial whose outcome says nothing about the upstream's health."""
+        self._trial_running = False
+
+    def retry_after(self) -> float:
+        """Seconds until check() may let a call through again (0 if it would now)."""
+        if self.state == self.OPEN:
+            return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+        if self.state == self.HALF_OPEN and self._trial_running:
+            # The trial's outcome decides; look again shortly.
+            return min(1.0, self.reset_timeout)
+        return 0.0
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(max_delay, base_delay * 2**attempt)]."""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+async def hedged(call: Callable[[], Awaitable[T]], hedge_after: float,
+                 before_hedge: Optional[Callable[[], Awaitable[None]]] = None) -> T:
+    """
+    Run call; if it has not finished after hedge_after seconds, start a second copy and
+    return whichever succeeds first, cancelling the other. Only worth it for idempotent
+    calls where tail latency matters more than the cost of the duplicate request.
+    before_hedge, e.g. waiting for a rate limiter, is awaited ahead of the second copy.
+    """
+    first = asyncio.ensure_future(call())
+    try:
+        return await asyncio.wait_for(asyncio.shield(first), hedge_after)
+    except asyncio.TimeoutError:
+        pass
+    except BaseException:
+        first.cancel()
+        raise
+    async def second_copy() -> T:
+        if before_hedge is not None:
+            await before_hedge()
+        return await call()
+
+    second = asyncio.ensure_future(second_copy())
+    pending = {first, second}
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def call_with_retries(call: Callable[[], Awaitable[T]], *, attempts: int = 4,
+                            base_delay: float = 0.5, max_delay: float = 20.0,
+                            attempt_timeout: Optional[float] = None, deadline: Optional[float] = None,
+                            retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+                            breaker: Optional[CircuitBreaker] = None,
+                            breaker_neutral: Tuple[Type[BaseException], ...] = (),
+                            hedge_after: Optional[float] = None,
+                            before_attempt: Optional[Callable[[], Awaitable[None]]] = None,
+                            wait_for_breaker: bool = False) -> T:
+    """
+    Call with jittered exponential backoff between attempts.
+
+    Each attempt may take at most attempt_timeout seconds and all of them together at
+    most deadline seconds; a backoff that would cross the deadline is not taken.
+    Only exceptions in retry_on are retried, and only those count as failures for the
+    breaker, which is consulted before every attempt; breaker_neutral ones (e.g. being
+    rate limited) are retried without counting. before_attempt, e.g. waiting for
+    a rate limiter, is awaited ahead of each attempt (and of its hedge copy) and outside
+    its timeout; if it uses up the deadline, DeadlineExceededError is raised without
+    counting against the breaker. With hedge_after, every attempt is hedged (see hedged).
+    An open breaker raises CircuitOpenError, or with wait_for_breaker (for background
+    work that must not skip inputs) is waited out until it lets a trial call through.
+    """
+    retry_on = tuple(retry_on) + (asyncio.TimeoutError,)
+    give_up_at = time.monotonic() + deadline if deadline else None
+    attempts = max(1, attempts)
+    for attempt in range(attempts):
+        while breaker is not None:
+            try:
+                breaker.check()
+                break
+            except CircuitOpenError:
+                if not wait_for_breaker:
+                    raise
+                delay = breaker.retry_after()
+                logger.warning(f"Circuit is open; waiting {delay:.1f}s for it to let a trial call through.")
+                await asyncio.sleep(delay)
+        single = call if not hedge_after else (lambda: hedged(call, hedge_after, before_attempt))
+        try:
+            if before_attempt is not None:
+                await before_attempt()
+            timeout = attempt_timeout
+            if give_up_at is not None:
+                remaining = give_up_at - time.monotonic()
+                if remaining <= 0:
+                    raise DeadlineExceededError(f"Deadline of {deadline}s passed before attempt {attempt + 1}.")
+                timeout = remaining if timeout is None else min(timeout, remaining)
+            result = await asyncio.wait_for(single(), timeout) if timeout is not None else await single()
+        except DeadlineExceededError:
+            # The upstream was never called, so this says nothing about its health.
+            if breaker is not None:
+                breaker.release()
+            raise
+        except retry_on as e:
+            if breaker is not None:
+                if isinstance(e, breaker_neutral):
+                    breaker.release()
+                else:
+                    breaker.record_failure()
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            last = attempt == attempts - 1
+            if last or (give_up_at is not None and time.monotonic() + delay >= give_up_at):
+                raise
+            logger.warning(f"Attempt {attempt + 1} of {attempts} failed ({type(e).__name__}: {e}); "
+                           f"retrying in {delay:.2f}s.")
+            await asyncio.sleep(delay)
+            continue
+        except BaseException:
+            # Not an upstream failure (e.g. an invalid request): say nothing about its health,
+            # but release a half-open trial.
+            if breaker is not None:
+                breaker.release()
+            raise
+        if breaker is not None:
+            breaker.record_success()
+        return result
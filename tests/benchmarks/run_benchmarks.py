@@ -0,0 +1,417 @@
+"""
+Offline component benchmarks.
+
+Every stage is measured on its own, against synthetic data and a stubbed OpenAI
+client, so the suite needs no network, API key or cloned repository:
+
+    python tests/benchmarks/run_benchmarks.py                  # compare with baseline.json
+    python tests/benchmarks/run_benchmarks.py --update-baseline
+    python tests/benchmarks/run_benchmarks.py --query-sizes 10000,100000,1000000 --query-dimension 384
+
+Results are compared with the JSON baseline and the run fails (exit code 1) when a
+metric is worse than the baseline by more than --tolerance. Timings depend on the
+machine, so refresh the baseline when it changes.
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import atexit
+import shutil
+import asyncio
+import logging
+import argparse
+import platform
+import tempfile
+import contextlib
+import statistics
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+from unittest import mock
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# Keep the default namespace and the caches away from the working directory.
+_scratch = tempfile.mkdtemp(prefix="benchmarks-")
+atexit.register(shutil.rmtree, _scratch, True)
+os.environ.setdefault("FAISS_INDEX_FILE", os.path.join(_scratch, "faiss_index.idx"))
+os.environ.setdefault("FAISS_METADATA_FILE", os.path.join(_scratch, "faiss_metadata.db"))
+os.environ.setdefault("EMBEDDING_CACHE_FILE", "")
+os.environ.setdefault("SUMMARY_CACHE_FILE", "")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+import numpy as np
+
+from src.core import assistant, index_factory, openai_client, vectorstore
+from src.core.chunking import chunk_file
+from src.core.embedding_backends import OpenAIEmbeddingBackend
+from src.core.ingestion import IngestionPipeline
+from src.utils.rate_limiter import AdaptiveRateLimiter
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# A metric this much worse than its baseline (0.3 = 30%) counts as a regression.
+DEFAULT_TOLERANCE = 0.3
+DEFAULT_QUERY_SIZES = (10_000, 100_000)
+# k-means iterations when training IVF indexes for query_faiss; search latency depends on
+# the number of lists and nprobe, not on how far the centroids converged.
+QUERY_TRAIN_ITERATIONS = 5
+
+
+class Scale:
+    """How much synthetic data each benchmark works on."""
+
+    def __init__(self, files: int = 200, functions_per_file: int = 30, stored_chunks: int = 5000,
+                 query_sizes=DEFAULT_QUERY_SIZES, query_dimension: Optional[int] = None,
+                 queries: int = 100, repeat: int = 3):
+        self.files = files
+        self.functions_per_file = functions_per_file
+        self.stored_chunks = stored_chunks
+        self.query_sizes = tuple(query_sizes)
+        # Dimension of the vectors searched by query_faiss; the embedding backend's by default.
+        self.query_dimension = query_dimension or vectorstore.DIMENSION
+        self.queries = queries
+        self.repeat = repeat
+
+# Small enough for the test suite to run every benchmark in a few seconds.
+QUICK = Scale(files=10, functions_per_file=10, stored_chunks=200, query_sizes=(1000,), queries=10, repeat=1)
+
+
+def metric(value: float, unit: str, better: str = "lower") -> Dict[str, Any]:
+    return {"value": round(float(value), 6), "unit": unit, "better": better}
+
+def best_of(repeat: int, run: Callable[[], float]) -> float:
+    """Median duration of repeat runs; run() returns the seconds it measured."""
+    return statistics.median(run() for _ in range(max(1, repeat)))
+
+def percentile(samples: List[float], q: float) -> float:
+    return float(np.percentile(np.array(samples), q))
+
+
+# ---------------------- Synthetic data ----------------------
+def synthetic_python_file(seed: int, functions: int) -> str:
+    """Deterministic Python module with a class, methods and module-level functions."""
+    lines = [f'"""Synthetic module {seed}."""', "import os", "import json", ""]
+    lines += [f"class Service{seed}:", f'    """Handles requests for tenant {seed}."""', ""]
+    for i in range(functions):
+        owner = "    " if i % 3 == 0 else ""
+        name = f"handle_request_{seed}_{i}" if owner else f"merge_settings_{seed}_{i}"
+        args = "self, request, settings=None" if owner else "request, settings=None"
+        lines += [
+            f"{owner}def {name}({args}):",
+            f'{owner}    """Merge the {i}th settings layer into the request."""',
+            f"{owner}    merged = dict(settings or {{}})",
+            f"{owner}    for key, value in request.items():",
+            f"{owner}        if value is not None and key not in ('{i}', 'token'):",
+            f"{owner}            merged[key] = value",
+            f"{owner}    return json.dumps(merged, sort_keys=True) + os.sep * {i % 5}",
+            "",
+        ]
+    return "\n".join(lines) + "\n"
+
+def synthetic_corpus(scale: Scale) -> Dict[str, str]:
+    return {f"pkg/module_{i}.py": synthetic_python_file(i, scale.functions_per_file) for i in range(scale.files)}
+
+
+class FakeEmbeddingsAPI:
+    """Stands in for client.embeddings: deterministic unit vectors, optionally after a delay."""
+
+    def __init__(self, dimension: int, latency: float = 0.0, pool_size: int = 256):
+        rng = np.random.default_rng(0)
+        pool = rng.standard_normal((pool_size, dimension)).astype(np.float32)
+        pool /= np.linalg.norm(pool, axis=1, keepdims=True)
+        self.pool = [row.tolist() for row in pool]
+        self.latency = latency
+        self.requests = 0
+
+    def vector(self, text: str) -> List[float]:
+        return self.pool[zlib.crc32(text.encode("utf-8")) % len(self.pool)]
+
+    async def create(self, input, model):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        texts = [input] if isinstance(input, str) else input
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=self.vector(t)) for i, t in enumerate(texts)])
+
+
+@contextlib.contextmanager
+def offline_openai(latency: float = 0.0):
+    """Route embeddings through a stubbed client, uncached and not throttled by the shared limiter."""
+    api = FakeEmbeddingsAPI(vectorstore.DIMENSION, latency)
+    backend = OpenAIEmbeddingBackend(SimpleNamespace(embeddings=api), model="benchmark", dimension=vectorstore.DIMENSION)
+    with mock.patch.object(vectorstore, "embedding_backend", backend), \
+            mock.patch.object(vectorstore, "embedding_cache", None), \
+            mock.patch.object(vectorstore, "CHECKPOINT_EVERY_FILES", 10 ** 9), \
+            mock.patch.object(vectorstore, "CHECKPOINT_EVERY_SECONDS", float("inf")), \
+            mock.patch.object(openai_client, "openai_limiter", AdaptiveRateLimiter(10 ** 9, 10 ** 12)):
+        yield api
+
+@contextlib.contextmanager
+def scratch_index():
+    """A fresh namespace in a temporary directory, current for the block."""
+    directory = tempfile.mkdtemp(prefix="benchmark-index-", dir=_scratch)
+    index = vectorstore.RepoIndex(os.path.join(directory, "index.idx"), os.path.join(directory, "metadata.db"))
+    try:
+        with vectorstore.use_index(index):
+            yield index
+    finally:
+        index.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+# ---------------------- Benchmarks ----------------------
+def bench_chunking(scale: Scale) -> Dict[str, Dict[str, Any]]:
+    corpus = synthetic_corpus(scale)
+    megabytes = sum(len(text) for text in corpus.values()) / 1e6
+
+    def run(chunker):
+        def timed():
+            start = time.perf_counter()
+            for path, text in corpus.items():
+                chunker(path, text)
+            return time.perf_counter() - start
+        return best_of(scale.repeat, timed)
+
+    return {
+        "chunk_text.mb_per_second": metric(megabytes / run(lambda path, text: vectorstore.chunk_text(text)),
+                                           "MB/s", "higher"),
+        "chunk_file.mb_per_second": metric(megabytes / run(chunk_file), "MB/s", "higher"),
+    }
+
+def bench_ingestion(scale: Scale) -> Dict[str, Dict[str, Any]]:
+    corpus = synthetic_corpus(scale)
+    repo_dir = Path(tempfile.mkdtemp(prefix="benchmark-repo-", dir=_scratch))
+    for path, text in corpus.items():
+        (repo_dir / path).parent.mkdir(parents=True, exist_ok=True)
+        (repo_dir / path).write_text(text)
+    chunks = []
+
+    def timed():
+        with offline_openai(), scratch_index() as index:
+            start = time.perf_counter()
+            asyncio.run(IngestionPipeline(repo_dir).run())
+            elapsed = time.perf_counter() - start
+            chunks.append(index.faiss_index.ntotal)
+        return elapsed
+
+    try:
+        seconds = best_of(scale.repeat, timed)
+    finally:
+        shutil.rmtree(repo_dir, ignore_errors=True)
+    return {
+        "ingestion.files_per_second": metric(len(corpus) / seconds, "files/s", "higher"),
+        "ingestion.chunks_per_second": metric(chunks[-1] / seconds, "chunks/s", "higher"),
+    }
+
+def bench_store_embeddings(scale: Scale) -> Dict[str, Dict[str, Any]]:
+    api = FakeEmbeddingsAPI(vectorstore.DIMENSION)
+    files = []
+    for path, text in synthetic_corpus(scale).items():
+        file_chunks = chunk_file(path, text)
+        keys = [f"{path}_chunk_{i}" for i in range(len(file_chunks))]
+        files.append(({k: api.vector(str(c)) for k, c in zip(keys, file_chunks)}, dict(zip(keys, file_chunks))))
+    n_chunks = sum(len(embeddings) for embeddings, _ in files)
+    store_times, checkpoint_times = [], []
+
+    async def store_all():
+        for embeddings, chunk_texts in files:
+            await vectorstore.store_embeddings(embeddings, chunk_texts)
+
+    for _ in range(max(1, scale.repeat)):
+        with offline_openai(), scratch_index() as index:
+            start = time.perf_counter()
+            asyncio.run(store_all())
+            store_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            index.checkpoint()
+            checkpoint_times.append(time.perf_counter() - start)
+    return {
+        "store_embeddings.chunks_per_second": metric(n_chunks / statistics.median(store_times), "chunks/s", "higher"),
+        "checkpoint.seconds": metric(statistics.median(checkpoint_times), "s"),
+    }
+
+def build_query_index(index_type: str, vectors: np.ndarray) -> Any:
+    """Index of index_type over vectors, as finalize_index builds it but trained on a sample."""
+    n, dimension = vectors.shape
+    faiss_index = index_factory.build_index(index_type, dimension, n)
+    if not faiss_index.is_trained:
+        faiss_index.cp.niter = QUERY_TRAIN_ITERATIONS
+        sample = index_factory.MIN_POINTS_PER_CENTROID * faiss_index.nlist
+        faiss_index.train(vectors[:max(sample, index_factory.min_training_vectors(index_type, n))])
+    faiss_index.add_with_ids(vectors, np.arange(n, dtype=np.int64))
+    return faiss_index
+
+def bench_query_faiss(scale: Scale) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    rng = np.random.default_rng(1)
+    dimension = scale.query_dimension
+    for n in scale.query_sizes:
+        vectors = rng.standard_normal((n, dimension), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        index_type = index_factory.choose_index_type(n)
+        start = time.perf_counter()
+        faiss_index = build_query_index(index_type, vectors)
+        build_seconds = time.perf_counter() - start
+        # Queries close to stored vectors, so the similarity threshold lets hits through.
+        picks = rng.integers(0, n, scale.queries)
+        queries = vectors[picks] + 0.02 * rng.standard_normal((scale.queries, dimension), dtype=np.float32)
+        del vectors
+        latencies = []
+        with scratch_index() as index:
+            index.faiss_index = faiss_index
+            for query in queries:
+                start = time.perf_counter()
+                vectorstore.query_faiss(query.tolist(), k=10, min_score=assistant.SIMILARITY_THRESHOLD)
+                latencies.append((time.perf_counter() - start) * 1000)
+        del faiss_index
+        name = f"query_faiss.{n}x{dimension}.{index_type}"
+        results[f"{name}.build_seconds"] = metric(build_seconds, "s")
+        results[f"{name}.p50_ms"] = metric(percentile(latencies, 50), "ms")
+        results[f"{name}.p99_ms"] = metric(percentile(latencies, 99), "ms")
+    return results
+
+def bench_prompt_assembly(scale: Scale) -> Dict[str, Dict[str, Any]]:
+    api = FakeEmbeddingsAPI(vectorstore.DIMENSION)
+    chunks = []
+    for path, text in synthetic_corpus(scale).items():
+        chunks.extend((path, i, chunk) for i, chunk in enumerate(chunk_file(path, text)))
+    chunks = chunks[:scale.stored_chunks]
+    query = "How does merge_settings_3_4 merge the settings layers into a request?"
+    query_vector = api.vector(str(chunks[len(chunks) // 2][2]))
+
+    async def fake_generate_embedding(text):
+        return query_vector
+
+    async def run() -> List[float]:
+        for path, i, chunk in chunks:
+            await vectorstore.store_embeddings({f"{path}_chunk_{i}": api.vector(str(chunk))},
+                                               {f"{path}_chunk_{i}": chunk})
+        latencies = []
+        for _ in range(scale.queries):
+            start = time.perf_counter()
+            await assistant.prepare_rag_context(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+        return latencies
+
+    with offline_openai(), scratch_index(), \
+            mock.patch.object(assistant, "generate_embedding", fake_generate_embedding), \
+            mock.patch.object(assistant, "response_cache", None):
+        latencies = asyncio.run(run())
+    return {
+        "prompt_assembly.p50_ms": metric(percentile(latencies, 50), "ms"),
+        "prompt_assembly.p99_ms": metric(percentile(latencies, 99), "ms"),
+    }
+
+
+BENCHMARKS: Dict[str, Callable[[Scale], Dict[str, Dict[str, Any]]]] = {
+    "chunking": bench_chunking,
+    "ingestion": bench_ingestion,
+    "store_embeddings": bench_store_embeddings,
+    "query_faiss": bench_query_faiss,
+    "prompt_assembly": bench_prompt_assembly,
+}
+
+
+def run_suite(scale: Scale, only: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    for name, benchmark in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        start = time.perf_counter()
+        results.update(benchmark(scale))
+        print(f"{name}: done in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return results
+
+def environment() -> Dict[str, Any]:
+    import faiss
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "machine": platform.machine(), "cpus": os.cpu_count(), "faiss": faiss.__version__,
+            "dimension": vectorstore.DIMENSION}
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """Descriptions of the metrics worse than their baseline by more than tolerance."""
+    regressions = []
+    for name, result in sorted(results.items()):
+        reference = baseline.get(name)
+        if reference is None or not reference["value"]:
+            continue
+        value, expected = result["value"], reference["value"]
+        if result["better"] == "higher":
+            worse = value < expected / (1 + tolerance)
+        else:
+            worse = value > expected * (1 + tolerance)
+        if worse:
+            regressions.append(f"{name}: {value:g} {result['unit']} vs baseline {expected:g} "
+                               f"({(value - expected) / expected:+.0%})")
+    return regressions
+
+def load_baseline(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def write_report(path: str, results: Dict[str, Dict[str, Any]]) -> None:
+    report = {"created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+              "environment": environment(), "results": results}
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the offline component benchmarks.")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline JSON to compare with")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--query-sizes", default=",".join(map(str, DEFAULT_QUERY_SIZES)),
+                        help="comma-separated index sizes for query_faiss, e.g. 10000,100000,1000000")
+    parser.add_argument("--query-dimension", type=int,
+                        help=f"vector dimension for query_faiss (default {vectorstore.DIMENSION}, the backend's)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", help=f"comma-separated subset of {', '.join(BENCHMARKS)}")
+    parser.add_argument("--quick", action="store_true", help="tiny data sizes, for checking the suite itself")
+    parser.add_argument("--verbose", action="store_true", help="keep the application's INFO logging")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        # Logging every stored chunk and assembled prompt would dominate the timings.
+        for name, logger in logging.root.manager.loggerDict.items():
+            if name.startswith("src.") and isinstance(logger, logging.Logger):
+                logger.setLevel(logging.WARNING)
+
+    if args.quick:
+        scale = QUICK
+    else:
+        scale = Scale(query_sizes=[int(n) for n in args.query_sizes.split(",")],
+                      query_dimension=args.query_dimension, repeat=args.repeat)
+    results = run_suite(scale, args.only.split(",") if args.only else None)
+    for name, result in sorted(results.items()):
+        print(f"{name:55} {result['value']:>14.4f} {result['unit']}")
+    if args.output:
+        write_report(args.output, results)
+    if args.update_baseline:
+        baseline = load_baseline(args.baseline).get("results", {})
+        baseline.update(results)
+        write_report(args.baseline, baseline)
+        print(f"Baseline written to {args.baseline}.")
+        return 0
+
+    regressions = compare(results, load_baseline(args.baseline).get("results", {}), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions:
+        print("No regressions against the baseline.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
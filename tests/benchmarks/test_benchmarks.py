@@ -0,0 +1,30 @@
+import json
+from run_benchmarks import QUICK, compare, main, metric, run_suite
+
+def test_every_benchmark_runs_offline():
+    results = run_suite(QUICK)
+    for prefix in ("chunk_text.", "chunk_file.", "ingestion.", "store_embeddings.", "checkpoint.",
+                   "query_faiss.1000x", "prompt_assembly."):
+        assert any(name.startswith(prefix) for name in results), prefix
+    assert all(result["value"] > 0 for result in results.values())
+    assert results["ingestion.files_per_second"]["better"] == "higher"
+
+def test_compare_flags_regressions_beyond_the_tolerance():
+    baseline = {"query.p50_ms": metric(10, "ms"), "ingest.files_per_second": metric(100, "files/s", "higher")}
+    assert compare({"query.p50_ms": metric(12, "ms"), "ingest.files_per_second": metric(80, "files/s", "higher"),
+                    "new.metric": metric(1, "s")}, baseline, tolerance=0.3) == []
+    regressions = compare({"query.p50_ms": metric(14, "ms"),
+                           "ingest.files_per_second": metric(70, "files/s", "higher")}, baseline, tolerance=0.3)
+    assert [r.split(":")[0] for r in regressions] == ["ingest.files_per_second", "query.p50_ms"]
+
+def test_main_writes_and_checks_the_baseline(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    assert main(["--quick", "--only", "chunking", "--baseline", str(baseline), "--update-baseline"]) == 0
+    report = json.loads(baseline.read_text())
+    assert set(report) == {"created", "environment", "results"}
+
+    # A baseline far better than anything achievable is reported as a regression.
+    for result in report["results"].values():
+        result["value"] *= 1000
+    baseline.write_text(json.dumps(report))
+    assert main(["--quick", "--only", "chunking", "--baseline", str(baseline)]) == 1
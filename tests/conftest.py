@@ -2,4 +2,26 @@ import sys
 import os
 
 # Insert the project root at the beginning of sys.path
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
\ No newline at end of file
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+@pytest.fixture(autouse=True)
+def fresh_openai_breaker(monkeypatch):
+    """Keep failed OpenAI calls of one test from opening the shared circuit for the next."""
+    from src.core import openai_client
+    from src.utils.resilience import CircuitBreaker
+    monkeypatch.setattr(openai_client, "openai_breaker",
+                        CircuitBreaker(openai_client.OPENAI_BREAKER_FAILURES, openai_client.OPENAI_BREAKER_RESET_SECONDS))
+
+@pytest.fixture(autouse=True)
+def isolated_default_index(monkeypatch, tmp_path_factory):
+    """Keep the default namespace's index files and the embedding cache out of the working directory."""
+    from src.core import vectorstore
+    from src.core.embedding_cache import EmbeddingCache
+    directory = tmp_path_factory.mktemp("default_index")
+    monkeypatch.setattr(vectorstore, "FAISS_INDEX_FILE", str(directory / "faiss_index.idx"))
+    monkeypatch.setattr(vectorstore, "METADATA_FILE", str(directory / "faiss_metadata.db"))
+    monkeypatch.setattr(vectorstore, "embedding_cache", EmbeddingCache(str(directory / "embedding_cache.sqlite")))
+    monkeypatch.setattr(vectorstore, "_default_index",
+                        vectorstore.RepoIndex(vectorstore.FAISS_INDEX_FILE, vectorstore.METADATA_FILE))
@@ -24,8 +24,9 @@ def cleanup_cloned_repo():
 def test_clone_endpoint():
     """
     Test the /clone endpoint by cloning a repository and checking that files are processed.
+    The request waits for the ingestion job to finish instead of returning its job id.
     """
-    clone_payload = {"repo_url": "https://github.com/psf/requests"}
+    clone_payload = {"repo_url": "https://github.com/psf/requests", "wait": True}
     response = client.post("/clone", json=clone_payload)
     assert response.status_code == 200, f"Clone failed: {response.text}"
     data = response.json()
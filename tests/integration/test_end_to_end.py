@@ -23,8 +23,8 @@ def cleanup_cloned_repo():
         shutil.rmtree("cloned_repo")
 
 def test_end_to_end_workflow():
-    # 1. Clone a repository using the /clone endpoint.
-    clone_payload = {"repo_url": "https://github.com/psf/requests"}
+    # 1. Clone a repository using the /clone endpoint, waiting for the ingestion job to finish.
+    clone_payload = {"repo_url": "https://github.com/psf/requests", "wait": True}
     clone_response = client.post("/clone", json=clone_payload)
     assert clone_response.status_code == 200, f"Clone response failed: {clone_response.text}"
     clone_data = clone_response.json()
@@ -3,9 +3,17 @@ from fastapi.testclient import TestClient
 from src.api.endpoints import app
 import tempfile
 import os
+import json
 
 client = TestClient(app)
 
+@pytest.fixture(autouse=True)
+def checkouts(monkeypatch, tmp_path):
+    """Clone into tmp_path instead of the working directory."""
+    from src.core import namespaces
+    monkeypatch.setattr(namespaces, "DEFAULT_CHECKOUT_DIR", str(tmp_path / "cloned_repo"))
+    monkeypatch.setattr(namespaces, "REPOS_DIR", str(tmp_path / "repos"))
+
 def test_clone_endpoint(monkeypatch):
     async def fake_clone(repo_url, target_dir):
         # Simulate cloning by creating a dummy directory with one file.
@@ -15,11 +23,40 @@ def test_clone_endpoint(monkeypatch):
             f.write("Hello World!")
     
     monkeypatch.setattr("src.core.repository.clone_repository", fake_clone)
-    response = client.post("/clone", json={"repo_url": "https://github.com/octocat/Hello-World.git"})
+    response = client.post("/clone", json={"repo_url": "https://github.com/octocat/Hello-World.git", "wait": True})
     assert response.status_code == 200
     data = response.json()
     assert data.get("status") == "success"
 
+def test_clone_endpoint_runs_a_background_job(monkeypatch, tmp_path):
+    import time
+    async def fake_clone(repo_url, target_dir):
+        os.makedirs(str(target_dir), exist_ok=True)
+        with open(target_dir / "README.md", "w") as f:
+            f.write("Hello World!")
+
+    async def fake_generate_embeddings(texts):
+        return [[1.0] * 1536 for _ in texts]
+
+    monkeypatch.setattr("src.core.repository.clone_repository", fake_clone)
+    monkeypatch.setattr("src.core.vectorstore.generate_embeddings", fake_generate_embeddings)
+    # One client keeps one event loop alive for the background job.
+    with TestClient(app) as job_client:
+        response = job_client.post("/clone", json={"repo_url": "https://github.com/octocat/Hello-World.git"})
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        for _ in range(100):
+            job = job_client.get(f"/jobs/{job_id}").json()
+            if job["status"] not in ("queued", "running"):
+                break
+            time.sleep(0.05)
+        assert job["status"] == "completed"
+        assert job["progress"]["files_scanned"] == job["progress"]["files_processed"] == 1
+        assert job["progress"]["chunks_embedded"] == 1
+        assert job["result"]["files_processed"] == [str(tmp_path / "cloned_repo" / "README.md")]
+        assert job_client.post(f"/jobs/{job_id}/cancel").status_code == 409
+        assert job_client.get("/jobs/unknown").status_code == 404
+
 def test_analyze_endpoint(monkeypatch):
     async def fake_analyze(query, context):
         return "Fake analysis: code does X."
@@ -58,4 +95,52 @@ def test_analyze_repo_endpoint(monkeypatch):
     response = client.post("/analyze_repo", json={"repo_path": "dummy_repo_path"})
     assert response.status_code == 200
     data = response.json()
-    assert data.get("analysis") == "Overall repository analysis."
\ No newline at end of file
+    assert data.get("analysis") == "Overall repository analysis."
+
+def test_analyse_repository_rejects_unknown_or_invalid_repo_id():
+    response = client.post("/analyse_repository", json={"query": "What is this?", "repo_id": "never-cloned"})
+    assert response.status_code == 404
+    response = client.post("/clone", json={"repo_url": "https://example.com/x.git", "repo_id": "../x"})
+    assert response.status_code == 400
+
+def test_analyse_repository_stream_sends_metadata_then_tokens(monkeypatch):
+    from types import SimpleNamespace
+    from src.core import assistant
+
+    async def fake_generate_embedding(text):
+        return [1.0, 0.0]
+
+    def fake_query_faiss(embedding, k=1, min_score=None):
+        return {"indices": [[]], "distances": [[]]}
+
+    async def fake_stream():
+        for piece in ["Hello", ", ", "world"]:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+    async def fake_create(**kwargs):
+        assert kwargs["stream"] is True
+        return fake_stream()
+
+    monkeypatch.setattr(assistant, "generate_embedding", fake_generate_embedding)
+    monkeypatch.setattr(assistant, "query_faiss", fake_query_faiss)
+    monkeypatch.setattr(assistant, "response_cache", None)
+    monkeypatch.setattr(assistant.aclient.chat.completions, "create", fake_create)
+
+    response = client.post("/analyse_repository/stream", json={"query": "What does this repo do?"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    names = [lines[0].removeprefix("event: ") for lines in events]
+    assert names == ["metadata", "token", "token", "token", "done"]
+    tokens = [json.loads(lines[1].removeprefix("data: "))["content"] for lines in events[1:4]]
+    assert "".join(tokens) == "Hello, world"
+
+def test_metrics_endpoint_exposes_request_and_process_metrics():
+    assert client.get("/jobs").status_code == 200
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert float(response.headers["X-Memory-Usage-MB"]) > 0
+    assert 'repo_analysis_http_requests_total{method="GET",route="/jobs",status="200"}' in response.text
+    assert "# TYPE repo_analysis_stage_duration_seconds histogram" in response.text
+    assert "process_resident_memory_bytes " in response.text
@@ -7,8 +7,7 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from src.core.vectorstore import (
-    faiss_index,
-    metadata_store,
+    current_index,
     generate_embedding,
     process_code_file
 )
@@ -20,8 +19,9 @@ async def test_faiss_integration():
     await process_code_file(file_path, content)
     
     # Check how many vectors we have
-    print("FAISS index total vectors:", faiss_index.ntotal)
-    print("Metadata store contents:", metadata_store)
+    index = current_index()
+    print("FAISS index total vectors:", index.faiss_index.ntotal)
+    print("Metadata store contents:", dict(index.metadata_store.items()))
 
 if __name__ == "__main__":
     asyncio.run(test_faiss_integration())
\ No newline at end of file
@@ -7,8 +7,7 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from src.core.vectorstore import (
-    faiss_index,
-    metadata_store,
+    current_index,
     generate_embedding,
     process_code_file
 )
@@ -19,8 +18,9 @@ async def run_vectorstore_test():
     content = "This is some test content for vectorstore."
     await process_code_file(file_path, content)
     
-    print("Number of vectors in FAISS index:", faiss_index.ntotal)
-    print("Metadata store:", metadata_store)
+    index = current_index()
+    print("Number of vectors in FAISS index:", index.faiss_index.ntotal)
+    print("Metadata store:", dict(index.metadata_store.items()))
 
 if __name__ == "__main__":
     asyncio.run(run_vectorstore_test())
\ No newline at end of file
@@ -0,0 +1,94 @@
+import pytest
+from src.core import vectorstore
+from src.core.chunking import Chunk, chunk_file, chunk_lines, chunk_python, register_chunker, CHUNKERS
+
+PYTHON_SOURCE = '''"""Module docstring."""
+import os
+
+X = 1
+
+
+# Helper comment.
+def helper(a):
+    return a + 1
+
+
+@decorator
+class Widget:
+    size = 3
+
+    def grow(self):
+        return self.size * 2
+
+
+if __name__ == "__main__":
+    helper(X)
+'''
+
+def test_python_chunks_follow_top_level_blocks():
+    chunks = chunk_python(PYTHON_SOURCE, max_tokens=500, overlap_tokens=0)
+    assert [(c.start_line, c.end_line, c.symbol) for c in chunks] == [
+        (1, 4, None), (5, 9, "helper"), (10, 17, "Widget"), (18, 21, None)]
+    # Leading comments and decorators stay with the definition they describe.
+    assert chunks[1].startswith("\n\n# Helper comment.\ndef helper")
+    assert "@decorator\nclass Widget" in chunks[2]
+    # Chunks cover the file without gaps.
+    assert "".join(chunks) == PYTHON_SOURCE
+
+def test_large_class_is_split_per_method():
+    body = "".join(f"    def method_{i}(self):\n        return {i}\n\n" for i in range(20))
+    source = "class Big:\n    \"\"\"Doc.\"\"\"\n\n" + body
+    chunks = chunk_python(source, max_tokens=40, overlap_tokens=0)
+    symbols = [c.symbol for c in chunks]
+    assert symbols[0] == "Big"
+    assert symbols[1:] == [f"Big.method_{i}" for i in range(20)]
+    assert all(vectorstore.estimate_tokens(c) <= 40 for c in chunks)
+
+def test_large_function_is_split_by_lines_with_its_symbol():
+    source = "def long():\n" + "".join(f"    x{i} = {i}\n" for i in range(100))
+    chunks = chunk_python(source, max_tokens=50, overlap_tokens=0)
+    assert len(chunks) > 1
+    assert {c.symbol for c in chunks} == {"long"}
+    assert chunks[0].start_line == 1 and chunks[-1].end_line == 101
+    assert all(b.start_line == a.end_line + 1 for a, b in zip(chunks, chunks[1:]))
+
+def test_unparsable_python_falls_back_to_lines():
+    chunks = chunk_python("def broken(:\n    pass\n", max_tokens=500, overlap_tokens=0)
+    assert [(c.start_line, c.end_line, c.symbol) for c in chunks] == [(1, 2, None)]
+
+def test_line_chunks_prefer_paragraph_breaks_and_overlap():
+    paragraphs = ["\n".join(f"p{p} line {i}" for i in range(4)) for p in range(3)]
+    text = "\n\n".join(paragraphs) + "\n"
+    chunks = chunk_lines(text, max_tokens=25, overlap_tokens=0)
+    assert chunks[0].rstrip().endswith("p0 line 3")
+    assert chunks[1].lstrip().startswith("p1 line 0")
+
+    overlapped = chunk_lines(text, max_tokens=25, overlap_tokens=8)
+    assert overlapped[1].start_line < overlapped[0].end_line + 1
+    assert "p0 line 3" in overlapped[1]
+
+def test_overlong_line_is_cut_into_pieces():
+    chunks = chunk_lines("short\n" + "x" * 100 + "\n", max_tokens=10, overlap_tokens=0)
+    assert [c.start_line for c in chunks] == [1, 2, 2, 2]
+    assert all(len(c) <= 40 for c in chunks)
+
+def test_chunk_file_dispatches_by_suffix(monkeypatch):
+    monkeypatch.setitem(CHUNKERS, ".py", CHUNKERS[".py"])
+    assert chunk_file("notes.md", "def f():\n    pass\n")[0].symbol is None
+    assert chunk_file("code.py", "def f():\n    pass\n")[0].symbol == "f"
+    register_chunker(".PY", lambda text, max_tokens, overlap: [Chunk(text, 1, 1, "custom")])
+    assert chunk_file("code.py", "x")[0].symbol == "custom"
+    assert chunk_file("code.py", 123) == []
+
+@pytest.mark.asyncio
+async def test_store_embeddings_records_chunk_location(tmp_path, monkeypatch):
+    index = vectorstore.RepoIndex(str(tmp_path / "i.idx"), str(tmp_path / "m.db"))
+    monkeypatch.setattr(vectorstore, "maybe_checkpoint", lambda: False)
+    chunk = Chunk("def f():\n    pass\n", 3, 4, "f")
+    with vectorstore.use_index(index):
+        ids = await vectorstore.store_embeddings({"a.py_chunk_0": [1.0] * vectorstore.DIMENSION},
+                                                 {"a.py_chunk_0": chunk})
+    assert index.metadata_store[ids[0]] == {
+        "file_chunk_id": "a.py_chunk_0", "file_path": "a.py", "chunk_text": "def f():\n    pass\n",
+        "start_line": 3, "end_line": 4, "symbol": "f"}
+    index.close()
@@ -0,0 +1,62 @@
+import subprocess
+import pytest
+from src.core import repository
+
+def git(cwd, *args):
+    result = subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                            cwd=cwd, check=True, capture_output=True, text=True)
+    return result.stdout.strip()
+
+@pytest.fixture
+def origin(tmp_path):
+    origin = tmp_path / "origin"
+    origin.mkdir()
+    git(origin, "init", "-q")
+    for i in range(3):
+        (origin / f"file{i}.py").write_text(f"version {i}")
+        git(origin, "add", ".")
+        git(origin, "commit", "-qm", f"commit {i}")
+    return origin
+
+@pytest.mark.asyncio
+async def test_shallow_clone_can_still_be_updated_incrementally(origin, tmp_path):
+    target = tmp_path / "clone"
+    await repository.clone_repository(f"file://{origin}", target, depth=1, use_mirror=False,
+                                      bare=False)
+    assert git(target, "rev-list", "--count", "HEAD") == "1"
+    assert (target / "file2.py").read_text() == "version 2"
+
+    old = await repository.get_head_commit(target)
+    (origin / "file0.py").write_text("changed")
+    git(origin, "commit", "-qam", "change")
+    await repository.run_git("fetch", "origin", cwd=target)
+    new = (await repository.run_git("rev-parse", "@{upstream}", cwd=target)).strip()
+    assert await repository.diff_commits(target, old, new) == (["file0.py"], [])
+
+@pytest.mark.asyncio
+async def test_blob_filtered_clone_is_a_partial_clone(origin, tmp_path):
+    target = tmp_path / "clone"
+    await repository.clone_repository(f"file://{origin}", target, depth=0, blob_filter="blob:none",
+                                      use_mirror=False, bare=False)
+    assert git(target, "config", "remote.origin.promisor") == "true"
+    assert git(target, "rev-list", "--count", "HEAD") == "3"
+    assert (target / "file1.py").read_text() == "version 1"
+
+@pytest.mark.asyncio
+async def test_mirror_is_created_once_and_refreshed_for_later_clones(origin, tmp_path, monkeypatch):
+    monkeypatch.setattr(repository, "MIRROR_DIR", str(tmp_path / "mirrors"))
+    url = f"file://{origin}"
+    await repository.clone_repository(url, tmp_path / "first", bare=False)
+    mirror = repository.mirror_path(url)
+    assert (mirror / "HEAD").exists()
+    assert git(tmp_path / "first", "remote", "get-url", "origin") == url
+
+    (origin / "new.md").write_text("new")
+    git(origin, "add", ".")
+    git(origin, "commit", "-qm", "add new.md")
+    await repository.clone_repository(url, tmp_path / "second", bare=False)
+    assert (tmp_path / "second" / "new.md").read_text() == "new"
+    assert list(mirror.parent.iterdir()) == [mirror]
+    # The checkout tracks the real remote, so incremental updates fetch from it directly.
+    await repository.run_git("fetch", "origin", cwd=tmp_path / "second")
+    assert git(tmp_path / "second", "rev-parse", "@{upstream}") == git(origin, "rev-parse", "HEAD")
@@ -0,0 +1,57 @@
+from src.core.chunking import estimate_tokens
+from src.core.context_builder import (ContextBuilder, ContextCandidate, PRIORITY_CHUNK, PRIORITY_FILE,
+                                      PRIORITY_SUPPLEMENT)
+
+def chunk(name, text, score, start=None, end=None):
+    source = {"source": name, "kind": "chunk", "score": score}
+    if start is not None:
+        source.update(file_path=name.split("_chunk_")[0], start_line=start, end_line=end)
+    return ContextCandidate(name, text, source, priority=PRIORITY_CHUNK, score=score)
+
+def test_candidates_are_ranked_and_fill_the_budget():
+    builder = ContextBuilder(max_tokens=1000)
+    included = builder.extend([
+        chunk("a.py_chunk_0", "low", 0.8),
+        ContextCandidate("README.md", "readme", {"source": "README.md"}, priority=PRIORITY_SUPPLEMENT),
+        chunk("a.py_chunk_1", "high", 0.9),
+        ContextCandidate("b.py", "whole file", {"source": "b.py"}, priority=PRIORITY_FILE),
+    ])
+    assert included == 4
+    assert [s["source"] for s in builder.sources] == ["b.py", "a.py_chunk_1", "a.py_chunk_0", "README.md"]
+    assert builder.used_tokens == sum(estimate_tokens(s) for s in builder.sections)
+    assert builder.used_tokens <= builder.max_tokens
+
+def test_duplicates_and_overlapping_chunks_are_dropped():
+    builder = ContextBuilder(max_tokens=1000)
+    builder.extend([
+        chunk("a.py_chunk_0", "def f():\n    return 1\n", 0.9, 1, 10),
+        chunk("b.py_chunk_0", "def f():\n  return 1", 0.85),
+        chunk("a.py_chunk_1", "overlapping text", 0.8, 4, 12),
+        chunk("a.py_chunk_2", "adjacent text", 0.7, 9, 20),
+    ])
+    assert [s["source"] for s in builder.sources] == ["a.py_chunk_0", "a.py_chunk_2"]
+    assert builder.report()["dropped"] == {"duplicate": 1, "overlap": 1, "budget": 0}
+
+def test_truncatable_candidates_are_cut_and_others_skipped():
+    builder = ContextBuilder(max_tokens=300, min_section_tokens=50)
+    assert builder.add(chunk("a.py_chunk_0", "x" * 800, 0.9))
+    # Too big to fit whole, and chunks are not truncated.
+    assert not builder.add(chunk("a.py_chunk_1", "y" * 800, 0.8))
+    long_file = "\n".join(f"line {i}" for i in range(500))
+    assert builder.add(ContextCandidate("README.md (full file)", long_file, {"source": "README.md"},
+                                        priority=PRIORITY_SUPPLEMENT, truncatable=True))
+    assert builder.sections[-1].endswith("[... truncated]\n")
+    assert builder.sources[-1]["truncated"] is True
+    assert builder.used_tokens <= 300
+    report = builder.report()
+    assert report["truncated"] == 1 and report["dropped"]["budget"] == 1
+
+def test_candidate_cap_limits_supplementary_files():
+    builder = ContextBuilder(max_tokens=5000, min_section_tokens=10)
+    text = "\n".join(f"requirement-{i}" for i in range(1000))
+    builder.add(ContextCandidate("requirements.txt", text, {"source": "requirements.txt"},
+                                 max_tokens=100, truncatable=True))
+    assert estimate_tokens(builder.sections[0]) <= 100
+    # Below the minimum section size a truncatable candidate is skipped instead.
+    builder.used_tokens = builder.max_tokens - 5
+    assert not builder.add(ContextCandidate("setup.py", "s" * 400, {"source": "setup.py"}, truncatable=True))
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from src.core import vectorstore
+from src.core.embedding_backends import (HashingEmbeddingBackend, OpenAIEmbeddingBackend,
+                                         create_embedding_backend, hash_ngrams)
+
+def test_hashing_backend_is_deterministic_and_normalized():
+    backend = HashingEmbeddingBackend(dimension=256)
+    vector = backend.embed_text("def load_index(path): return faiss.read_index(path)")
+    assert vector.shape == (256,)
+    assert np.isclose(np.linalg.norm(vector), 1.0)
+    assert np.array_equal(vector, HashingEmbeddingBackend(dimension=256).embed_text(
+        "DEF load_index(path): return faiss.read_index(path)"))
+    # Too short to contain an n-gram.
+    assert not backend.embed_text("ab").any()
+    assert len(hash_ngrams(np.frombuffer(b"abcdef", dtype=np.uint8), 3)) == 4
+
+def test_hashing_backend_ranks_related_text_higher():
+    backend = HashingEmbeddingBackend()
+    query = backend.embed_text("how is the faiss index loaded from disk")
+    related = backend.embed_text("def load_index(): faiss_index = faiss.read_index(FAISS_INDEX_FILE)")
+    unrelated = backend.embed_text("<html><body><h1>Welcome to my homepage</h1></body></html>")
+    assert float(query @ related) > float(query @ unrelated)
+
+@pytest.mark.asyncio
+async def test_vectorstore_embeds_through_the_backend(monkeypatch, tmp_path):
+    from src.core.embedding_cache import EmbeddingCache
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(vectorstore, "embedding_cache", cache)
+    monkeypatch.setattr(vectorstore, "embedding_backend", HashingEmbeddingBackend(dimension=vectorstore.DIMENSION))
+
+    vectors = await vectorstore.generate_embeddings(["first chunk", "second chunk"])
+    assert [len(v) for v in vectors] == [vectorstore.DIMENSION] * 2
+    assert await vectorstore.generate_embedding("first chunk") == vectors[0]
+    # Local vectors are recomputed rather than cached.
+    assert cache.stats()["entries"] == 0
+
+def test_backend_selection():
+    assert isinstance(create_embedding_backend(None, "local"), HashingEmbeddingBackend)
+    backend = create_embedding_backend(vectorstore.aclient, "openai")
+    assert isinstance(backend, OpenAIEmbeddingBackend) and backend.dimension == 1536
+    with pytest.raises(ValueError):
+        create_embedding_backend(None, "missing")
+
+def test_index_of_another_backend_is_not_loaded(monkeypatch, tmp_path):
+    files = (str(tmp_path / "index.idx"), str(tmp_path / "metadata.db"))
+    index = vectorstore.RepoIndex(*files)
+    index.faiss_index.add_with_ids(np.ones((1, vectorstore.DIMENSION), dtype=np.float32), np.array([0]))
+    index.metadata_store.update({0: {"file_chunk_id": "a.py_chunk_0", "file_path": "a.py", "chunk_text": "a"}})
+    index.file_manifest.add_file("a.py")
+    index.global_id_counter = 1
+    index.checkpoint()
+    index.close()
+
+    assert vectorstore.RepoIndex(*files).faiss_index.ntotal == 1
+
+    # Same dimension, different model.
+    monkeypatch.setattr(vectorstore, "EMBEDDING_MODEL", "other-model")
+    reloaded = vectorstore.RepoIndex(*files)
+    assert reloaded.faiss_index.ntotal == 0 and len(reloaded.metadata_store) == 0
+    reloaded.close()
+
+    # Different dimension.
+    monkeypatch.setattr(vectorstore, "EMBEDDING_MODEL", "text-embedding-ada-002")
+    monkeypatch.setattr(vectorstore, "DIMENSION", 64)
+    reloaded = vectorstore.RepoIndex(*files)
+    assert reloaded.faiss_index.d == 64 and reloaded.faiss_index.ntotal == 0
+    reloaded.close()
@@ -0,0 +1,62 @@
+import pytest
+from src.core.embedding_cache import EmbeddingCache
+from src.utils.metrics import metrics
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_entries=3)
+    yield cache
+    cache.close()
+
+def test_get_and_put_are_keyed_by_text_and_model(cache):
+    cache.put("def f(): pass", [0.5, 1.5], "model-a")
+    assert cache.get("def f(): pass", "model-a") == [0.5, 1.5]
+    assert cache.get("def f(): pass", "model-b") is None
+    assert cache.get("def g(): pass", "model-a") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+def test_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    first = EmbeddingCache(path)
+    first.put_many(["a", "b"], [[1.0], [2.0]], "m")
+    first.close()
+    second = EmbeddingCache(path)
+    assert second.get_many(["b", "a", "c"], "m") == [[2.0], [1.0], None]
+    assert second.stats()["entries"] == 2
+    second.close()
+
+def test_least_recently_used_entries_are_evicted(cache, monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr("src.core.embedding_cache.time.time", lambda: next(clock))
+    cache.put_many(["a", "b", "c"], [[1.0], [2.0], [3.0]], "m")
+    # Touch "a" so that "b" becomes the least recently used entry.
+    assert cache.get("a", "m") == [1.0]
+    cache.put("d", [4.0], "m")
+    assert cache.get("b", "m") is None
+    assert cache.get_many(["a", "c", "d"], "m") == [[1.0], [3.0], [4.0]]
+    stats = cache.stats()
+    assert stats["entries"] == 3
+    assert stats["evictions"] == 1
+
+@pytest.mark.asyncio
+async def test_failed_batch_counts_each_miss_once(cache, monkeypatch):
+    from src.core import vectorstore
+    class FlakyBackend:
+        cacheable = True
+        async def embed(self, texts):
+            raise ConnectionError("batch failed")
+        async def embed_one(self, text):
+            return [float(len(text))]
+
+    monkeypatch.setattr(vectorstore, "embedding_cache", cache)
+    monkeypatch.setattr(vectorstore, "embedding_backend", FlakyBackend())
+    stages = metrics.get("repo_analysis_stage_duration_seconds")
+    query_embeddings = stages.labels(stage="embed_query").count
+    assert await vectorstore.generate_embeddings(["ab", "abc"]) == [[2.0], [3.0]]
+    assert (cache.hits, cache.misses) == (0, 2)
+    # The one-by-one retries are ingestion time, not query latency.
+    assert stages.labels(stage="embed_query").count == query_embeddings
+    # The vectors embedded one by one are cached.
+    assert await vectorstore.generate_embeddings(["ab", "abc"]) == [[2.0], [3.0]]
+    assert (cache.hits, cache.misses) == (2, 2)
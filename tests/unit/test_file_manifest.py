@@ -0,0 +1,38 @@
+import pytest
+from src.core.file_manifest import FileManifest
+from src.core.metadata_store import MetadataStore
+
+@pytest.fixture
+def store(tmp_path):
+    store = MetadataStore(str(tmp_path / "metadata.db"))
+    yield store
+    store.close()
+
+def test_find_is_case_insensitive_and_shallowest_first(store):
+    manifest = FileManifest(store)
+    manifest.add_file("repo/src/pkg/README.md")
+    manifest.add_file("repo/README.md")
+    manifest.add_file("repo/setup.py")
+    assert manifest.find("readme.MD") == ["repo/README.md", "repo/src/pkg/README.md"]
+    assert manifest.find("missing.py") == []
+    manifest.remove_file("repo/README.md")
+    assert manifest.find("README.md") == ["repo/src/pkg/README.md"]
+    assert "repo/README.md" not in manifest and len(manifest) == 2
+
+def test_rows_are_committed_with_the_metadata(tmp_path, store):
+    manifest = FileManifest(store)
+    store.update({0: {"file_path": "repo/a.py"}, 1: {"file_path": "repo/a.py"}})
+    manifest.add_file("repo/a.py")
+    manifest.add_file("repo/b.toml")
+    store.commit()
+    manifest.add_file("repo/pending.py")
+    store.close()
+
+    reopened = FileManifest(MetadataStore(store.path))
+    assert reopened.store.ids_for_files(["repo/a.py"]) == [0, 1]
+    assert reopened.find("B.TOML") == ["repo/b.toml"]
+    assert "repo/pending.py" not in reopened
+    reopened.store.close()
+
+    assert len(FileManifest(MetadataStore(str(tmp_path / "missing.db")))) == 0
+    assert not (tmp_path / "missing.db").exists()
@@ -0,0 +1,86 @@
+import subprocess
+import pytest
+from src.core import repository
+from src.core.git_source import GitObjectSource, is_bare_repository, read_file
+from src.core.ingestion import IngestionPipeline
+
+def git(cwd, *args):
+    result = subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                            cwd=cwd, check=True, capture_output=True, text=True)
+    return result.stdout.strip()
+
+@pytest.fixture
+def origin(tmp_path):
+    origin = tmp_path / "origin"
+    (origin / "pkg").mkdir(parents=True)
+    git(origin, "init", "-q")
+    (origin / "README.md").write_text("# readme")
+    (origin / "pkg" / "mod.py").write_text("def f():\n    return 'é'\n")
+    (origin / "logo.png").write_bytes(b"\x89PNG\x00\xff")
+    (origin / "link.md").symlink_to("README.md")
+    git(origin, "add", ".")
+    git(origin, "commit", "-qm", "initial")
+    return origin
+
+@pytest.mark.asyncio
+async def test_bare_clone_is_read_through_cat_file(origin, tmp_path):
+    target = tmp_path / "clone"
+    await repository.clone_repository(str(origin), target, use_mirror=False, bare=True)
+    assert is_bare_repository(target)
+
+    async with GitObjectSource(target) as source:
+        files = await source.list_files()
+        # Symlinks are not regular files.
+        assert sorted(files) == ["README.md", "logo.png", "pkg/mod.py"]
+        assert await source.read_text("pkg/mod.py") == "def f():\n    return 'é'\n"
+        assert await source.read_bytes("logo.png") == b"\x89PNG\x00\xff"
+        assert await source.read_text("README.md") == "# readme"
+        with pytest.raises(FileNotFoundError):
+            await source.read_bytes("missing.py")
+    assert await read_file(target, "HEAD", "README.md") == "# readme"
+
+@pytest.mark.asyncio
+async def test_pipeline_ingests_a_bare_clone_and_reuses_it(origin, tmp_path, monkeypatch):
+    from src.core import vectorstore
+    stored = []
+    async def fake_embed_chunked_files(files):
+        return {path: ({f"{path}_chunk_0": [0.0]}, {f"{path}_chunk_0": "".join(chunks)}) for path, chunks in files}
+    async def fake_store_embeddings(embeddings, chunk_texts):
+        stored.extend(chunk_texts.items())
+        return []
+    monkeypatch.setattr(vectorstore, "embed_chunked_files", fake_embed_chunked_files)
+    monkeypatch.setattr(vectorstore, "store_embeddings", fake_store_embeddings)
+    monkeypatch.setattr(vectorstore, "finalize_index", lambda: False)
+    monkeypatch.setattr(vectorstore, "checkpoint", lambda: None)
+
+    target = tmp_path / "clone"
+    await repository.clone_repository(str(origin), target, use_mirror=False, bare=True)
+    processed = await IngestionPipeline(target).run()
+    assert sorted(p.relative_to(target).as_posix() for p in processed) == ["README.md", "pkg/mod.py"]
+    assert dict(stored)[f"{target / 'pkg' / 'mod.py'}_chunk_0"].startswith("def f()")
+
+    # A second clone of the same URL fetches into the existing bare clone.
+    (origin / "README.md").write_text("# updated")
+    git(origin, "commit", "-qam", "update")
+    (target / "marker").write_text("kept")
+    await repository.clone_repository(str(origin), target, use_mirror=False, bare=True)
+    assert (target / "marker").exists()
+    assert await read_file(target, "HEAD", "README.md") == "# updated"
+
+@pytest.mark.asyncio
+async def test_listing_a_partial_clone_does_not_fetch_missing_blobs(origin, tmp_path):
+    (origin / "large.bin").write_bytes(b"\x00" * 1000)
+    git(origin, "add", ".")
+    git(origin, "commit", "-qm", "add large.bin")
+    git(origin, "config", "uploadpack.allowFilter", "true")
+    target = tmp_path / "clone"
+    await repository.clone_repository(f"file://{origin}", target, depth=0, blob_filter="blob:limit=100",
+                                      use_mirror=False, bare=True)
+    def missing_objects():
+        output = git(target, "rev-list", "--objects", "--all", "--missing=print")
+        return sum(line.startswith("?") for line in output.splitlines())
+
+    assert missing_objects() == 1
+    async with GitObjectSource(target) as source:
+        assert "large.bin" in await source.list_files()
+    assert missing_objects() == 1
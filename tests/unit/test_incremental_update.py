@@ -0,0 +1,146 @@
+import subprocess
+import pytest
+from src.core import vectorstore, repository
+
+def git(cwd, *args):
+    subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                   cwd=cwd, check=True, capture_output=True)
+
+@pytest.fixture
+def isolated_index(monkeypatch, tmp_path):
+    monkeypatch.setattr(vectorstore, "FAISS_INDEX_FILE", str(tmp_path / "index.idx"))
+    monkeypatch.setattr(vectorstore, "METADATA_FILE", str(tmp_path / "metadata.db"))
+    monkeypatch.setattr(vectorstore, "embedding_cache", None)
+
+    async def fake_generate_embeddings(texts):
+        return [[float(len(t))] * vectorstore.DIMENSION for t in texts]
+
+    monkeypatch.setattr(vectorstore, "generate_embeddings", fake_generate_embeddings)
+    vectorstore.load_index()
+    yield
+    monkeypatch.undo()
+    vectorstore.load_index()
+
+def indexed_texts():
+    return sorted(meta["chunk_text"] for meta in vectorstore.current_index().metadata_store.values())
+
+@pytest.mark.asyncio
+async def test_update_reindexes_only_changed_files(isolated_index, tmp_path):
+    origin = tmp_path / "origin"
+    origin.mkdir()
+    git(origin, "init", "-q")
+    (origin / "keep.py").write_text("keep")
+    (origin / "edit.py").write_text("before")
+    (origin / "gone.md").write_text("gone")
+    git(origin, "add", ".")
+    git(origin, "commit", "-qm", "initial")
+
+    target = str(tmp_path / "clone")
+    await repository.clone_and_process_repository(str(origin), target)
+    assert indexed_texts() == ["before", "gone", "keep"]
+    assert vectorstore.current_index().faiss_index.ntotal == 3
+
+    (origin / "edit.py").write_text("after")
+    (origin / "gone.md").unlink()
+    (origin / "new.txt").write_text("new")
+    git(origin, "add", "-A")
+    git(origin, "commit", "-qm", "change")
+
+    result = await repository.update_repository(str(origin), target)
+    assert result["mode"] == "incremental"
+    assert sorted(p.rsplit("/", 1)[-1] for p in result["files_processed"]) == ["edit.py", "new.txt"]
+    assert [p.rsplit("/", 1)[-1] for p in result["files_removed"]] == ["gone.md"]
+    assert indexed_texts() == ["after", "keep", "new"]
+    assert vectorstore.current_index().faiss_index.ntotal == 3
+    assert vectorstore.current_index().index_state["commit"] == result["commit"]
+
+@pytest.mark.asyncio
+async def test_update_without_index_falls_back_to_full_ingestion(isolated_index, tmp_path):
+    origin = tmp_path / "origin"
+    origin.mkdir()
+    git(origin, "init", "-q")
+    (origin / "a.py").write_text("a")
+    git(origin, "add", ".")
+    git(origin, "commit", "-qm", "initial")
+
+    result = await repository.update_repository(str(origin), str(tmp_path / "clone"))
+    assert result["mode"] == "full"
+    assert indexed_texts() == ["a"]
+
+class SimulatedCrash(BaseException):
+    pass
+
+@pytest.mark.asyncio
+async def test_interrupted_ingestion_resumes_from_checkpoint(isolated_index, monkeypatch, tmp_path):
+    origin = tmp_path / "origin"
+    origin.mkdir()
+    git(origin, "init", "-q")
+    for name in ("a.py", "b.py", "c.py"):
+        (origin / name).write_text(name)
+    git(origin, "add", ".")
+    git(origin, "commit", "-qm", "initial")
+
+    monkeypatch.setattr(vectorstore, "CHECKPOINT_EVERY_FILES", 1)
+    embedded = []
+    async def fake_generate_embeddings(texts):
+        embedded.extend(texts)
+        return [[1.0] * vectorstore.DIMENSION for _ in texts]
+    monkeypatch.setattr(vectorstore, "generate_embeddings", fake_generate_embeddings)
+
+    # Crash while storing the third file, after two files were checkpointed.
+    store_embeddings = vectorstore.store_embeddings
+    async def crashing_store_embeddings(embeddings, chunk_texts):
+        if len(vectorstore.current_index().metadata_store) == 2:
+            raise SimulatedCrash()
+        return await store_embeddings(embeddings, chunk_texts)
+    monkeypatch.setattr(vectorstore, "store_embeddings", crashing_store_embeddings)
+
+    target = str(tmp_path / "clone")
+    with pytest.raises(BaseException):
+        await repository.clone_and_process_repository(str(origin), target)
+
+    # Simulate a restart: only what reached a checkpoint is loaded back.
+    vectorstore.load_index()
+    assert vectorstore.current_index().index_state["status"] == "in_progress"
+    checkpointed = sorted(meta["chunk_text"] for meta in vectorstore.current_index().metadata_store.values())
+    assert len(checkpointed) == 2
+
+    monkeypatch.setattr(vectorstore, "store_embeddings", store_embeddings)
+    embedded.clear()
+
+    processed = await repository.clone_and_process_repository(str(origin), target)
+    assert sorted(p.name for p in processed) == ["a.py", "b.py", "c.py"]
+    # Checkpointed files are not embedded again.
+    assert not set(embedded) & set(checkpointed)
+    assert indexed_texts() == ["a.py", "b.py", "c.py"]
+    assert vectorstore.current_index().index_state["status"] == "complete"
+
+@pytest.mark.asyncio
+async def test_file_manifest_tracks_repository_files(isolated_index, tmp_path):
+    origin = tmp_path / "origin"
+    (origin / "pkg").mkdir(parents=True)
+    git(origin, "init", "-q")
+    (origin / "README.md").write_text("readme")
+    (origin / "pkg" / "README.md").write_text("nested readme")
+    (origin / "setup.cfg").write_text("[metadata]")
+    git(origin, "add", ".")
+    git(origin, "commit", "-qm", "initial")
+
+    target = tmp_path / "clone"
+    await repository.clone_and_process_repository(str(origin), str(target))
+    manifest = vectorstore.current_index().file_manifest
+    # Files that are not embedded are still resolvable by name, nested matches sort last.
+    assert manifest.find("SETUP.CFG") == [str(target / "setup.cfg")]
+    assert manifest.find("readme.md") == [str(target / "README.md"), str(target / "pkg" / "README.md")]
+    store = vectorstore.current_index().metadata_store
+    assert len(store.ids_for_files([str(target / "README.md")])) == 1
+    assert store.ids_for_files([str(target / "setup.cfg")]) == []
+
+    (origin / "setup.cfg").unlink()
+    git(origin, "add", "-A")
+    git(origin, "commit", "-qm", "drop setup.cfg")
+    await repository.update_repository(str(origin), str(target))
+    assert vectorstore.current_index().file_manifest.find("setup.cfg") == []
+
+    vectorstore.load_index()
+    assert vectorstore.current_index().file_manifest.find("readme.md")[0] == str(target / "README.md")
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from src.core import index_factory
+
+DIM = 32
+
+def random_vectors(n, seed=0, dim=DIM):
+    vectors = np.random.default_rng(seed).standard_normal((n, dim), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "hnsw", "ivf_pq"])
+def test_index_types_find_stored_vectors(index_type):
+    vectors = random_vectors(2000)
+    ids = np.arange(100, 2100, dtype=np.int64)
+    index = index_factory.train_and_fill(index_type, DIM, ids, vectors)
+    assert index_factory.index_type_of(index) == index_type
+    assert sorted(index_factory.index_ids(index).tolist()) == ids.tolist()
+
+    index_factory.apply_search_params(index, k=5, nprobe=8, ef_search=32)
+    _, found = index.search(vectors[:20], 5)
+    recall = np.mean([ids[i] in row for i, row in enumerate(found)])
+    assert recall >= 0.8
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "ivf_pq"])
+def test_removable_index_types(index_type):
+    vectors = random_vectors(1000)
+    ids = np.arange(1000, dtype=np.int64)
+    index = index_factory.train_and_fill(index_type, DIM, ids, vectors)
+    assert index_factory.remove_ids(index, np.array([3, 4, 5])) == 3
+    assert index.ntotal == 997
+    assert not {3, 4, 5} & set(index_factory.index_ids(index).tolist())
+
+def test_hnsw_removal_leaves_tombstones():
+    index = index_factory.train_and_fill("hnsw", DIM, np.arange(50, dtype=np.int64), random_vectors(50))
+    assert index_factory.remove_ids(index, np.array([1])) == 0
+    assert index.ntotal == 50
+
+def test_choose_index_type_by_corpus_size(monkeypatch):
+    monkeypatch.setattr(index_factory, "AUTO_IVF_MIN_VECTORS", 100)
+    monkeypatch.setattr(index_factory, "AUTO_PQ_MIN_VECTORS", 1000)
+    assert index_factory.choose_index_type(10) == "flat"
+    assert index_factory.choose_index_type(500) == "ivf_flat"
+    assert index_factory.choose_index_type(5000) == "ivf_pq"
+
+def test_finalize_index_rebuilds_with_same_ids(monkeypatch, tmp_path):
+    from src.core import vectorstore
+    monkeypatch.setattr(vectorstore, "FAISS_INDEX_FILE", str(tmp_path / "index.idx"))
+    monkeypatch.setattr(vectorstore, "METADATA_FILE", str(tmp_path / "metadata.db"))
+    monkeypatch.setattr(index_factory, "AUTO_IVF_MIN_VECTORS", 500)
+    vectorstore.load_index()
+    try:
+        vectors = random_vectors(600, seed=1, dim=vectorstore.DIMENSION)
+        ids = np.arange(600, dtype=np.int64)
+        vectorstore.current_index().faiss_index.add_with_ids(vectors, ids)
+        assert vectorstore.finalize_index("auto") is True
+        assert index_factory.index_type_of(vectorstore.current_index().faiss_index) == "ivf_flat"
+        result = vectorstore.query_faiss(vectors[42].tolist(), k=1, nprobe=4)
+        assert result["indices"][0][0] == 42
+        # Already the right type: nothing to do.
+        assert vectorstore.finalize_index("auto") is False
+        # The trained index survives a checkpoint and reload.
+        vectorstore.current_index().global_id_counter = 600
+        vectorstore.checkpoint()
+        vectorstore.load_index()
+        assert index_factory.index_type_of(vectorstore.current_index().faiss_index) == "ivf_flat"
+        assert vectorstore.current_index().faiss_index.ntotal == 600
+    finally:
+        monkeypatch.undo()
+        vectorstore.load_index()
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "hnsw"])
+def test_range_search_returns_only_hits_above_min_score(index_type):
+    vectors = random_vectors(500)
+    index = index_factory.train_and_fill(index_type, DIM, np.arange(500, dtype=np.int64), vectors)
+    index_factory.apply_search_params(index, k=10, nprobe=64)
+    # Random 32-d unit vectors are nearly orthogonal, so only the query itself scores above 0.9.
+    scores, ids = index_factory.range_search(index, vectors[7:8], 0.9, k=10)
+    assert ids.tolist() == [7]
+    assert scores[0] == pytest.approx(1.0, abs=1e-4)
+    scores, ids = index_factory.range_search(index, vectors[7:8], -1.0, k=10)
+    assert len(ids) == 10
+    assert list(scores) == sorted(scores, reverse=True)
@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from src.core import vectorstore
+from src.core.ingestion import IngestionPipeline
+from src.core.vectorstore import DIMENSION
+
+@pytest.fixture
+def repo_dir(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "a.py").write_text("print('a')")
+    (tmp_path / "pkg" / "b.py").write_text("print('b')")
+    (tmp_path / "README.md").write_text("# readme")
+    (tmp_path / "image.png").write_bytes(b"\x89PNG")
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "notes.txt").write_text("ignored")
+    return tmp_path
+
+@pytest.mark.asyncio
+async def test_pipeline_processes_eligible_files(monkeypatch, repo_dir):
+    async def fake_generate_embeddings(texts):
+        await asyncio.sleep(0.01)
+        return [[float(len(t))] * DIMENSION for t in texts]
+
+    stored = {}
+    async def fake_store_embeddings(embeddings, chunk_texts):
+        stored.update(chunk_texts)
+
+    monkeypatch.setattr("src.core.vectorstore.generate_embeddings", fake_generate_embeddings)
+    monkeypatch.setattr("src.core.vectorstore.store_embeddings", fake_store_embeddings)
+
+    processed = await IngestionPipeline(repo_dir, read_workers=2, embed_workers=2, queue_size=1).run()
+
+    assert sorted(p.name for p in processed) == ["README.md", "a.py", "b.py"]
+    assert str(repo_dir / "pkg" / "a.py") + "_chunk_0" in stored
+    assert not any(".git" in key for key in stored)
+
+@pytest.mark.asyncio
+async def test_pipeline_skips_files_whose_embedding_fails(monkeypatch, repo_dir):
+    async def fake_generate_embeddings(texts):
+        return [None if "'b'" in t else [1.0] * DIMENSION for t in texts]
+
+    async def fake_store_embeddings(embeddings, chunk_texts):
+        pass
+
+    monkeypatch.setattr("src.core.vectorstore.generate_embeddings", fake_generate_embeddings)
+    monkeypatch.setattr("src.core.vectorstore.store_embeddings", fake_store_embeddings)
+
+    processed = await IngestionPipeline(repo_dir).run()
+    # A file without embeddings is still reported as processed, matching process_code_file.
+    assert len(processed) == 3
+
+@pytest.mark.asyncio
+async def test_symbols_are_only_kept_for_indexed_files(monkeypatch, repo_dir):
+    async def fake_generate_embeddings(texts):
+        return [[1.0] * DIMENSION for _ in texts]
+
+    async def fake_store_embeddings(embeddings, chunk_texts):
+        if any("'b'" in text for text in chunk_texts.values()):
+            raise RuntimeError("index full")
+
+    monkeypatch.setattr("src.core.vectorstore.generate_embeddings", fake_generate_embeddings)
+    monkeypatch.setattr("src.core.vectorstore.store_embeddings", fake_store_embeddings)
+
+    processed = await IngestionPipeline(repo_dir).run()
+    symbols = vectorstore.current_index().symbol_table
+    assert sorted(p.name for p in processed) == ["README.md", "a.py"]
+    assert str(repo_dir / "pkg" / "a.py") in symbols
+    assert str(repo_dir / "pkg" / "b.py") not in symbols
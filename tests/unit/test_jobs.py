@@ -0,0 +1,52 @@
+import asyncio
+import pytest
+from src.core.ingestion import current_progress
+from src.core.jobs import JobManager, JobQueueFull
+
+@pytest.mark.asyncio
+async def test_jobs_run_in_order_within_the_concurrency_limit():
+    manager = JobManager(max_concurrent=1, max_queued=1)
+    release = asyncio.Event()
+    order = []
+
+    async def work(name):
+        order.append(name)
+        current_progress().files_scanned += 1
+        await release.wait()
+        return {"name": name}
+
+    first = manager.submit(lambda: work("first"))
+    second = manager.submit(lambda: work("second"))
+    with pytest.raises(JobQueueFull):
+        manager.submit(lambda: work("third"))
+    await asyncio.sleep(0)
+    assert (first.status, second.status) == ("running", "queued")
+
+    release.set()
+    await asyncio.gather(first.done, second.done)
+    assert order == ["first", "second"]
+    assert second.result == {"name": "second"}
+    assert second.to_dict()["progress"]["files_scanned"] == 1
+
+@pytest.mark.asyncio
+async def test_cancel_running_and_queued_jobs():
+    manager = JobManager(max_concurrent=1, max_queued=5)
+
+    async def forever():
+        await asyncio.Event().wait()
+
+    async def failing():
+        raise RuntimeError("clone failed")
+
+    running = manager.submit(forever)
+    queued = manager.submit(forever)
+    failed = manager.submit(failing)
+    await asyncio.sleep(0)
+    assert manager.cancel(queued.id)
+    assert queued.status == "cancelled"
+    assert manager.cancel(running.id)
+    await running.done
+    assert running.status == "cancelled"
+    await failed.done
+    assert (failed.status, failed.error) == ("failed", "clone failed")
+    assert not manager.cancel(failed.id)
@@ -0,0 +1,82 @@
+import asyncio
+import numpy as np
+import pytest
+from src.core import assistant, vectorstore
+from src.core.chunking import Chunk
+from src.core.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+from src.core.metadata_store import MetadataStore
+
+def test_tokenize_splits_compound_identifiers():
+    assert tokenize("def mergeEnvironmentSettings(self):") == [
+        "def", "mergeenvironmentsettings", "merge", "environment", "settings", "self"]
+    assert tokenize("merge_environment_settings") == [
+        "merge_environment_settings", "merge", "environment", "settings"]
+
+def test_bm25_prefers_exact_rare_terms_and_persists(tmp_path):
+    store = MetadataStore(str(tmp_path / "metadata.db"))
+    index = LexicalIndex(store)
+    index.add(0, "def merge_environment_settings(self, url, proxies): return settings")
+    index.add_many([(1, "environment variables and settings are read from the environment"),
+                    (2, "def send(self, request): return self.adapter.send(request)")])
+    hits = index.search("where is merge_environment_settings defined?", k=2)
+    assert [doc_id for doc_id, _ in hits] == [0, 1]
+    assert index.search("where is it?") == []
+
+    index.remove([0])
+    assert [doc_id for doc_id, _ in index.search("merge_environment_settings")] == [1]
+    store.commit()
+    committed = index.search("adapter send")
+    # Uncommitted postings are rolled back, like the metadata they belong to.
+    index.add(3, "def adapter(): pass")
+    store.close()
+    loaded = LexicalIndex(MetadataStore(store.path))
+    assert loaded.search("adapter send") == committed and len(loaded) == 2
+    loaded.clear()
+    assert len(loaded) == 0 and loaded.search("adapter") == []
+    loaded.store.close()
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 4]], k=60)
+    assert [doc_id for doc_id, _ in fused] == [3, 1, 2, 4]
+
+def test_lexical_index_follows_the_repo_index(tmp_path):
+    files = (str(tmp_path / "index.idx"), str(tmp_path / "metadata.db"))
+    index = vectorstore.RepoIndex(*files)
+    with vectorstore.use_index(index):
+        asyncio.run(vectorstore.store_embeddings(
+            {"a.py_chunk_0": [1.0] * vectorstore.DIMENSION, "b.py_chunk_0": [0.5] * vectorstore.DIMENSION},
+            {"a.py_chunk_0": Chunk("def load_index(): pass", 1, 1, "load_index"), "b.py_chunk_0": "print(1)"}))
+        assert [i for i, _ in vectorstore.query_lexical("load_index")] == [0]
+        vectorstore.remove_file_embeddings(["b.py"])
+        index.checkpoint()
+    index.close()
+    reloaded = vectorstore.RepoIndex(*files)
+    assert len(reloaded.lexical_index) == 1
+    assert [i for i, _ in reloaded.lexical_index.search("load index")] == [0]
+    reloaded.close()
+
+@pytest.mark.asyncio
+async def test_rag_context_fuses_lexical_and_vector_hits(monkeypatch, tmp_path):
+    index = vectorstore.RepoIndex(str(tmp_path / "index.idx"), str(tmp_path / "metadata.db"))
+    async def fake_generate_embedding(text):
+        return [1.0] * vectorstore.DIMENSION
+
+    # The vector search only finds the generic chunk.
+    def fake_query_faiss(embedding, k=1, min_score=None):
+        return {"indices": np.array([[1]]), "distances": np.array([[0.9]])}
+
+    monkeypatch.setattr(assistant, "generate_embedding", fake_generate_embedding)
+    monkeypatch.setattr(assistant, "query_faiss", fake_query_faiss)
+    monkeypatch.setattr(assistant, "response_cache", None)
+    with vectorstore.use_index(index):
+        await vectorstore.store_embeddings(
+            {"s.py_chunk_0": [1.0] * vectorstore.DIMENSION, "s.py_chunk_1": [0.5] * vectorstore.DIMENSION},
+            {"s.py_chunk_0": Chunk("def merge_environment_settings(self):\n    pass", 1, 2,
+                                   "merge_environment_settings"),
+             "s.py_chunk_1": Chunk("class Session:\n    pass", 4, 5, "Session")})
+        rag_context = await assistant.prepare_rag_context("Where is merge_environment_settings defined?")
+    index.close()
+    sources = {s["source"]: s for s in rag_context["sources"]}
+    assert sources["s.py_chunk_0"]["bm25"] > 0 and "similarity" not in sources["s.py_chunk_0"]
+    assert sources["s.py_chunk_1"]["similarity"] == pytest.approx(0.9)
+    assert "def merge_environment_settings" in rag_context["prompt"]
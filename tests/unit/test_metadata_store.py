@@ -0,0 +1,77 @@
+import json
+import pytest
+from src.core.metadata_store import MetadataStore
+
+@pytest.fixture
+def store(tmp_path):
+    store = MetadataStore(str(tmp_path / "metadata.db"))
+    yield store
+    store.close()
+
+def test_behaves_like_a_dict(store):
+    store.update({
+        0: {"file_chunk_id": "a.py_chunk_0", "file_path": "a.py", "chunk_text": "x"},
+        1: {"file_chunk_id": "b.py_chunk_0", "file_path": "b.py", "chunk_text": "y"},
+    })
+    store[2] = {"file_chunk_id": "a.py_chunk_1", "file_path": "a.py", "chunk_text": "z"}
+    assert len(store) == 3
+    assert 1 in store and 7 not in store
+    assert store[2]["chunk_text"] == "z"
+    assert list(store) == [0, 1, 2]
+    assert [meta["chunk_text"] for meta in store.values()] == ["x", "y", "z"]
+    del store[1]
+    with pytest.raises(KeyError):
+        store[1]
+    assert store.get(1) is None
+
+def test_per_file_lookups(store):
+    store.update({i: {"file_path": path} for i, path in enumerate(["a.py", "b.py", "a.py", "c.md"])})
+    assert store.ids_for_files(["a.py", "c.md"]) == [0, 2, 3]
+    assert store.file_paths() == {"a.py", "b.py", "c.md"}
+    store.delete_many([0, 2])
+    assert store.file_paths() == {"b.py", "c.md"}
+    assert store.get_many([1, 2, 3]) == {1: {"file_path": "b.py"}, 3: {"file_path": "c.md"}}
+
+def test_only_committed_writes_survive_reopening(tmp_path):
+    path = str(tmp_path / "metadata.db")
+    store = MetadataStore(path)
+    store[0] = {"chunk_text": "committed"}
+    store.set_state("global_id_counter", 1)
+    store.commit()
+    store[1] = {"chunk_text": "pending"}
+    store.close()
+
+    reopened = MetadataStore(path)
+    assert list(reopened) == [0]
+    assert reopened.get_state("global_id_counter") == 1
+    assert reopened.get_state("missing", "default") == "default"
+    reopened.close()
+
+def test_legacy_json_metadata_is_migrated(tmp_path, monkeypatch):
+    from src.core import vectorstore
+    legacy = tmp_path / "metadata.json"
+    legacy.write_text(json.dumps({
+        "global_id_counter": 2,
+        "index_state": {"commit": "abc"},
+        "metadata_store": {"0": {"file_chunk_id": "a.py_chunk_0", "chunk_text": "def load_index(): pass"}},
+    }))
+    monkeypatch.setattr(vectorstore, "FAISS_INDEX_FILE", str(tmp_path / "index.idx"))
+    monkeypatch.setattr(vectorstore, "METADATA_FILE", str(legacy))
+    vectorstore.load_index()
+    try:
+        assert vectorstore.current_index().metadata_store[0]["chunk_text"] == "def load_index(): pass"
+        assert vectorstore.current_index().global_id_counter == 2
+        assert vectorstore.current_index().index_state == {"commit": "abc"}
+        assert (tmp_path / "metadata.db").exists()
+        # Older versions had no lexical index; it is built from the migrated entries.
+        assert [i for i, _ in vectorstore.query_lexical("load_index")] == [0]
+    finally:
+        monkeypatch.undo()
+        vectorstore.load_index()
+
+def test_loading_an_empty_namespace_creates_no_files(tmp_path):
+    from src.core import vectorstore
+    index = vectorstore.RepoIndex(str(tmp_path / "index.idx"), str(tmp_path / "metadata.db"))
+    index.reset(remove_files=False)
+    index.close()
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,54 @@
+import pytest
+from types import SimpleNamespace
+from src.core.openai_client import call_openai
+from src.utils.metrics import MetricsRegistry, ProcessSampler, metrics
+from src.utils.performance import measure_time
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ["path"])
+    requests.labels(path="/a").inc()
+    requests.labels(path='/"b"').inc(2)
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        latency.observe(value)
+    assert registry.counter("requests_total", "Requests.", ["path"]) is requests
+    with pytest.raises(ValueError):
+        registry.gauge("requests_total", "Requests.")
+
+    lines = registry.render().splitlines()
+    assert lines[:5] == ["# HELP latency_seconds Latency.", "# TYPE latency_seconds histogram",
+                         'latency_seconds_bucket{le="0.1"} 1', 'latency_seconds_bucket{le="1"} 2',
+                         'latency_seconds_bucket{le="+Inf"} 3']
+    assert "latency_seconds_sum 5.55" in lines and "latency_seconds_count 3" in lines
+    assert 'requests_total{path="/a"} 1' in lines
+    assert 'requests_total{path="/\\"b\\""} 2' in lines
+
+def test_process_sampler_fills_gauges():
+    registry = MetricsRegistry()
+    sampler = ProcessSampler(interval=60, registry=registry)
+    assert sampler.rss_bytes > 0
+    assert registry.get("process_threads").labels().value >= 1
+
+@pytest.mark.asyncio
+async def test_stages_llm_calls_and_tokens_are_recorded():
+    def value(name, **labels):
+        return metrics.get(name).labels(**labels).value
+
+    @measure_time
+    async def chunk_everything():
+        return 1
+
+    tokens_in = value("repo_analysis_openai_tokens_total", kind="chat", direction="in")
+    successes = value("repo_analysis_openai_requests_total", kind="chat", outcome="success")
+    llm_calls = metrics.get("repo_analysis_stage_duration_seconds").labels(stage="llm").count
+
+    async def fake_request():
+        return SimpleNamespace(usage=SimpleNamespace(prompt_tokens=12, completion_tokens=3))
+    await call_openai(fake_request, 10)
+    await chunk_everything()
+
+    assert value("repo_analysis_openai_tokens_total", kind="chat", direction="in") == tokens_in + 12
+    assert value("repo_analysis_openai_requests_total", kind="chat", outcome="success") == successes + 1
+    assert metrics.get("repo_analysis_stage_duration_seconds").labels(stage="llm").count == llm_calls + 1
+    assert metrics.get("repo_analysis_function_duration_seconds").labels(function="chunk_everything").count == 1
@@ -0,0 +1,93 @@
+import asyncio
+import subprocess
+import numpy as np
+import pytest
+from src.core import vectorstore, repository, namespaces
+from src.core.namespaces import RepoRegistry
+
+def git(cwd, *args):
+    subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                   cwd=cwd, check=True, capture_output=True)
+
+def make_origin(path, files):
+    path.mkdir()
+    git(path, "init", "-q")
+    for name, text in files.items():
+        (path / name).write_text(text)
+    git(path, "add", ".")
+    git(path, "commit", "-qm", "initial")
+    return str(path)
+
+@pytest.fixture
+def repos_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(namespaces, "REPOS_DIR", str(tmp_path / "repos"))
+    monkeypatch.setattr(vectorstore, "embedding_cache", None)
+
+    async def fake_generate_embeddings(texts):
+        return [[float(len(t))] * vectorstore.DIMENSION for t in texts]
+
+    monkeypatch.setattr(vectorstore, "generate_embeddings", fake_generate_embeddings)
+    return tmp_path / "repos"
+
+def texts_of(index):
+    return sorted(meta["chunk_text"] for meta in index.metadata_store.values())
+
+@pytest.mark.asyncio
+async def test_namespaces_ingest_concurrently_in_isolation(repos_dir, tmp_path):
+    registry = RepoRegistry()
+    origins = {
+        "alpha": make_origin(tmp_path / "alpha", {"a.py": "alpha code", "README.md": "alpha readme"}),
+        "beta": make_origin(tmp_path / "beta", {"b.py": "beta code"}),
+    }
+    default_vectors = vectorstore.current_index().faiss_index.ntotal
+
+    async def clone(repo_id):
+        with registry.use(repo_id):
+            return await repository.clone_and_process_repository(origins[repo_id],
+                                                                 str(namespaces.checkout_dir(repo_id)))
+
+    await asyncio.gather(clone("alpha"), clone("beta"))
+    assert texts_of(registry.get("alpha")) == ["alpha code", "alpha readme"]
+    assert texts_of(registry.get("beta")) == ["beta code"]
+    assert vectorstore.current_index().faiss_index.ntotal == default_vectors
+    # Each namespace checks out into its own directory.
+    assert (repos_dir / "alpha" / "checkout" / "a.py").exists()
+    assert not (repos_dir / "alpha" / "checkout" / "b.py").exists()
+
+    with registry.use("alpha"):
+        assert vectorstore.current_index().faiss_index.ntotal == 2
+        assert vectorstore.current_index().file_manifest.find("readme.md")
+        assert vectorstore.current_index().index_state["repo_url"] == origins["alpha"]
+    registry.close()
+
+@pytest.mark.asyncio
+async def test_least_recently_used_namespace_is_evicted_and_reloaded(repos_dir, tmp_path):
+    registry = RepoRegistry(max_loaded=2)
+    for repo_id in ("one", "two", "three"):
+        origin = make_origin(tmp_path / repo_id, {"f.py": f"{repo_id} code"})
+        with registry.use(repo_id):
+            await repository.clone_and_process_repository(origin, str(namespaces.checkout_dir(repo_id)))
+    assert registry.loaded_repos() == ["two", "three"]
+
+    # Reloaded lazily from its own files, pushing out the least recently used one.
+    assert texts_of(registry.get("one")) == ["one code"]
+    assert registry.loaded_repos() == ["three", "one"]
+
+    # A namespace in use is never evicted, even past the limit.
+    with registry.use("three"):
+        registry.get("two")
+        registry.get("one")
+        assert "three" in registry.loaded_repos()
+    assert len(registry.loaded_repos()) == 2
+    registry.close()
+
+def test_memory_budget_and_repo_ids(repos_dir):
+    registry = RepoRegistry(memory_budget_mb=0.001)
+    index = registry.get("small")
+    index.faiss_index.add_with_ids(np.ones((1, vectorstore.DIMENSION), dtype=np.float32), np.array([0]))
+    registry.get("other")
+    assert registry.loaded_repos() == ["other"]
+    with pytest.raises(ValueError):
+        namespaces.checkout_dir("../escape")
+    assert not registry.exists("missing")
+    registry.close()
@@ -1,5 +1,6 @@
 import asyncio
 import pytest
+from src.core import vectorstore
 from src.core.assistant import analyze_code, generate_rag_response
 
 # Dummy classes to simulate OpenAI API response structure.
@@ -41,7 +42,7 @@ def patch_vectorstore(monkeypatch):
     monkeypatch.setattr("src.core.assistant.generate_embedding", dummy_generate_embedding)
     monkeypatch.setattr("src.core.assistant.query_faiss", dummy_query_faiss)
     # Also override metadata_store to use our dummy value.
-    monkeypatch.setattr("src.core.assistant.metadata_store", dummy_metadata_store)
+    monkeypatch.setattr(vectorstore.current_index(), "metadata_store", dummy_metadata_store)
 
 @pytest.mark.asyncio
 async def test_analyze_code(monkeypatch):
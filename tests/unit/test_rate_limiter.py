@@ -1,7 +1,7 @@
 import asyncio
 import time
 import pytest
-from src.utils.rate_limiter import AsyncRateLimiter
+from src.utils.rate_limiter import AsyncRateLimiter, AdaptiveRateLimiter
 
 @pytest.mark.asyncio
 async def test_rate_limiter():
@@ -27,4 +27,56 @@ async def test_rate_limiter():
     # We expect the total elapsed time to be at least 1 second.
     assert elapsed >= 1, f"Elapsed time {elapsed} is less than expected for rate limiting"
     # Check that all operations returned the expected value.
-    assert all(result == 1 for result in results)
\ No newline at end of file
+    assert all(result == 1 for result in results)
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_budgets_tokens():
+    # 600 tokens per minute refill at 10 tokens per second.
+    limiter = AdaptiveRateLimiter(requests_per_minute=1000, tokens_per_minute=600)
+    start = time.monotonic()
+    await limiter.acquire(600)
+    assert time.monotonic() - start < 0.1
+    await limiter.acquire(3)
+    assert time.monotonic() - start >= 0.25
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_serves_higher_priority_first():
+    limiter = AdaptiveRateLimiter(requests_per_minute=600, tokens_per_minute=100000)
+    limiter.pause(0.05)
+    order = []
+    async def request(name, priority):
+        await limiter.acquire(10, priority)
+        order.append(name)
+    bulk = [asyncio.create_task(request(f"bulk{i}", 1)) for i in range(3)]
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(request("interactive", 0))
+    await asyncio.gather(*bulk, interactive)
+    assert order == ["interactive", "bulk0", "bulk1", "bulk2"]
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_follows_server_headers():
+    from src.core import openai_client
+    limiter = AdaptiveRateLimiter(requests_per_minute=3000, tokens_per_minute=250000)
+    openai_limiter = openai_client.openai_limiter
+    openai_client.openai_limiter = limiter
+    try:
+        openai_client.observe_response(200, {"x-ratelimit-limit-requests": "500",
+                                             "x-ratelimit-limit-tokens": "60000",
+                                             "x-ratelimit-remaining-tokens": "100"})
+        stats = limiter.stats()
+        assert stats["requests_per_minute"] == 500 and stats["tokens_per_minute"] == 60000
+        assert stats["available_tokens"] <= 101
+
+        openai_client.observe_response(429, {"x-ratelimit-reset-requests": "200ms"})
+        start = time.monotonic()
+        await limiter.acquire(1)
+        assert time.monotonic() - start >= 0.2
+    finally:
+        openai_client.openai_limiter = openai_limiter
+
+def test_parse_reset_durations():
+    from src.core.openai_client import parse_reset
+    assert parse_reset("6m0s") == 360
+    assert parse_reset("1.5s") == 1.5
+    assert parse_reset("20ms") == 0.02
+    assert parse_reset(None) is None
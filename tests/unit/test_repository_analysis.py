@@ -1,9 +1,11 @@
 import pytest
 import asyncio
 from src.core.repository_analysis import analyze_repository
+from src.core.repository_analysis import RepositorySummarizer, FILE_PROMPT, DIRECTORY_PROMPT, REPOSITORY_PROMPT
+from src.core.summary_cache import SummaryCache
 
 @pytest.mark.asyncio
-async def test_analyze_repository(monkeypatch):
+async def test_analyze_repository(monkeypatch, tmp_path):
     # Create a fake analyze_code that returns a predictable summary,
     # explicitly including "file1.py" and "file2.txt" in the output.
     async def fake_analyze_code(query: str, context: str) -> str:
@@ -11,7 +13,8 @@ async def test_analyze_repository(monkeypatch):
         return f"Overall analysis includes: file1.py, file2.txt. Context was: {context}"
     
     # Patch the analyze_code function in the assistant module
-    monkeypatch.setattr("src.core.assistant.analyze_code", fake_analyze_code)
+    monkeypatch.setattr("src.core.repository_analysis.analyze_code", fake_analyze_code)
+    monkeypatch.setattr("src.core.repository_analysis.summary_cache", SummaryCache(str(tmp_path / "summaries.sqlite")))
     
     import tempfile, os
     with tempfile.TemporaryDirectory() as tempdir:
@@ -25,4 +28,68 @@ async def test_analyze_repository(monkeypatch):
     
         overall_analysis = await analyze_repository(tempdir)
         # Assert that the overall analysis mentions the file names.
-        assert "Based on the provided file summaries" in overall_analysis
\ No newline at end of file
+        assert "Based on the provided file summaries" in overall_analysis
+
+class FakeSummarizer:
+    """Records requests and how many ran at once."""
+
+    def __init__(self):
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, query: str, context: str) -> str:
+        self.calls.append((query, context))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if query == FILE_PROMPT:
+            return f"summary of {context.splitlines()[0]}"
+        return f"reduced {len(context.splitlines())} entries"
+
+def repository_files():
+    files = {f"pkg/sub/m{i}.py": f"module_{i} = {i}\n" for i in range(6)}
+    files["README.md"] = "readme\n"
+    return files
+
+@pytest.mark.asyncio
+async def test_summaries_are_mapped_concurrently_and_reduced_along_directories():
+    fake = FakeSummarizer()
+    summarizer = RepositorySummarizer(summarize=fake, concurrency=3, cache=None, reduce_max_tokens=40)
+    analysis = await summarizer.summarize(repository_files())
+
+    prompts = [query for query, _ in fake.calls]
+    assert prompts.count(FILE_PROMPT) == 7
+    assert 1 < fake.max_in_flight <= 3
+    # The large directory is condensed before reaching the root; the README goes up as is.
+    assert DIRECTORY_PROMPT in prompts
+    final_query, final_context = fake.calls[-1]
+    assert final_query == REPOSITORY_PROMPT
+    assert "File README.md summary: summary of readme" in final_context
+    assert "Directory pkg/" in final_context
+    assert "module_0" not in final_context
+    assert analysis.startswith("reduced")
+
+@pytest.mark.asyncio
+async def test_rerun_only_resummarizes_changed_files(tmp_path):
+    cache = SummaryCache(str(tmp_path / "summaries.sqlite"))
+    files = repository_files()
+    await RepositorySummarizer(summarize=FakeSummarizer(), cache=cache).summarize(files)
+
+    files["pkg/sub/m3.py"] = "module_3 = 'changed'\n"
+    fake = FakeSummarizer()
+    await RepositorySummarizer(summarize=fake, cache=cache).summarize(files)
+    assert [c for q, c in fake.calls if q == FILE_PROMPT] == ["module_3 = 'changed'\n"]
+    # Only the reductions above the changed file run again.
+    assert [q for q, _ in fake.calls if q != FILE_PROMPT] == [REPOSITORY_PROMPT]
+    cache.close()
+
+@pytest.mark.asyncio
+async def test_large_files_are_summarized_in_parts():
+    fake = FakeSummarizer()
+    summarizer = RepositorySummarizer(summarize=fake, cache=None, file_max_tokens=20, reduce_max_tokens=1000)
+    content = "".join(f"def f{i}():\n    return {i}\n\n" for i in range(5))
+    await summarizer.summarize_file("big.py", content)
+    assert sum(1 for q, _ in fake.calls if q == FILE_PROMPT) == 6
+    assert "Lines 1-" in fake.calls[-1][1]
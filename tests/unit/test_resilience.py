@@ -0,0 +1,160 @@
+import asyncio
+import time
+import httpx
+import openai
+import pytest
+from src.utils.resilience import (CircuitBreaker, CircuitOpenError, DeadlineExceededError, call_with_retries,
+                                  hedged)
+
+class Flaky:
+    """Fails with error the first `failures` times it is called."""
+
+    def __init__(self, failures, error=ConnectionError):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error("transient")
+        return "ok"
+
+@pytest.mark.asyncio
+async def test_transient_failures_are_retried():
+    flaky = Flaky(2)
+    assert await call_with_retries(flaky, attempts=3, base_delay=0.01, retry_on=(ConnectionError,)) == "ok"
+    assert flaky.calls == 3
+
+    exhausted = Flaky(5)
+    with pytest.raises(ConnectionError):
+        await call_with_retries(exhausted, attempts=3, base_delay=0.01, retry_on=(ConnectionError,))
+    assert exhausted.calls == 3
+
+@pytest.mark.asyncio
+async def test_other_errors_are_not_retried():
+    flaky = Flaky(1, error=ValueError)
+    with pytest.raises(ValueError):
+        await call_with_retries(flaky, attempts=3, base_delay=0.01, retry_on=(ConnectionError,))
+    assert flaky.calls == 1
+
+@pytest.mark.asyncio
+async def test_attempt_timeout_and_deadline():
+    calls = 0
+    async def slow():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(1)
+
+    start = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        await call_with_retries(slow, attempts=10, base_delay=0.01, attempt_timeout=0.05, deadline=0.3)
+    assert time.monotonic() - start < 0.6
+    assert 1 < calls < 10
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_fails_fast_then_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+    failing = Flaky(3)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            await call_with_retries(failing, attempts=1, retry_on=(ConnectionError,), breaker=breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        await call_with_retries(failing, attempts=1, retry_on=(ConnectionError,), breaker=breaker)
+    assert failing.calls == 2
+
+    await asyncio.sleep(0.1)
+    # The half-open trial fails and reopens the circuit; the next trial succeeds.
+    with pytest.raises(ConnectionError):
+        await call_with_retries(failing, attempts=1, retry_on=(ConnectionError,), breaker=breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+    await asyncio.sleep(0.1)
+    assert await call_with_retries(failing, attempts=1, retry_on=(ConnectionError,), breaker=breaker) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+@pytest.mark.asyncio
+async def test_neutral_errors_do_not_trip_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1)
+    flaky = Flaky(2, error=TimeoutError)
+    await call_with_retries(flaky, attempts=3, base_delay=0.01, retry_on=(TimeoutError,),
+                            breaker=breaker, breaker_neutral=(TimeoutError,))
+    assert breaker.state == CircuitBreaker.CLOSED
+
+@pytest.mark.asyncio
+async def test_hedged_request_returns_the_faster_copy():
+    delays = iter([1.0, 0.01])
+    started = []
+    async def request():
+        delay = next(delays)
+        started.append(delay)
+        await asyncio.sleep(delay)
+        return delay
+
+    start = time.monotonic()
+    assert await hedged(request, hedge_after=0.05) == 0.01
+    assert time.monotonic() - start < 0.5
+    assert started == [1.0, 0.01]
+
+@pytest.mark.asyncio
+async def test_hedge_copies_wait_for_a_permit():
+    permits = []
+    async def acquire():
+        permits.append(time.monotonic())
+    async def request():
+        await asyncio.sleep(0.2 if len(permits) == 1 else 0.01)
+        return len(permits)
+
+    assert await call_with_retries(request, attempts=1, hedge_after=0.05, before_attempt=acquire) == 2
+    assert len(permits) == 2
+
+@pytest.mark.asyncio
+async def test_deadline_used_up_by_the_limiter_does_not_trip_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1)
+    calls = Flaky(0)
+    async def rate_limited():
+        await asyncio.sleep(0.1)
+
+    with pytest.raises(DeadlineExceededError):
+        await call_with_retries(calls, deadline=0.05, breaker=breaker, before_attempt=rate_limited)
+    assert calls.calls == 0
+    assert breaker.state == CircuitBreaker.CLOSED
+
+@pytest.mark.asyncio
+async def test_background_calls_wait_for_an_open_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+    breaker.record_failure()
+    calls = Flaky(0)
+    with pytest.raises(CircuitOpenError):
+        await call_with_retries(calls, attempts=1, breaker=breaker)
+    start = time.monotonic()
+    assert await call_with_retries(calls, attempts=1, breaker=breaker, wait_for_breaker=True) == "ok"
+    assert time.monotonic() - start >= 0.05
+    assert calls.calls == 1 and breaker.state == CircuitBreaker.CLOSED
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_the_batch_instead_of_dropping_its_texts(monkeypatch):
+    from src.core import vectorstore
+    class DownBackend:
+        cacheable = False
+        single_calls = 0
+        async def embed(self, texts):
+            raise CircuitOpenError("open")
+        async def embed_one(self, text):
+            self.single_calls += 1
+            raise CircuitOpenError("open")
+
+    backend = DownBackend()
+    monkeypatch.setattr(vectorstore, "embedding_backend", backend)
+    with pytest.raises(CircuitOpenError):
+        await vectorstore.generate_embeddings(["a", "b"])
+    assert backend.single_calls == 0
+
+@pytest.mark.asyncio
+async def test_call_openai_retries_connection_errors(monkeypatch):
+    from src.core import openai_client
+    monkeypatch.setattr(openai_client, "OPENAI_RETRY_BASE_DELAY", 0.01)
+    error = lambda message: openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com"))
+    flaky = Flaky(2, error=error)
+    assert await openai_client.call_openai(flaky, tokens=10) == "ok"
+    assert flaky.calls == 3
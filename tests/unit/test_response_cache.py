@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+import pytest
+from src.core import assistant, vectorstore
+from src.core.response_cache import SemanticResponseCache
+
+def test_hit_requires_similarity_namespace_and_version():
+    cache = SemanticResponseCache(max_entries=10, ttl_seconds=60, similarity_threshold=0.9)
+    cache.put("repo", 1, [1.0, 0.0], "what does this repo do?", "It parses things.")
+    assert cache.get("repo", 1, [0.99, 0.05]) == ("It parses things.", pytest.approx(0.9987, abs=1e-3))
+    assert cache.get("repo", 1, [0.0, 1.0]) is None
+    assert cache.get("other", 1, [1.0, 0.0]) is None
+    # A new index version drops the answers given from the old one.
+    assert cache.get("repo", 2, [1.0, 0.0]) is None
+    assert cache.stats() == {"hits": 1, "misses": 3, "evictions": 0, "entries": 0}
+
+def test_entries_expire_and_least_recently_used_are_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.core.response_cache.time.time", lambda: now[0])
+    cache = SemanticResponseCache(max_entries=2, ttl_seconds=60, similarity_threshold=0.9)
+    cache.put("repo", 1, [1.0, 0.0, 0.0], "a", "A")
+    cache.put("repo", 1, [0.0, 1.0, 0.0], "b", "B")
+    assert cache.get("repo", 1, [1.0, 0.0, 0.0])[0] == "A"
+    cache.put("repo", 1, [0.0, 0.0, 1.0], "c", "C")
+    assert cache.get("repo", 1, [0.0, 1.0, 0.0]) is None
+    assert cache.stats()["evictions"] == 1
+    now[0] += 61
+    assert cache.get("repo", 1, [1.0, 0.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+@pytest.mark.asyncio
+async def test_generate_rag_response_reuses_answers_until_the_index_changes(monkeypatch):
+    calls = []
+
+    async def fake_create(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"answer {len(calls)}"))])
+
+    async def fake_generate_embedding(text):
+        return [1.0, 0.0] if "repo" in text else [0.0, 1.0]
+
+    def fake_query_faiss(embedding, k=1, min_score=None):
+        return {"indices": [[]], "distances": [[]]}
+
+    monkeypatch.setattr(assistant.aclient.chat.completions, "create", fake_create)
+    monkeypatch.setattr(assistant, "generate_embedding", fake_generate_embedding)
+    monkeypatch.setattr(assistant, "query_faiss", fake_query_faiss)
+    monkeypatch.setattr(assistant, "response_cache", SemanticResponseCache(similarity_threshold=0.95))
+
+    assert await assistant.generate_rag_response("What does this repo do?") == "answer 1"
+    assert await assistant.generate_rag_response("what does this repo do") == "answer 1"
+    assert await assistant.generate_rag_response("Explain the tests") == "answer 2"
+    assert len(calls) == 2
+
+    vectorstore.current_index().mark_changed()
+    assert await assistant.generate_rag_response("What does this repo do?") == "answer 3"
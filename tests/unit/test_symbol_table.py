@@ -0,0 +1,94 @@
+import pytest
+from src.core import assistant, vectorstore
+from src.core.metadata_store import MetadataStore
+from src.core.symbol_table import SymbolTable, extract_symbols, format_outline, is_structural_query
+
+SOURCE = '''"""Sessions."""
+import os
+
+def merge_settings(request: dict, session=None) -> dict:
+    """Merge request and session settings.
+
+    Request values win.
+    """
+    return request
+
+class Session(Base, metaclass=Meta):
+    """A user session."""
+
+    @property
+    def cookies(self):
+        return {}
+
+    async def send(self, request, *, stream=False):
+        def helper():
+            pass
+        return helper()
+'''
+
+def test_extract_python_symbols():
+    symbols = extract_symbols("pkg/sessions.py", SOURCE)
+    assert [(s["name"], s["kind"]) for s in symbols] == [
+        ("merge_settings", "function"), ("Session", "class"),
+        ("Session.cookies", "method"), ("Session.send", "method")]
+    merge, session, cookies, send = symbols
+    assert merge["signature"] == "def merge_settings(request: dict, session=None) -> dict"
+    assert merge["doc"] == "Merge request and session settings."
+    assert (merge["start_line"], merge["end_line"]) == (4, 9)
+    assert session["signature"] == "class Session(Base, metaclass=Meta)"
+    assert cookies["start_line"] == 14
+    assert send["signature"] == "async def send(self, request, *, stream=False)"
+    assert extract_symbols("README.md", "# Title") is None
+    assert extract_symbols("broken.py", "def (") is None
+
+    outline = format_outline("pkg/sessions.py", symbols)
+    assert outline.splitlines()[0] == "Outline of pkg/sessions.py (4 symbols):"
+    assert "  async def send(self, request, *, stream=False)  [lines 18-21]" in outline
+    assert is_structural_query("What are the functions in sessions.py?")
+    assert not is_structural_query("Explain the README")
+
+def test_symbol_table_persistence(tmp_path):
+    store = MetadataStore(str(tmp_path / "metadata.db"))
+    table = SymbolTable(store)
+    table.record("pkg/sessions.py", SOURCE)
+    table.record("README.md", "# Title")
+    assert "README.md" not in table and len(table) == 1
+    store.commit()
+    store.close()
+
+    loaded = SymbolTable(MetadataStore(str(tmp_path / "metadata.db")))
+    assert loaded.symbols("pkg/sessions.py") == extract_symbols("pkg/sessions.py", SOURCE)
+    loaded.remove_file("pkg/sessions.py")
+    assert loaded.symbols("pkg/sessions.py") is None
+    loaded.store.close()
+
+@pytest.mark.asyncio
+async def test_file_queries_use_the_outline_instead_of_a_summary(monkeypatch, tmp_path):
+    index = vectorstore.RepoIndex(str(tmp_path / "index.idx"), str(tmp_path / "metadata.db"))
+    long_source = SOURCE + "".join(f"\ndef f{i}(x):\n    return x + {i}  # {'word ' * 20}\n" for i in range(50))
+    summaries = []
+    async def fake_analyze_code(query, context):
+        summaries.append(context)
+        return "summary"
+    reads = []
+    async def fake_read_file_content(file_path):
+        reads.append(file_path)
+        return long_source
+
+    monkeypatch.setattr(assistant, "analyze_code", fake_analyze_code)
+    monkeypatch.setattr(assistant, "read_file_content", fake_read_file_content)
+    monkeypatch.setattr(assistant, "response_cache", None)
+    with vectorstore.use_index(index):
+        vectorstore.current_index().file_manifest.add_file("repo/sessions.py")
+        vectorstore.record_symbols("repo/sessions.py", long_source)
+
+        rag_context = await assistant.prepare_rag_context("What are the functions in sessions.py?")
+        assert [s["kind"] for s in rag_context["sources"]] == ["outline"]
+        assert "def f49(x)  [lines" in rag_context["prompt"]
+        assert reads == []
+
+        rag_context = await assistant.prepare_rag_context("How does sessions.py handle cookies?")
+        assert [s["kind"] for s in rag_context["sources"]] == ["outline", "file"]
+        assert reads == ["repo/sessions.py"]
+    index.close()
+    assert summaries == []
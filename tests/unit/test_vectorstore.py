@@ -1,6 +1,6 @@
 import pytest
 import asyncio
-from src.core.vectorstore import chunk_text, process_code_file, global_id_counter, metadata_store, faiss_index, DIMENSION
+from src.core.vectorstore import chunk_text, process_code_file, DIMENSION
 
 # Test that chunk_text splits a string correctly.
 def test_chunk_text():
@@ -32,8 +32,8 @@ async def test_generate_embedding(monkeypatch):
 # and the fake embedding function raises an exception for one of them.
 @pytest.mark.asyncio
 async def test_process_code_file(monkeypatch):
-    # Force chunk_text to return two specific chunks.
-    monkeypatch.setattr("src.core.vectorstore.chunk_text", lambda text, chunk_size=2000: ["good_chunk ", "fail_chunk"])
+    # Force chunk_file to return two specific chunks.
+    monkeypatch.setattr("src.core.vectorstore.chunk_file", lambda file_path, text: ["good_chunk ", "fail_chunk"])
 
     # Define a fake generate_embedding:
     async def fake_generate_embedding(text: str):
@@ -57,4 +57,47 @@ async def test_process_code_file(monkeypatch):
     await process_code_file("dummy_file.txt", content)
     # Expect that the first chunk ("good_chunk ") is processed and stored,
     # while the second chunk causes an exception and is skipped.
-    assert any("dummy_file.txt_chunk_" in key for key in embeddings_collected.keys())
\ No newline at end of file
+    assert any("dummy_file.txt_chunk_" in key for key in embeddings_collected.keys())
+
+# Test that batches respect both the item and the token budget.
+def test_plan_embedding_batches():
+    from src.core.vectorstore import plan_embedding_batches
+    texts = ["a" * 40, "b" * 40, "c" * 40, "d" * 400, "e"]
+    # Each short text is ~11 tokens, the long one ~101 tokens.
+    assert plan_embedding_batches(texts, max_items=2, max_tokens=1000) == [[0, 1], [2, 3], [4]]
+    assert plan_embedding_batches(texts, max_items=10, max_tokens=30) == [[0, 1], [2], [3], [4]]
+
+# Test that chunks from several files share embeddings requests and are routed back per file.
+@pytest.mark.asyncio
+async def test_embed_chunked_files_batches_requests(monkeypatch, tmp_path):
+    from src.core.embedding_cache import EmbeddingCache
+    monkeypatch.setattr("src.core.vectorstore.embedding_cache", EmbeddingCache(str(tmp_path / "cache.sqlite")))
+    monkeypatch.setattr("src.core.vectorstore.EMBEDDING_BATCH_MAX_ITEMS", 256)
+
+    class FakeItem:
+        def __init__(self, index, embedding):
+            self.index = index
+            self.embedding = embedding
+
+    class FakeResponse:
+        def __init__(self, data):
+            self.data = data
+
+    calls = []
+    async def fake_create(input, model):
+        calls.append(list(input))
+        return FakeResponse([FakeItem(i, [float(len(t))] * DIMENSION) for i, t in enumerate(input)])
+
+    monkeypatch.setattr("src.core.vectorstore.aclient.embeddings.create", fake_create)
+
+    from src.core.vectorstore import embed_chunked_files
+    per_file = await embed_chunked_files([("a.py", ["one", "two"]), ("b.md", ["three"])])
+    assert calls == [["one", "two", "three"]]
+    assert {path: chunk_texts for path, (_, chunk_texts) in per_file.items()} == {
+        "a.py": {"a.py_chunk_0": "one", "a.py_chunk_1": "two"}, "b.md": {"b.md_chunk_0": "three"}}
+
+    # A second run is served entirely from the embedding cache.
+    calls.clear()
+    per_file = await embed_chunked_files([("c.py", ["one", "three"])])
+    assert list(per_file) == ["c.py"]
+    assert calls == []